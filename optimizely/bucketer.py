@@ -11,17 +11,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import math
+import bisect
 try:
   import mmh3
 except ImportError:
   from .lib import pymmh3 as mmh3
+try:
+  import numpy
+  from .lib import npmmh3
+except ImportError:
+  numpy = None
+  npmmh3 = None
 
+from . import logger as optimizely_logger
 from .helpers import enums
 
 MAX_TRAFFIC_VALUE = 10000
 UNSIGNED_MAX_32_BIT_VALUE = 0xFFFFFFFF
-MAX_HASH_VALUE = math.pow(2, 32)
+HASH_BITS = 32
 HASH_SEED = 1
 BUCKETING_ID_TEMPLATE = '{user_id}{parent_id}'
 GROUP_POLICIES = ['random']
@@ -56,6 +63,10 @@ class Bucketer(object):
   def _generate_bucket_value(self, bucketing_id):
     """ Helper function to generate bucket value in half-closed interval [0, MAX_TRAFFIC_VALUE).
 
+    The bucket value is floor(hash / 2^32 * MAX_TRAFFIC_VALUE), computed as (hash * MAX_TRAFFIC_VALUE) >> 32.
+    Both are exact: hash * MAX_TRAFFIC_VALUE is below 2^46 and so is represented exactly by a double,
+    and dividing it by a power of two only changes its exponent.
+
     Args:
       bucketing_id: ID for bucketing.
 
@@ -63,8 +74,7 @@ class Bucketer(object):
       Bucket value corresponding to the provided bucketing ID.
     """
 
-    ratio = float(self._generate_unsigned_hash_code_32_bit(bucketing_id)) / MAX_HASH_VALUE
-    return math.floor(ratio * MAX_TRAFFIC_VALUE)
+    return (self._generate_unsigned_hash_code_32_bit(bucketing_id) * MAX_TRAFFIC_VALUE) >> HASH_BITS
 
   def find_bucket(self, user_id, parent_id, traffic_allocations):
     """ Determine entity based on bucket value and traffic allocations.
@@ -78,23 +88,109 @@ class Bucketer(object):
       Entity ID which may represent experiment or variation.
     """
 
-    bucketing_id = BUCKETING_ID_TEMPLATE.format(user_id=user_id, parent_id=parent_id)
-    bucketing_number = self._generate_bucket_value(bucketing_id)
-    self.config.logger.log(enums.LogLevels.DEBUG, 'Assigned bucket %s to user "%s".' % (bucketing_number, user_id))
+    try:
+      bucketing_id = user_id + parent_id
+    except TypeError:
+      bucketing_id = BUCKETING_ID_TEMPLATE.format(user_id=user_id, parent_id=parent_id)
+
+    return self._find_entity(user_id, self._generate_bucket_value(bucketing_id), parent_id, traffic_allocations)
+
+  def _find_entity(self, user_id, bucketing_number, parent_id, traffic_allocations):
+    """ Determine entity based on an already computed bucket value and traffic allocations.
+
+    Args:
+      user_id: ID for user.
+      bucketing_number: Bucket value of the user for the group or experiment.
+      parent_id: ID representing group or experiment.
+      traffic_allocations: Traffic allocations representing traffic allotted to experiments or variations.
+
+    Returns:
+      Entity ID which may represent experiment or variation.
+    """
+
+    optimizely_logger.log(self.config.logger, enums.LogLevels.DEBUG,
+                          'Assigned bucket %s to user "%s".', bucketing_number, user_id)
 
-    for traffic_allocation in traffic_allocations:
-      current_end_of_range = traffic_allocation.get('endOfRange')
-      if bucketing_number < current_end_of_range:
-        return traffic_allocation.get('entityId')
+    _, ends_of_range, entity_ids = self.config.get_traffic_allocation_index(parent_id, traffic_allocations)
+    index = bisect.bisect_right(ends_of_range, bucketing_number)
+    if index < len(entity_ids):
+      return entity_ids[index]
 
     return None
 
-  def bucket(self, experiment, user_id):
+  def bucket(self, experiment, user_id, find_bucket=None):
     """ For a given experiment and bucketing ID determines variation to be shown to user.
 
     Args:
       experiment: Object representing the experiment for which user is to be bucketed.
       user_id: ID for user.
+      find_bucket: Optional method created by create_find_bucket for the user, to share hashing across experiments.
+
+    Returns:
+      Variation in which user with ID user_id will be put in. None if no variation.
+    """
+
+    return self._bucket(experiment, user_id, find_bucket or self.find_bucket)
+
+  def create_find_bucket(self, user_id):
+    """ Create a method with the signature of find_bucket for bucketing one user into many experiments.
+
+    The method finds the entity of the user for every group or experiment once and remembers it. When hashing
+    falls back to pymmh3, the hash state after the 4-byte aligned part of the user ID is computed once and resumed
+    for every group and experiment ID. The mmh3 C extension can not resume a hash state, so with it every group and
+    experiment ID is hashed along with the whole user ID, as find_bucket does.
+
+    Args:
+      user_id: ID for user.
+
+    Returns:
+      Method taking the user ID, the ID of the group or experiment and its traffic allocations,
+      and returning the entity ID which may represent experiment or variation.
+    """
+
+    user_bucketing_id = BUCKETING_ID_TEMPLATE.format(user_id=user_id, parent_id='')
+    if hasattr(mmh3, 'hash_prefix'):
+      hash_state = mmh3.hash_prefix(user_bucketing_id, self.bucket_seed)
+
+      def generate_bucket_value(parent_id):
+        hash_code = mmh3.hash_from_prefix(hash_state, parent_id) & UNSIGNED_MAX_32_BIT_VALUE
+        return (hash_code * MAX_TRAFFIC_VALUE) >> HASH_BITS
+    else:
+      def generate_bucket_value(parent_id):
+        return self._generate_bucket_value(user_bucketing_id + parent_id)
+
+    entity_ids = {}
+
+    def find_bucket(user_id, parent_id, traffic_allocations):
+      if parent_id not in entity_ids:
+        entity_ids[parent_id] = self._find_entity(user_id, generate_bucket_value(parent_id),
+                                                  parent_id, traffic_allocations)
+      return entity_ids[parent_id]
+
+    return find_bucket
+
+  def bucket_experiments(self, experiments, user_id):
+    """ For a given user determines the variations to be shown in many experiments.
+    Produces the same result as calling bucket for every experiment, hashing as described in create_find_bucket.
+
+    Args:
+      experiments: List of objects representing the experiments for which user is to be bucketed.
+      user_id: ID for user.
+
+    Returns:
+      List holding, for every experiment, the Variation the user will be put in or None if no variation.
+    """
+
+    find_bucket = self.create_find_bucket(user_id)
+    return [self._bucket(experiment, user_id, find_bucket) for experiment in experiments]
+
+  def _bucket(self, experiment, user_id, find_bucket):
+    """ Helper method to determine variation to be shown to user, given a method which finds buckets.
+
+    Args:
+      experiment: Object representing the experiment for which user is to be bucketed.
+      user_id: ID for user.
+      find_bucket: Method with the signature of find_bucket.
 
     Returns:
       Variation in which user with ID user_id will be put in. None if no variation.
@@ -110,26 +206,104 @@ class Bucketer(object):
       if not group:
         return None
 
-      user_experiment_id = self.find_bucket(user_id, experiment.groupId, group.trafficAllocation)
+      user_experiment_id = find_bucket(user_id, experiment.groupId, group.trafficAllocation)
       if not user_experiment_id:
-        self.config.logger.log(enums.LogLevels.INFO, 'User "%s" is in no experiment.' % user_id)
+        optimizely_logger.log(self.config.logger, enums.LogLevels.INFO, 'User "%s" is in no experiment.', user_id)
         return None
 
       if user_experiment_id != experiment.id:
-        self.config.logger.log(enums.LogLevels.INFO, 'User "%s" is not in experiment "%s" of group %s.' %
-                               (user_id, experiment.key, experiment.groupId))
+        optimizely_logger.log(self.config.logger, enums.LogLevels.INFO,
+                              'User "%s" is not in experiment "%s" of group %s.',
+                              user_id, experiment.key, experiment.groupId)
         return None
 
-      self.config.logger.log(enums.LogLevels.INFO, 'User "%s" is in experiment %s of group %s.' %
-                             (user_id, experiment.key, experiment.groupId))
+      optimizely_logger.log(self.config.logger, enums.LogLevels.INFO, 'User "%s" is in experiment %s of group %s.',
+                            user_id, experiment.key, experiment.groupId)
 
     # Bucket user if not in white-list and in group (if any)
-    variation_id = self.find_bucket(user_id, experiment.id, experiment.trafficAllocation)
+    variation_id = find_bucket(user_id, experiment.id, experiment.trafficAllocation)
     if variation_id:
       variation = self.config.get_variation_from_id(experiment.key, variation_id)
-      self.config.logger.log(enums.LogLevels.INFO, 'User "%s" is in variation "%s" of experiment %s.' %
-                             (user_id, variation.key, experiment.key))
+      optimizely_logger.log(self.config.logger, enums.LogLevels.INFO,
+                            'User "%s" is in variation "%s" of experiment %s.', user_id, variation.key, experiment.key)
       return variation
 
-    self.config.logger.log(enums.LogLevels.INFO, 'User "%s" is in no variation.' % user_id)
+    optimizely_logger.log(self.config.logger, enums.LogLevels.INFO, 'User "%s" is in no variation.', user_id)
     return None
+
+  def _find_buckets(self, encoded_user_ids, parent_id, traffic_allocations):
+    """ Vectorized counterpart of find_bucket which determines the traffic allocation for many users at once.
+
+    Args:
+      encoded_user_ids: List of UTF-8 encoded user IDs.
+      parent_id: ID representing group or experiment.
+      traffic_allocations: Traffic allocations representing traffic allotted to experiments or variations.
+
+    Returns:
+      numpy array holding, for every user, the index of the matching traffic allocation.
+      The index equals len(traffic_allocations) if the user falls in no traffic allocation.
+    """
+
+    suffix = parent_id.encode('utf-8')
+    hashes = npmmh3.hash_many([user_id + suffix for user_id in encoded_user_ids], self.bucket_seed)
+    bucketing_numbers = (hashes.astype(numpy.uint64) * numpy.uint64(MAX_TRAFFIC_VALUE)) >> numpy.uint64(HASH_BITS)
+
+    _, ends_of_range, _ = self.config.get_traffic_allocation_index(parent_id, traffic_allocations)
+    return numpy.searchsorted(numpy.array(ends_of_range, dtype=numpy.uint64), bucketing_numbers, side='right')
+
+  def bucket_many(self, experiment, user_ids):
+    """ For a given experiment determines the variations to be shown to many users in one vectorized pass.
+    Produces the same result as calling bucket for every user ID.
+
+    Args:
+      experiment: Object representing the experiment for which users are to be bucketed.
+      user_ids: List of user IDs.
+
+    Returns:
+      List holding, for every user ID, the Variation the user will be put in or None if no variation.
+    """
+
+    if npmmh3 is None:
+      return [self.bucket(experiment, user_id) for user_id in user_ids]
+
+    if not experiment:
+      return [None] * len(user_ids)
+
+    try:
+      encoded_user_ids = [user_id.encode('utf-8') for user_id in user_ids]
+    except AttributeError:
+      encoded_user_ids = [BUCKETING_ID_TEMPLATE.format(user_id=user_id, parent_id='').encode('utf-8')
+                          for user_id in user_ids]
+    in_experiment = None
+
+    # Determine which users land on the experiment in its mutually exclusive group
+    if experiment.groupPolicy in GROUP_POLICIES:
+      group = self.config.get_group(experiment.groupId)
+
+      if not group:
+        return [None] * len(user_ids)
+
+      allocation_indices = self._find_buckets(encoded_user_ids, experiment.groupId, group.trafficAllocation)
+      is_experiment_allocation = numpy.array(
+        [traffic_allocation.get('entityId') == experiment.id for traffic_allocation in group.trafficAllocation] +
+        [False]
+      )
+      in_experiment = numpy.flatnonzero(is_experiment_allocation[allocation_indices])
+      encoded_user_ids = [encoded_user_ids[index] for index in in_experiment.tolist()]
+
+    # Resolve every traffic allocation to its variation once and look those up for all users
+    variations = numpy.empty(len(experiment.trafficAllocation) + 1, dtype=object)
+    for index, traffic_allocation in enumerate(experiment.trafficAllocation):
+      variation_id = traffic_allocation.get('entityId')
+      if variation_id:
+        variations[index] = self.config.get_variation_from_id(experiment.key, variation_id)
+
+    allocation_indices = self._find_buckets(encoded_user_ids, experiment.id, experiment.trafficAllocation)
+    bucketed_variations = variations[allocation_indices]
+
+    if in_experiment is None:
+      return bucketed_variations.tolist()
+
+    result = numpy.empty(len(user_ids), dtype=object)
+    result[in_experiment] = bucketed_variations
+    return result.tolist()
@@ -0,0 +1,117 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+from . import version
+
+MAGIC = b'OPTIMIZELY-CONFIG-SNAPSHOT\n'
+# Increment when the layout of ProjectConfig or its entities changes
+FORMAT_VERSION = 4
+
+
+def get_datafile_hash(datafile):
+  """ Compute the content hash identifying the datafile a snapshot was built from.
+
+  Args:
+    datafile: JSON string or bytes representing the project, or dict it was decoded into.
+
+  Returns:
+    Hex string of the SHA-256 digest of the datafile.
+  """
+
+  if isinstance(datafile, dict):
+    datafile = json.dumps(datafile, sort_keys=True)
+  if not isinstance(datafile, bytes):
+    datafile = datafile.encode('utf-8')
+
+  return hashlib.sha256(datafile).hexdigest()
+
+
+def _get_header(datafile_hash, is_validated):
+  """ Helper method to build the header describing a snapshot and the SDK which saved it. """
+
+  return {
+    'format_version': FORMAT_VERSION,
+    'sdk_version': version.__version__,
+    'python_version': sys.version_info[0],
+    'datafile_hash': datafile_hash,
+    'is_validated': is_validated
+  }
+
+
+def save(path, config, datafile_hash, is_validated):
+  """ Write the config with its entities, compiled indexes and decoded audience conditions to a snapshot file,
+  replacing any previous snapshot atomically.
+
+  Args:
+    path: Path of the snapshot file.
+    config: ProjectConfig to save.
+    datafile_hash: Content hash of the datafile the config was built from.
+    is_validated: Boolean representing whether the datafile passed JSON schema validation.
+  """
+
+  directory = os.path.dirname(os.path.abspath(path))
+  file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.config-snapshot-')
+  try:
+    with os.fdopen(file_descriptor, 'wb') as snapshot_file:
+      snapshot_file.write(MAGIC)
+      pickle.dump(_get_header(datafile_hash, is_validated), snapshot_file, pickle.HIGHEST_PROTOCOL)
+      pickle.dump(config, snapshot_file, pickle.HIGHEST_PROTOCOL)
+    # Readers in other processes either see the previous snapshot or the complete new one
+    getattr(os, 'replace', os.rename)(temp_path, path)
+  except:
+    os.remove(temp_path)
+    raise
+
+
+def load(path, datafile_hash, logger, error_handler, require_validated=False):
+  """ Read the config from a snapshot file if it was built from the same datafile by a compatible SDK.
+  Snapshots are unpickled, so they must only be loaded from locations the application trusts.
+
+  Args:
+    path: Path of the snapshot file.
+    datafile_hash: Content hash of the datafile the config is needed for.
+    logger: Provides a log message to send log messages to.
+    error_handler: Provides a handle_error method to handle exceptions.
+    require_validated: Boolean representing whether the datafile must have passed JSON schema validation.
+
+  Returns:
+    ProjectConfig. None if there is no snapshot or it is stale or incompatible.
+  """
+
+  try:
+    with open(path, 'rb') as snapshot_file:
+      if snapshot_file.read(len(MAGIC)) != MAGIC:
+        return None
+
+      header = pickle.load(snapshot_file)
+      expected_header = _get_header(datafile_hash, header.get('is_validated'))
+      if header != expected_header or (require_validated and not header.get('is_validated')):
+        return None
+
+      config = pickle.load(snapshot_file)
+  except:
+    return None
+
+  config.logger = logger
+  config.error_handler = error_handler
+  return config
@@ -0,0 +1,148 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+import timeit
+import requests
+
+from requests import exceptions as request_exception
+
+from . import logger as optimizely_logger
+from .helpers import datafile as datafile_helper
+from .helpers import enums
+from .logger import NoOpLogger
+
+DEFAULT_POLLING_INTERVAL = 300
+REQUEST_TIMEOUT = 10
+
+
+class PollingDatafileManager(object):
+  """ Class keeping the datafile of a client up to date by polling a URL on a background thread.
+
+  Requests are conditional on the ETag and Last-Modified headers of the last datafile used, so an unchanged
+  datafile is neither transferred nor parsed again. New datafiles are decoded and handed to a callback such as
+  Optimizely.update_datafile, which swaps the config without blocking decisions.
+  """
+
+  def __init__(self, url, update_datafile, polling_interval=DEFAULT_POLLING_INTERVAL, logger=None, session=None):
+    """ PollingDatafileManager init method.
+
+    Args:
+      url: URL to fetch the datafile from.
+      update_datafile: Callable which is given the decoded datafile and returns True if it is in use.
+      polling_interval: Number of seconds between fetches.
+      logger: Optional component which provides a log method to log messages. By default nothing would be logged.
+      session: Optional requests.Session to reuse connections with. By default a new session is used.
+    """
+
+    self.url = url
+    self.update_datafile = update_datafile
+    self.polling_interval = polling_interval
+    self.logger = logger or NoOpLogger
+    self.session = session or requests.Session()
+    self.etag = None
+    self.last_modified = None
+    self.fetch_count = 0
+    self.update_count = 0
+    self.last_fetch_duration = None
+    self.last_parse_duration = None
+    self.last_update_duration = None
+    self._stopped = threading.Event()
+    self._thread = None
+
+  def fetch(self):
+    """ Fetch the datafile and hand it to the update callback if it changed since the last one used.
+
+    Returns:
+      Boolean True if a new datafile is in use. False otherwise.
+    """
+
+    headers = {}
+    if self.etag:
+      headers['If-None-Match'] = self.etag
+    if self.last_modified:
+      headers['If-Modified-Since'] = self.last_modified
+
+    start_time = timeit.default_timer()
+    try:
+      response = self.session.get(self.url, headers=headers, timeout=REQUEST_TIMEOUT)
+      response.raise_for_status()
+    except request_exception.RequestException as error:
+      self.logger.log(enums.LogLevels.ERROR, 'Unable to fetch datafile from %s. Error: %s' % (self.url, str(error)))
+      return False
+    finally:
+      self.last_fetch_duration = timeit.default_timer() - start_time
+
+    self.fetch_count += 1
+    if response.status_code == requests.codes.not_modified:
+      optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'Datafile at %s is not modified.', self.url)
+      return False
+
+    start_time = timeit.default_timer()
+    try:
+      datafile = datafile_helper.loads(response.content)
+    except:
+      error = sys.exc_info()[1]
+      self.logger.log(enums.LogLevels.ERROR, 'Unable to parse datafile from %s. Error: %s' % (self.url, str(error)))
+      return False
+    finally:
+      self.last_parse_duration = timeit.default_timer() - start_time
+
+    start_time = timeit.default_timer()
+    is_updated = self.update_datafile(datafile)
+    self.last_update_duration = timeit.default_timer() - start_time
+    optimizely_logger.log(self.logger, enums.LogLevels.DEBUG,
+                          'Fetched datafile from %s in %.3f seconds, parsed it in %.3f seconds '
+                          'and updated it in %.3f seconds.',
+                          self.url, self.last_fetch_duration, self.last_parse_duration, self.last_update_duration)
+    if not is_updated:
+      return False
+
+    # Only remember the validators of a datafile in use, so that a rejected datafile is fetched again
+    self.etag = response.headers.get('ETag')
+    self.last_modified = response.headers.get('Last-Modified')
+    self.update_count += 1
+    return True
+
+  def start(self):
+    """ Start fetching the datafile on a background thread every polling interval. """
+
+    if self._thread is not None:
+      return
+
+    self._stopped.clear()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    """ Stop the background thread, waiting for a fetch in progress to finish. """
+
+    if self._thread is None:
+      return
+
+    self._stopped.set()
+    self._thread.join()
+    self._thread = None
+
+  def _run(self):
+    """ Fetch the datafile every polling interval until stopped. """
+
+    while not self._stopped.is_set():
+      try:
+        self.fetch()
+      except:
+        error = sys.exc_info()[1]
+        self.logger.log(enums.LogLevels.ERROR, 'Unable to update datafile from %s. Error: %s' % (self.url, str(error)))
+      self._stopped.wait(self.polling_interval)
@@ -0,0 +1,126 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import timeit
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 60
+
+
+class DecisionCache(object):
+  """ Bounded cache of variation decisions with least recently used eviction and expiry.
+
+  Decisions are only valid for the project config they were made with, so the cache empties itself when it is
+  used with another config. Configs are told apart by identity rather than revision, as a datafile can be
+  updated without its revision changing.
+  """
+
+  # Returned by get when there is no cached decision, as None is a valid decision
+  MISS = object()
+
+  def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+    """ DecisionCache init method.
+
+    Args:
+      max_size: Maximum number of decisions to hold.
+      ttl: Number of seconds a decision stays valid. None for decisions to never expire.
+    """
+
+    self.max_size = max_size
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self.config = None
+    self._decisions = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._decisions)
+
+  @staticmethod
+  def get_key(experiment_id, user_id, attributes):
+    """ Build the cache key of a decision.
+
+    Args:
+      experiment_id: ID for the experiment decided on.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+
+    Returns:
+      Tuple identifying the decision. None if the attributes can not be part of a key.
+    """
+
+    try:
+      # Attribute keys of different types can not be sorted on Python 3
+      key = (experiment_id, user_id, tuple(sorted(attributes.items())) if attributes else ())
+      hash(key)
+    except TypeError:
+      return None
+
+    return key
+
+  def get(self, config, key):
+    """ Retrieve a cached decision.
+
+    Args:
+      config: ProjectConfig the decision is needed for.
+      key: Key of the decision as built by get_key.
+
+    Returns:
+      Cached decision. MISS if there is no valid cached decision.
+    """
+
+    with self._lock:
+      if config is not self.config:
+        self._decisions.clear()
+        self.config = config
+
+      entry = self._decisions.pop(key, None)
+      if entry is None or (entry[0] is not None and entry[0] <= timeit.default_timer()):
+        self.misses += 1
+        return self.MISS
+
+      # Reinsert the decision to mark it as most recently used
+      self._decisions[key] = entry
+      self.hits += 1
+      return entry[1]
+
+  def set(self, config, key, decision):
+    """ Cache a decision.
+
+    Args:
+      config: ProjectConfig the decision was made with.
+      key: Key of the decision as built by get_key.
+      decision: Decision to be cached.
+    """
+
+    expires_at = timeit.default_timer() + self.ttl if self.ttl is not None else None
+    with self._lock:
+      if config is not self.config:
+        self._decisions.clear()
+        self.config = config
+
+      self._decisions.pop(key, None)
+      self._decisions[key] = (expires_at, decision)
+      while len(self._decisions) > self.max_size:
+        self._decisions.popitem(last=False)
+
+  def clear(self):
+    """ Remove all cached decisions and reset the hit and miss counters. """
+
+    with self._lock:
+      self._decisions.clear()
+      self.hits = 0
+      self.misses = 0
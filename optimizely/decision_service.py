@@ -14,6 +14,11 @@
 import sys
 
 from . import bucketer
+from . import logger as optimizely_logger
+from .decision_cache import DecisionCache
+from .decision_trace import DecisionRecord
+from .decision_trace import DecisionStages
+from .decision_trace import perf_counter_ns
 from .helpers import audience as audience_helper
 from .helpers import enums
 from .helpers import experiment as experiment_helper
@@ -21,12 +26,101 @@ from .helpers import validator
 from .user_profile import UserProfile
 
 
+class DecisionContext(object):
+  """ Class holding the user profile of a user across the decisions made within one API call.
+
+  The profile is looked up and validated at most once and new decisions are merged into it,
+  so that a single save writes all of them back. Bucketing into many experiments and groups
+  hashes the user ID once through the find_bucket method the context keeps.
+  """
+
+  def __init__(self, user_id, user_profile_service, logger):
+    self.user_id = user_id
+    self.user_profile_service = user_profile_service
+    self.logger = logger
+    self.user_profile = None
+    self.is_user_profile_retrieved = False
+    self.has_unsaved_decisions = False
+    self.find_bucket = None
+
+  def get_find_bucket(self, bucketer):
+    """ Create the method finding buckets for the user on first use and return it.
+
+    Args:
+      bucketer: Bucketer to create the method with.
+
+    Returns:
+      Method with the signature of find_bucket, shared by the decisions made within the context.
+    """
+
+    if self.find_bucket is None:
+      self.find_bucket = bucketer.create_find_bucket(self.user_id)
+
+    return self.find_bucket
+
+  def get_user_profile(self):
+    """ Look up the user profile on first use and return it.
+
+    Returns:
+      UserProfile retrieved from the user profile service. Empty UserProfile if lookup failed
+      or if the retrieved profile is invalid.
+    """
+
+    if self.user_profile is not None:
+      return self.user_profile
+
+    try:
+      retrieved_profile = self.user_profile_service.lookup(self.user_id)
+    except:
+      error = sys.exc_info()[1]
+      self.logger.log(
+        enums.LogLevels.ERROR,
+        'Unable to retrieve user profile for user "%s" as lookup failed. Error: %s' % (self.user_id, str(error))
+      )
+      retrieved_profile = None
+
+    if validator.is_user_profile_valid(retrieved_profile):
+      self.user_profile = UserProfile(**retrieved_profile)
+      self.is_user_profile_retrieved = True
+    else:
+      self.logger.log(enums.LogLevels.WARNING, 'User profile has invalid format.')
+      self.user_profile = UserProfile(self.user_id)
+
+    return self.user_profile
+
+  def save_variation_for_experiment(self, experiment_id, variation_id):
+    """ Record a new decision in the user profile. It is written back on save.
+
+    Args:
+      experiment_id: ID for experiment for which the decision is to be stored.
+      variation_id: ID for variation that the user saw.
+    """
+
+    self.get_user_profile().save_variation_for_experiment(experiment_id, variation_id)
+    self.has_unsaved_decisions = True
+
+  def save(self):
+    """ Save the user profile with all new decisions, if there are any. """
+
+    if not self.has_unsaved_decisions:
+      return
+
+    self.has_unsaved_decisions = False
+    try:
+      self.user_profile_service.save(self.user_profile.__dict__)
+    except:
+      error = sys.exc_info()[1]
+      self.logger.log(enums.LogLevels.ERROR,
+                      'Unable to save user profile for user "%s". Error: %s' % (self.user_id, str(error)))
+
+
 class DecisionService(object):
   """ Class encapsulating all decision related capabilities. """
 
-  def __init__(self, config, user_profile_service):
+  def __init__(self, config, user_profile_service, decision_cache=None):
     self.bucketer = bucketer.Bucketer(config)
     self.user_profile_service = user_profile_service
+    self.decision_cache = decision_cache
     self.config = config
     self.logger = config.logger
 
@@ -41,13 +135,19 @@ class DecisionService(object):
       Variation in which the user with ID user_id is forced into. None if no variation.
     """
 
-    forced_variations = experiment.forcedVariations
+    # Most users are not whitelisted in any experiment
+    if user_id not in self.config.whitelisted_user_map:
+      return None
+
+    forced_variations = self.config.forced_variation_map.get(experiment.key)
     if forced_variations and user_id in forced_variations:
-      variation_key = forced_variations.get(user_id)
-      variation = self.config.get_variation_from_key(experiment.key, variation_key)
+      variation = forced_variations.get(user_id)
       if variation:
-        self.config.logger.log(enums.LogLevels.INFO,
-                               'User "%s" is forced in variation "%s".' % (user_id, variation_key))
+        optimizely_logger.log(self.config.logger, enums.LogLevels.INFO,
+                              'User "%s" is forced in variation "%s".', user_id, variation.key)
+      else:
+        # Report the variation key which is not in the datafile
+        self.config.get_variation_from_key(experiment.key, experiment.forcedVariations.get(user_id))
       return variation
 
     return None
@@ -69,14 +169,26 @@ class DecisionService(object):
     if variation_id:
       variation = self.config.get_variation_from_id(experiment.key, variation_id)
       if variation:
-        self.config.logger.log(enums.LogLevels.INFO,
-                               'Found a stored decision. User "%s" is in variation "%s" of experiment "%s".' %
-                               (user_id, variation.key, experiment.key))
+        optimizely_logger.log(self.config.logger, enums.LogLevels.INFO,
+                              'Found a stored decision. User "%s" is in variation "%s" of experiment "%s".',
+                              user_id, variation.key, experiment.key)
         return variation
 
     return None
 
-  def get_variation(self, experiment, user_id, attributes, ignore_user_profile=False):
+  def create_decision_context(self, user_id):
+    """ Create a decision context to share the user profile of the user across the decisions of an API call.
+
+    Args:
+      user_id: ID for user.
+
+    Returns:
+      DecisionContext for the user. Call its save method once all decisions are made.
+    """
+
+    return DecisionContext(user_id, self.user_profile_service, self.logger)
+
+  def get_variation(self, experiment, user_id, attributes, ignore_user_profile=False, decision_context=None):
     """ Top-level function to help determine variation user should be put in.
 
     First, check if experiment is running.
@@ -85,72 +197,169 @@ class DecisionService(object):
     Fourth, figure out if user is in the experiment by evaluating audience conditions if any.
     Fifth, bucket the user and return the variation.
 
+    Decisions are served from the decision cache, if any, when the user profile is not used
+    as the decision then only depends on the experiment, user ID, attributes and project config.
+
     Args:
       experiment_key: Experiment for which user variation needs to be determined.
       user_id: ID for user.
       attributes: Dict representing user attributes.
       ignore_user_profile: True to ignore the user profile lookup. Defaults to False.
+      decision_context: Optional DecisionContext shared across decisions for the user. When given, the user profile
+                        is looked up through it and new decisions are only saved when the caller saves the context.
+
+    Returns:
+      Variation user should see. None if user is not in experiment or experiment is not running.
+    """
+
+    if self.decision_cache is None or (self.user_profile_service and not ignore_user_profile):
+      return self._get_variation(experiment, user_id, attributes, ignore_user_profile, decision_context)
+
+    decision_cache_key = self.decision_cache.get_key(experiment.id, user_id, attributes)
+    if decision_cache_key is None:
+      return self._get_variation(experiment, user_id, attributes, ignore_user_profile, decision_context)
+
+    variation = self.decision_cache.get(self.config, decision_cache_key)
+    if variation is DecisionCache.MISS:
+      variation = self._get_variation(experiment, user_id, attributes, ignore_user_profile, decision_context)
+      self.decision_cache.set(self.config, decision_cache_key, variation)
+
+    return variation
+
+  def _get_variation(self, experiment, user_id, attributes, ignore_user_profile, decision_context, record=None):
+    """ Helper method to determine the variation the user should be put in, as described in get_variation.
+
+    Args:
+      experiment: Experiment for which user variation needs to be determined.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+      ignore_user_profile: True to ignore the user profile lookup.
+      decision_context: Optional DecisionContext shared across decisions for the user.
+      record: Optional DecisionRecord to time every stage which runs in and to record the decision in.
+              Stages are not timed when it is None.
 
     Returns:
       Variation user should see. None if user is not in experiment or experiment is not running.
     """
 
     # Check if experiment is running
+    start_time = perf_counter_ns() if record is not None else 0
     if not experiment_helper.is_experiment_running(experiment):
-      self.logger.log(enums.LogLevels.INFO, 'Experiment "%s" is not running.' % experiment.key)
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO, 'Experiment "%s" is not running.', experiment.key)
+      if record is not None:
+        record.add_duration(DecisionStages.RUNNING_CHECK, perf_counter_ns() - start_time)
+        record.decide(None, DecisionStages.RUNNING_CHECK)
       return None
 
     # Check to see if user is white-listed for a certain variation
+    if record is not None:
+      record.add_duration(DecisionStages.RUNNING_CHECK, perf_counter_ns() - start_time)
+      start_time = perf_counter_ns()
     variation = self.get_forced_variation(experiment, user_id)
+    if record is not None:
+      record.add_duration(DecisionStages.FORCED_VARIATION, perf_counter_ns() - start_time)
+      if variation:
+        record.decide(variation, DecisionStages.FORCED_VARIATION)
     if variation:
       return variation
 
     # Check to see if user has a decision available for the given experiment
-    user_profile = UserProfile(user_id)
+    user_profile_context = None
     if not ignore_user_profile and self.user_profile_service:
-      try:
-        retrieved_profile = self.user_profile_service.lookup(user_id)
-      except:
-        error = sys.exc_info()[1]
-        self.logger.log(
-          enums.LogLevels.ERROR,
-          'Unable to retrieve user profile for user "%s" as lookup failed. Error: %s' % (user_id, str(error))
-        )
-        retrieved_profile = None
-
-      if validator.is_user_profile_valid(retrieved_profile):
-        user_profile = UserProfile(**retrieved_profile)
+      start_time = perf_counter_ns() if record is not None else 0
+      user_profile_context = decision_context or self.create_decision_context(user_id)
+      user_profile = user_profile_context.get_user_profile()
+      if user_profile_context.is_user_profile_retrieved:
         variation = self.get_stored_variation(experiment, user_profile)
+      if record is not None:
+        record.add_duration(DecisionStages.USER_PROFILE, perf_counter_ns() - start_time)
         if variation:
-          return variation
-      else:
-        self.logger.log(enums.LogLevels.WARNING, 'User profile has invalid format.')
+          record.decide(variation, DecisionStages.USER_PROFILE)
+      if variation:
+        return variation
 
     # Bucket user and store the new decision
+    start_time = perf_counter_ns() if record is not None else 0
     if not audience_helper.is_user_in_experiment(self.config, experiment, attributes):
-      self.logger.log(
-        enums.LogLevels.INFO,
-        'User "%s" does not meet conditions to be in experiment "%s".' % (user_id, experiment.key)
-      )
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'User "%s" does not meet conditions to be in experiment "%s".', user_id, experiment.key)
+      if record is not None:
+        record.add_duration(DecisionStages.AUDIENCE, perf_counter_ns() - start_time)
+        record.decide(None, DecisionStages.AUDIENCE)
       return None
 
-    variation = self.bucketer.bucket(experiment, user_id)
+    if record is None:
+      if decision_context is None:
+        variation = self.bucketer.bucket(experiment, user_id)
+      else:
+        variation = self.bucketer.bucket(experiment, user_id, decision_context.get_find_bucket(self.bucketer))
+    else:
+      record.add_duration(DecisionStages.AUDIENCE, perf_counter_ns() - start_time)
+      find_bucket = decision_context.get_find_bucket(self.bucketer) if decision_context else self.bucketer.find_bucket
+      variation = self.bucketer.bucket(experiment, user_id, self._time_find_bucket(experiment, find_bucket, record))
+
+    if variation and user_profile_context:
+      start_time = perf_counter_ns() if record is not None else 0
+      user_profile_context.save_variation_for_experiment(experiment.id, variation.id)
+      # Without a shared context the decision is written back right away
+      if not decision_context:
+        user_profile_context.save()
+      if record is not None:
+        record.add_duration(DecisionStages.USER_PROFILE, perf_counter_ns() - start_time)
+
+    if record is not None:
+      # Bucketing can end before the traffic allocation of the group or experiment is searched
+      source = None
+      if DecisionStages.BUCKETING in record.durations:
+        source = DecisionStages.BUCKETING
+      elif DecisionStages.GROUP_BUCKETING in record.durations:
+        source = DecisionStages.GROUP_BUCKETING
+      record.decide(variation, source)
 
-    if variation:
-      # Store this new decision and return the variation for the user
-      if not ignore_user_profile and self.user_profile_service:
-        try:
-          user_profile.save_variation_for_experiment(experiment.id, variation.id)
-          self.user_profile_service.save(user_profile.__dict__)
-        except:
-          error = sys.exc_info()[1]
-          self.logger.log(enums.LogLevels.ERROR,
-                          'Unable to save user profile for user "%s". Error: %s' % (user_id, str(error)))
-      return variation
+    return variation
 
-    return None
+  @staticmethod
+  def _time_find_bucket(experiment, find_bucket, record):
+    """ Helper method to wrap a method finding buckets so that it times the bucketing stages in the record.
+
+    Args:
+      experiment: Object representing the experiment the user is bucketed into.
+      find_bucket: Method with the signature of Bucketer.find_bucket.
+      record: DecisionRecord to add the durations to.
+
+    Returns:
+      Method with the signature of Bucketer.find_bucket.
+    """
+
+    def timed_find_bucket(user_id, parent_id, traffic_allocations):
+      start_time = perf_counter_ns()
+      entity_id = find_bucket(user_id, parent_id, traffic_allocations)
+      stage = DecisionStages.BUCKETING if parent_id == experiment.id else DecisionStages.GROUP_BUCKETING
+      record.add_duration(stage, perf_counter_ns() - start_time)
+      return entity_id
+
+    return timed_find_bucket
+
+  def explain_variation(self, experiment, user_id, attributes, ignore_user_profile=False, decision_context=None):
+    """ Determine the variation user should be put in like get_variation does and describe how it was determined.
+    The decision cache is not consulted so that every stage is timed.
+
+    Args:
+      experiment: Experiment for which user variation needs to be determined.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+      ignore_user_profile: True to ignore the user profile lookup. Defaults to False.
+      decision_context: Optional DecisionContext shared across decisions for the user.
+
+    Returns:
+      DecisionRecord holding the variation, the stage which determined it and the duration of every stage which ran.
+    """
+
+    record = DecisionRecord(experiment.key, user_id)
+    self._get_variation(experiment, user_id, attributes, ignore_user_profile, decision_context, record)
+    return record
 
-  def get_variation_for_layer(self, layer, user_id, attributes=None, ignore_user_profile=False):
+  def get_variation_for_layer(self, layer, user_id, attributes=None, ignore_user_profile=False, decision_context=None):
     """ Determine which variation the user is in for a given layer.
     Returns the variation of the first experiment the user qualifies for.
 
@@ -159,6 +368,7 @@ class DecisionService(object):
       user_id: ID for user.
       attributes: Dict representing user attributes.
       ignore_user_profile: True to ignore the user profile lookup. Defaults to False.
+      decision_context: Optional DecisionContext shared across decisions for the user.
 
 
     Returns:
@@ -166,24 +376,25 @@ class DecisionService(object):
     """
     # Go through each experiment in order and try to get the variation for the user
     if layer:
-      for experiment_dict in layer.experiments:
-        experiment = self.config.get_experiment_from_key(experiment_dict['key'])
-        variation = self.get_variation(experiment, user_id, attributes, ignore_user_profile)
+      for experiment in layer.experiments:
+        variation = self.get_variation(experiment, user_id, attributes, ignore_user_profile,
+                                       decision_context=decision_context)
         if variation:
-          self.logger.log(enums.LogLevels.DEBUG,
-                          'User "%s" is in variation %s of experiment %s.' % (user_id, variation.key, experiment.key))
+          optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'User "%s" is in variation %s of experiment %s.',
+                                user_id, variation.key, experiment.key)
           # Return as soon as we get a variation
           return variation
 
     return None
 
-  def get_variation_for_feature(self, feature, user_id, attributes=None):
+  def get_variation_for_feature(self, feature, user_id, attributes=None, decision_context=None):
     """ Returns the variation the user is bucketed in for the given feature.
 
     Args:
       feature: Feature for which we are determining if it is enabled or not for the given user.
       user_id: ID for user.
       attributes: Dict representing user attributes.
+      decision_context: Optional DecisionContext shared across decisions for the user.
 
     Returns:
       Variation that the user is bucketed in. None if the user is not in any variation.
@@ -194,13 +405,13 @@ class DecisionService(object):
     if feature.groupId:
       group = self.config.get_group(feature.groupId)
       if group:
-        experiment = self.get_experiment_in_group(group, user_id)
+        experiment = self.get_experiment_in_group(group, user_id, decision_context=decision_context)
         if experiment and experiment.id in feature.experimentIds:
-          variation = self.get_variation(experiment, user_id, attributes)
+          variation = self.get_variation(experiment, user_id, attributes, decision_context=decision_context)
 
           if variation:
-            self.logger.log(enums.LogLevels.DEBUG,
-                            'User "%s" is in variation %s of experiment %s.' % (user_id, variation.key, experiment.key))
+            optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'User "%s" is in variation %s of experiment %s.',
+                                  user_id, variation.key, experiment.key)
       else:
         self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_GROUP_ID_ERROR.format('_get_variation_for_feature'))
 
@@ -209,41 +420,42 @@ class DecisionService(object):
       # If an experiment is not in a group, then the feature can only be associated with one experiment
       experiment = self.config.get_experiment_from_id(feature.experimentIds[0])
       if experiment:
-        variation = self.get_variation(experiment, user_id, attributes)
+        variation = self.get_variation(experiment, user_id, attributes, decision_context=decision_context)
 
         if variation:
-          self.logger.log(enums.LogLevels.DEBUG,
-                          'User "%s" is in variation %s of experiment %s.' % (user_id, variation.key, experiment.key))
+          optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'User "%s" is in variation %s of experiment %s.',
+                                user_id, variation.key, experiment.key)
 
     # Next check if user is part of a rollout
     if not variation and feature.layerId:
       layer = self.config.get_layer_from_id(feature.layerId)
-      variation = self.get_variation_for_layer(layer, user_id, attributes, ignore_user_profile=True)
+      variation = self.get_variation_for_layer(layer, user_id, attributes, ignore_user_profile=True,
+                                               decision_context=decision_context)
 
     return variation
 
-  def get_experiment_in_group(self, group, user_id):
+  def get_experiment_in_group(self, group, user_id, decision_context=None):
     """ Determine which experiment in the group the user is bucketed into.
 
     Args:
       group: The group to bucket the user into.
       user_id: ID of the user.
+      decision_context: Optional DecisionContext shared across decisions for the user.
 
     Returns:
       Experiment if the user is bucketed into an experiment in the specified group. None otherwise.
     """
 
-    experiment_id = self.bucketer.find_bucket(user_id, group.id, group.trafficAllocation)
+    find_bucket = decision_context.get_find_bucket(self.bucketer) if decision_context else self.bucketer.find_bucket
+    experiment_id = find_bucket(user_id, group.id, group.trafficAllocation)
     if experiment_id:
       experiment = self.config.get_experiment_from_id(experiment_id)
       if experiment:
-        self.logger.log(enums.LogLevels.INFO,
-                        'User "%s" is in experiment %s of group %s.' %
-                        (user_id, experiment.key, group.id))
+        optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                              'User "%s" is in experiment %s of group %s.', user_id, experiment.key, group.id)
         return experiment
 
-    self.logger.log(enums.LogLevels.INFO,
-                    'User "%s" is not in any experiments of group %s.' %
-                    (user_id, group.id))
+    optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                          'User "%s" is not in any experiments of group %s.', user_id, group.id)
 
     return None
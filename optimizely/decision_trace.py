@@ -0,0 +1,157 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import timeit
+
+try:
+  from time import perf_counter_ns
+except ImportError:
+  def perf_counter_ns():
+    return int(timeit.default_timer() * 1e9)
+
+
+class DecisionStages(object):
+  RUNNING_CHECK = 'running_check'
+  FORCED_VARIATION = 'forced_variation'
+  USER_PROFILE = 'user_profile'
+  AUDIENCE = 'audience'
+  GROUP_BUCKETING = 'group_bucketing'
+  BUCKETING = 'bucketing'
+
+
+class DecisionRecord(object):
+  """ Class describing how a decision was made.
+
+  experiment_key: Key of the experiment decided on.
+  user_id: ID for user.
+  variation: Variation the user should see. None if user is not in any variation.
+  source: Stage which determined the decision. One of DecisionStages.
+          None if bucketing ended before any traffic allocation was searched.
+  durations: Ordered dict mapping the stages which ran to their duration in nanoseconds.
+  """
+
+  def __init__(self, experiment_key, user_id):
+    self.experiment_key = experiment_key
+    self.user_id = user_id
+    self.variation = None
+    self.source = None
+    self.durations = collections.OrderedDict()
+
+  @property
+  def total_duration(self):
+    """ Duration in nanoseconds of all stages which ran. """
+
+    return sum(self.durations.values())
+
+  def add_duration(self, stage, duration):
+    """ Add the duration of a stage, accumulating the durations of a stage which ran more than once.
+
+    Args:
+      stage: One of DecisionStages.
+      duration: Duration in nanoseconds.
+    """
+
+    self.durations[stage] = self.durations.get(stage, 0) + duration
+
+  def decide(self, variation, source):
+    """ Record the decision and the stage which determined it.
+
+    Args:
+      variation: Variation the user should see. None if user is not in any variation.
+      source: One of DecisionStages. None if no stage determined the decision.
+
+    Returns:
+      This record.
+    """
+
+    self.variation = variation
+    self.source = source
+    return self
+
+
+class DecisionTimings(object):
+  """ Class aggregating stage durations of many decision records into histograms.
+
+  Durations are counted in buckets whose upper bounds are powers of two nanoseconds.
+  """
+
+  def __init__(self):
+    self.record_count = 0
+    self._histograms = {}
+    self._lock = threading.Lock()
+
+  def add(self, decision_record):
+    """ Count the stage durations of a decision record.
+
+    Args:
+      decision_record: DecisionRecord returned by an explain method.
+    """
+
+    with self._lock:
+      self.record_count += 1
+      for stage, duration in decision_record.durations.items():
+        histogram = self._histograms.setdefault(stage, collections.defaultdict(int))
+        # Bucket with upper bound 2^n holds durations from 2^(n-1) up to 2^n - 1
+        histogram[int(duration).bit_length()] += 1
+
+  def get_stages(self):
+    """ Get the stages which have durations, sorted by name. """
+
+    with self._lock:
+      return sorted(self._histograms)
+
+  def get_histogram(self, stage):
+    """ Get the histogram of a stage.
+
+    Args:
+      stage: One of DecisionStages.
+
+    Returns:
+      List of tuples of bucket upper bound in nanoseconds and count, ordered by upper bound.
+    """
+
+    with self._lock:
+      histogram = self._histograms.get(stage, {})
+      return [(1 << exponent, histogram[exponent]) for exponent in sorted(histogram)]
+
+  def get_count(self, stage):
+    """ Get the number of durations counted for a stage. """
+
+    return sum(count for _, count in self.get_histogram(stage))
+
+  def get_percentile(self, stage, percentile):
+    """ Get an upper bound of the given percentile of the durations of a stage.
+
+    Args:
+      stage: One of DecisionStages.
+      percentile: Number between 0 and 100.
+
+    Returns:
+      Upper bound in nanoseconds of the bucket holding the percentile. None if there are no durations.
+    """
+
+    histogram = self.get_histogram(stage)
+    total = sum(count for _, count in histogram)
+    if not total:
+      return None
+
+    threshold = total * percentile / 100.0
+    running_count = 0
+    for upper_bound, count in histogram:
+      running_count += count
+      if running_count >= threshold:
+        return upper_bound
+
+    return histogram[-1][0]
@@ -0,0 +1,84 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import timeit
+
+from .helpers import enums
+from .helpers import validator
+
+
+class DeferredValidation(object):
+  """ JSON schema validation of a datafile running on a background thread while a config built from it is served.
+
+  The outcome and duration are set once the validation completes, before the completion callback is called.
+  """
+
+  def __init__(self, datafile, revision, on_complete):
+    """ DeferredValidation init method.
+
+    Args:
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
+      revision: Revision of the datafile.
+      on_complete: Callable which is given the validation once it completes.
+    """
+
+    self.revision = revision
+    self.outcome = enums.ValidationOutcomes.PENDING
+    self.duration = None
+    self._datafile = datafile
+    self._on_complete = on_complete
+    self._completed = threading.Event()
+
+  @property
+  def is_valid(self):
+    """ Boolean True if the datafile was found valid. False if it is invalid or the validation is pending. """
+
+    return self.outcome == enums.ValidationOutcomes.VALID
+
+  def start(self):
+    """ Start validating the datafile on a background thread. """
+
+    thread = threading.Thread(target=self._run)
+    thread.daemon = True
+    thread.start()
+
+  def wait(self, timeout=None):
+    """ Wait for the validation to complete, including its completion callback.
+
+    Args:
+      timeout: Optional number of seconds to wait for. By default there is no limit.
+
+    Returns:
+      Boolean True if the validation completed. False if the timeout expired before.
+    """
+
+    return self._completed.wait(timeout)
+
+  def _run(self):
+    """ Validate the datafile and call the completion callback. """
+
+    start_time = timeit.default_timer()
+    try:
+      is_valid = validator.is_datafile_valid(self._datafile)
+    except:
+      is_valid = False
+    self.duration = timeit.default_timer() - start_time
+    self.outcome = enums.ValidationOutcomes.VALID if is_valid else enums.ValidationOutcomes.INVALID
+    # The config built from the datafile does not need it, so it is not kept alive any longer
+    self._datafile = None
+
+    try:
+      self._on_complete(self)
+    finally:
+      self._completed.set()
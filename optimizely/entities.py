@@ -12,23 +12,72 @@
 # limitations under the License.
 
 
+import sys
+
+try:
+  _intern = sys.intern
+  _unicode = None
+except AttributeError:
+  _intern = intern
+  _unicode = unicode
+
+# Identifiers decoded as unicode strings on Python 2, where intern only takes byte strings.
+# They are kept for the lifetime of the process, like the identifiers of every datafile loaded by then.
+_interned_unicode_ids = {}
+
+
+def intern_id(value):
+  """ Intern an ID or key, so that every entity and map referring to it shares one string.
+
+  Args:
+    value: ID or key from the datafile.
+
+  Returns:
+    Interned string. Values of other types, which can not be interned, are returned as is.
+  """
+
+  value_type = type(value)
+  if value_type is str:
+    return _intern(value)
+  if value_type is _unicode:
+    return _interned_unicode_ids.setdefault(value, value)
+  return value
+
+
 class BaseEntity(object):
+  """ Entities declare their fields as __slots__, so that they take no memory for a __dict__ each. """
+
+  __slots__ = ()
 
   def __eq__(self, other):
-    return self.__dict__ == other.__dict__
+    if self.__class__ is not other.__class__:
+      return False
+
+    for field in self.__slots__:
+      if getattr(self, field) != getattr(other, field):
+        return False
+
+    return True
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
 
 
 class Attribute(BaseEntity):
 
+  __slots__ = ('id', 'key')
+
   def __init__(self, id, key, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
 
 
 class Audience(BaseEntity):
 
+  __slots__ = ('id', 'name', 'conditions', 'conditionStructure', 'conditionList')
+
   def __init__(self, id, name, conditions, conditionStructure=None, conditionList=None, **kwargs):
-    self.id = id
+    self.id = intern_id(id)
     self.name = name
     self.conditions = conditions
     self.conditionStructure = conditionStructure
@@ -37,43 +86,52 @@ class Audience(BaseEntity):
 
 class Event(BaseEntity):
 
+  __slots__ = ('id', 'key', 'experimentIds')
+
   def __init__(self, id, key, experimentIds, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
     self.experimentIds = experimentIds
 
 
 class Experiment(BaseEntity):
 
+  __slots__ = ('id', 'key', 'status', 'audienceIds', 'variations', 'forcedVariations', 'trafficAllocation', 'layerId',
+               'groupId', 'groupPolicy')
+
   def __init__(self, id, key, status, audienceIds, variations, forcedVariations,
                trafficAllocation, layerId, groupId=None, groupPolicy=None, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
     self.status = status
     self.audienceIds = audienceIds
     self.variations = variations
     self.forcedVariations = forcedVariations
     self.trafficAllocation = trafficAllocation
-    self.layerId = layerId
-    self.groupId = groupId
+    self.layerId = intern_id(layerId)
+    self.groupId = intern_id(groupId)
     self.groupPolicy = groupPolicy
 
 
 class Feature(BaseEntity):
 
+  __slots__ = ('id', 'key', 'experimentIds', 'layerId', 'variables', 'groupId')
+
   def __init__(self, id, key, experimentIds, layerId, variables, groupId=None, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
     self.experimentIds = experimentIds
-    self.layerId = layerId
+    self.layerId = intern_id(layerId)
     self.variables = variables
-    self.groupId = groupId
+    self.groupId = intern_id(groupId)
 
 
 class Group(BaseEntity):
 
+  __slots__ = ('id', 'policy', 'experiments', 'trafficAllocation')
+
   def __init__(self, id, policy, experiments, trafficAllocation, **kwargs):
-    self.id = id
+    self.id = intern_id(id)
     self.policy = policy
     self.experiments = experiments
     self.trafficAllocation = trafficAllocation
@@ -81,14 +139,18 @@ class Group(BaseEntity):
 
 class Layer(BaseEntity):
 
+  __slots__ = ('id', 'policy', 'experiments')
+
   def __init__(self, id, policy, experiments, **kwargs):
-    self.id = id
+    self.id = intern_id(id)
     self.policy = policy
     self.experiments = experiments
 
 
 class Variable(BaseEntity):
 
+  __slots__ = ('id', 'key', 'type', 'defaultValue')
+
   class Type(object):
     BOOLEAN = 'boolean'
     DOUBLE = 'double'
@@ -96,21 +158,25 @@ class Variable(BaseEntity):
     STRING = 'string'
 
   def __init__(self, id, key, type, defaultValue, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
     self.type = type
     self.defaultValue = defaultValue
 
 
 class Variation(BaseEntity):
 
+  __slots__ = ('id', 'key', 'variables')
+
   class VariableUsage(BaseEntity):
 
+    __slots__ = ('id', 'value')
+
     def __init__(self, id, value, **kwards):
-      self.id = id
+      self.id = intern_id(id)
       self.value = value
 
   def __init__(self, id, key, variables=None, **kwargs):
-    self.id = id
-    self.key = key
+    self.id = intern_id(id)
+    self.key = intern_id(key)
     self.variables = variables or []
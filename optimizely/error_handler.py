@@ -31,3 +31,20 @@ class RaiseExceptionErrorHandler(BaseErrorHandler):
   @staticmethod
   def handle_error(error):
     raise error
+
+
+def handle_error(error_handler, exception_class, message):
+  """ Hand an exception to the error handler, constructing it only if the handler does something with it.
+
+  Args:
+    error_handler: Provides a handle_error method to handle exceptions.
+    exception_class: Class of the exception to hand to the error handler.
+    message: Message of the exception.
+  """
+
+  handle = error_handler.handle_error
+  # Handlers which do not override handle_error suppress all exceptions
+  if handle is BaseErrorHandler.handle_error:
+    return
+
+  handle(exception_class(message))
@@ -31,69 +31,71 @@ class Event(object):
 
 
 class BaseEventBuilder(object):
-  """ Base class which encapsulates methods to build events for tracking impressions and conversions. """
+  """ Base class which encapsulates methods to build events for tracking impressions and conversions.
+  Params are built in a dict local to every create method call so that a builder can be shared across threads. """
 
   def __init__(self, config):
     self.config = config
-    self.params = {}
 
   @abstractproperty
   class EventParams(object):
     pass
 
-  def _add_project_id(self):
+  def _add_project_id(self, params):
     """ Add project ID to the event. """
 
-    self.params[self.EventParams.PROJECT_ID] = self.config.get_project_id()
+    params[self.EventParams.PROJECT_ID] = self.config.get_project_id()
 
-  def _add_account_id(self):
+  def _add_account_id(self, params):
     """ Add account ID to the event. """
 
-    self.params[self.EventParams.ACCOUNT_ID] = self.config.get_account_id()
+    params[self.EventParams.ACCOUNT_ID] = self.config.get_account_id()
 
-  def _add_user_id(self, user_id):
+  def _add_user_id(self, params, user_id):
     """ Add user ID to the event. """
 
-    self.params[self.EventParams.END_USER_ID] = user_id
+    params[self.EventParams.END_USER_ID] = user_id
 
   @abstractmethod
-  def _add_attributes(self, attributes):
+  def _add_attributes(self, params, attributes):
     """ Add attribute(s) information to the event.
 
     Args:
+      params: Dict holding the params of the event being built.
       attributes: Dict representing user attributes and values which need to be recorded.
     """
     pass
 
   @abstractmethod
-  def _add_source(self):
+  def _add_source(self, params):
     """ Add source information to the event. """
     pass
 
   @abstractmethod
-  def _add_time(self):
+  def _add_time(self, params):
     """ Add time information to the event. """
     pass
 
-  def _add_revision(self):
+  def _add_revision(self, params):
     """ Add datafile revision information to the event. """
     pass
 
-  def _add_common_params(self, user_id, attributes):
+  def _add_common_params(self, params, user_id, attributes):
     """ Add params which are used same in both conversion and impression events.
 
     Args:
+      params: Dict holding the params of the event being built.
       user_id: ID for user.
       attributes: Dict representing user attributes and values which need to be recorded.
     """
 
-    self._add_project_id()
-    self._add_account_id()
-    self._add_user_id(user_id)
-    self._add_attributes(attributes)
-    self._add_source()
-    self._add_revision()
-    self._add_time()
+    self._add_project_id(params)
+    self._add_account_id(params)
+    self._add_user_id(params, user_id)
+    self._add_attributes(params, attributes)
+    self._add_source(params)
+    self._add_revision(params)
+    self._add_time(params)
 
 
 class EventBuilder(BaseEventBuilder):
@@ -127,14 +129,15 @@ class EventBuilder(BaseEventBuilder):
     IS_GLOBAL_HOLDBACK = 'isGlobalHoldback'
     IS_LAYER_HOLDBACK = 'isLayerHoldback'
 
-  def _add_attributes(self, attributes):
+  def _add_attributes(self, params, attributes):
     """ Add attribute(s) information to the event.
 
     Args:
+      params: Dict holding the params of the event being built.
       attributes: Dict representing user attributes and values which need to be recorded.
     """
 
-    self.params[self.EventParams.USER_FEATURES] = []
+    params[self.EventParams.USER_FEATURES] = []
     if not attributes:
       return
 
@@ -144,7 +147,7 @@ class EventBuilder(BaseEventBuilder):
       if attribute_value:
         attribute = self.config.get_attribute(attribute_key)
         if attribute:
-          self.params[self.EventParams.USER_FEATURES].append({
+          params[self.EventParams.USER_FEATURES].append({
             'id': attribute.id,
             'name': attribute_key,
             'type': 'custom',
@@ -152,54 +155,56 @@ class EventBuilder(BaseEventBuilder):
             'shouldIndex': True
           })
 
-  def _add_source(self):
+  def _add_source(self, params):
     """ Add source information to the event. """
 
-    self.params[self.EventParams.SOURCE_SDK_TYPE] = 'python-sdk'
-    self.params[self.EventParams.SOURCE_SDK_VERSION] = version.__version__
+    params[self.EventParams.SOURCE_SDK_TYPE] = 'python-sdk'
+    params[self.EventParams.SOURCE_SDK_VERSION] = version.__version__
 
-  def _add_revision(self):
+  def _add_revision(self, params):
     """ Add datafile revision information to the event. """
-    self.params[self.EventParams.REVISION] = self.config.get_revision()
+    params[self.EventParams.REVISION] = self.config.get_revision()
 
-  def _add_time(self):
+  def _add_time(self, params):
     """ Add time information to the event. """
 
-    self.params[self.EventParams.TIME] = int(round(time.time() * 1000))
+    params[self.EventParams.TIME] = int(round(time.time() * 1000))
 
-  def _add_required_params_for_impression(self, experiment, variation_id):
+  def _add_required_params_for_impression(self, params, experiment, variation_id):
     """ Add parameters that are required for the impression event to register.
 
     Args:
+      params: Dict holding the params of the event being built.
       experiment: Experiment for which impression needs to be recorded.
       variation_id: ID for variation which would be presented to user.
     """
 
-    self.params[self.EventParams.IS_GLOBAL_HOLDBACK] = False
-    self.params[self.EventParams.LAYER_ID] = experiment.layerId
-    self.params[self.EventParams.DECISION] = {
+    params[self.EventParams.IS_GLOBAL_HOLDBACK] = False
+    params[self.EventParams.LAYER_ID] = experiment.layerId
+    params[self.EventParams.DECISION] = {
       self.EventParams.EXPERIMENT_ID: experiment.id,
       self.EventParams.VARIATION_ID: variation_id,
       self.EventParams.IS_LAYER_HOLDBACK: False
     }
 
-  def _add_required_params_for_conversion(self, event_key, event_tags, decisions):
+  def _add_required_params_for_conversion(self, params, event_key, event_tags, decisions):
     """ Add parameters that are required for the conversion event to register.
 
     Args:
+      params: Dict holding the params of the event being built.
       event_key: Key representing the event which needs to be recorded.
       event_tags: Dict representing metadata associated with the event.
       decisions: List of tuples representing valid experiments IDs and variation IDs.
     """
 
-    self.params[self.EventParams.IS_GLOBAL_HOLDBACK] = False
-    self.params[self.EventParams.EVENT_FEATURES] = []
-    self.params[self.EventParams.EVENT_METRICS] = []
+    params[self.EventParams.IS_GLOBAL_HOLDBACK] = False
+    params[self.EventParams.EVENT_FEATURES] = []
+    params[self.EventParams.EVENT_METRICS] = []
 
     if event_tags:
       event_value = event_tag_utils.get_revenue_value(event_tags)
       if event_value is not None:
-        self.params[self.EventParams.EVENT_METRICS] = [{
+        params[self.EventParams.EVENT_METRICS] = [{
           'name': event_tag_utils.EVENT_VALUE_METRIC,
           'value': event_value
         }]
@@ -215,12 +220,12 @@ class EventBuilder(BaseEventBuilder):
           'value': event_tag_value,
           'shouldIndex': False,
         }
-        self.params[self.EventParams.EVENT_FEATURES].append(event_feature)
+        params[self.EventParams.EVENT_FEATURES].append(event_feature)
 
-    self.params[self.EventParams.LAYER_STATES] = []
+    params[self.EventParams.LAYER_STATES] = []
     for experiment_id, variation_id in decisions:
       experiment = self.config.get_experiment_from_id(experiment_id)
-      self.params[self.EventParams.LAYER_STATES].append({
+      params[self.EventParams.LAYER_STATES].append({
         self.EventParams.LAYER_ID: experiment.layerId,
         self.EventParams.REVISION: self.config.get_revision(),
         self.EventParams.ACTION_TRIGGERED: True,
@@ -231,8 +236,8 @@ class EventBuilder(BaseEventBuilder):
         }
       })
 
-    self.params[self.EventParams.EVENT_ID] = self.config.get_event(event_key).id
-    self.params[self.EventParams.EVENT_NAME] = event_key
+    params[self.EventParams.EVENT_ID] = self.config.get_event(event_key).id
+    params[self.EventParams.EVENT_NAME] = event_key
 
   def create_impression_event(self, experiment, variation_id, user_id, attributes):
     """ Create impression Event to be sent to the logging endpoint.
@@ -247,11 +252,11 @@ class EventBuilder(BaseEventBuilder):
       Event object encapsulating the impression event.
     """
 
-    self.params = {}
-    self._add_common_params(user_id, attributes)
-    self._add_required_params_for_impression(experiment, variation_id)
+    params = {}
+    self._add_common_params(params, user_id, attributes)
+    self._add_required_params_for_impression(params, experiment, variation_id)
     return Event(self.IMPRESSION_ENDPOINT,
-                 self.params,
+                 params,
                  http_verb=self.HTTP_VERB,
                  headers=self.HTTP_HEADERS)
 
@@ -269,11 +274,11 @@ class EventBuilder(BaseEventBuilder):
       Event object encapsulating the conversion event.
     """
 
-    self.params = {}
-    self._add_common_params(user_id, attributes)
-    self._add_required_params_for_conversion(event_key, event_tags, decisions)
+    params = {}
+    self._add_common_params(params, user_id, attributes)
+    self._add_required_params_for_conversion(params, event_key, event_tags, decisions)
     return Event(self.CONVERSION_ENDPOINT,
-                 self.params,
+                 params,
                  http_verb=self.HTTP_VERB,
                  headers=self.HTTP_HEADERS)
 
@@ -307,14 +312,15 @@ class EventBuilderV3(BaseEventBuilder):
     SOURCE_SDK_VERSION = 'client_version'
     CUSTOM = 'custom'
 
-  def _add_attributes(self, attributes):
+  def _add_attributes(self, params, attributes):
     """ Add attribute(s) information to the event.
 
     Args:
+      params: Dict holding the params of the event being built.
       attributes: Dict representing user attributes and values which need to be recorded.
     """
 
-    visitor = self.params[self.EventParams.USERS][0]
+    visitor = params[self.EventParams.USERS][0]
     visitor[self.EventParams.ATTRIBUTES] = []
 
     if not attributes:
@@ -333,44 +339,46 @@ class EventBuilderV3(BaseEventBuilder):
             'value': attribute_value,
           })
 
-  def _add_source(self):
+  def _add_source(self, params):
     """ Add source information to the event. """
 
-    self.params[self.EventParams.SOURCE_SDK_TYPE] = 'python-sdk'
-    self.params[self.EventParams.SOURCE_SDK_VERSION] = version.__version__
+    params[self.EventParams.SOURCE_SDK_TYPE] = 'python-sdk'
+    params[self.EventParams.SOURCE_SDK_VERSION] = version.__version__
 
-  def _add_time(self):
+  def _add_time(self, params):
     """ Add time information to the event. """
 
-    self.params[self.EventParams.TIME] = int(round(time.time() * 1000))
+    params[self.EventParams.TIME] = int(round(time.time() * 1000))
 
-  def _add_visitor(self, user_id):
+  def _add_visitor(self, params, user_id):
     """ Add user to the event """
 
-    self.params[self.EventParams.USERS] = []
+    params[self.EventParams.USERS] = []
     # Add a single visitor
     visitor = {}
     visitor[self.EventParams.END_USER_ID] = user_id
     visitor[self.EventParams.SNAPSHOTS] = []
-    self.params[self.EventParams.USERS].append(visitor)
+    params[self.EventParams.USERS].append(visitor)
 
-  def _add_common_params(self, user_id, attributes):
+  def _add_common_params(self, params, user_id, attributes):
     """ Add params which are used same in both conversion and impression events.
 
     Args:
+      params: Dict holding the params of the event being built.
       user_id: ID for user.
       attributes: Dict representing user attributes and values which need to be recorded.
     """
-    self._add_project_id()
-    self._add_account_id()
-    self._add_visitor(user_id)
-    self._add_attributes(attributes)
-    self._add_source()
+    self._add_project_id(params)
+    self._add_account_id(params)
+    self._add_visitor(params, user_id)
+    self._add_attributes(params, attributes)
+    self._add_source(params)
 
-  def _add_required_params_for_impression(self, experiment, variation_id):
+  def _add_required_params_for_impression(self, params, experiment, variation_id):
     """ Add parameters that are required for the impression event to register.
 
     Args:
+      params: Dict holding the params of the event being built.
       experiment: Experiment for which impression needs to be recorded.
       variation_id: ID for variation which would be presented to user.
     """
@@ -389,19 +397,20 @@ class EventBuilderV3(BaseEventBuilder):
       self.EventParams.UUID: str(uuid.uuid4())
     }]
 
-    visitor = self.params[self.EventParams.USERS][0]
+    visitor = params[self.EventParams.USERS][0]
     visitor[self.EventParams.SNAPSHOTS].append(snapshot)
 
-  def _add_required_params_for_conversion(self, event_key, event_tags, decisions):
+  def _add_required_params_for_conversion(self, params, event_key, event_tags, decisions):
     """ Add parameters that are required for the conversion event to register.
 
     Args:
+      params: Dict holding the params of the event being built.
       event_key: Key representing the event which needs to be recorded.
       event_tags: Dict representing metadata associated with the event.
       decisions: List of tuples representing valid experiments IDs and variation IDs.
     """
 
-    visitor = self.params[self.EventParams.USERS][0]
+    visitor = params[self.EventParams.USERS][0]
 
     for experiment_id, variation_id in decisions:
       snapshot = {}
@@ -445,12 +454,12 @@ class EventBuilderV3(BaseEventBuilder):
       Event object encapsulating the impression event.
     """
 
-    self.params = {}
-    self._add_common_params(user_id, attributes)
-    self._add_required_params_for_impression(experiment, variation_id)
+    params = {}
+    self._add_common_params(params, user_id, attributes)
+    self._add_required_params_for_impression(params, experiment, variation_id)
 
     return Event(self.EVENTS_URL,
-                 self.params,
+                 params,
                  http_verb=self.HTTP_VERB,
                  headers=self.HTTP_HEADERS)
 
@@ -468,10 +477,10 @@ class EventBuilderV3(BaseEventBuilder):
       Event object encapsulating the conversion event.
     """
 
-    self.params = {}
-    self._add_common_params(user_id, attributes)
-    self._add_required_params_for_conversion(event_key, event_tags, decisions)
+    params = {}
+    self._add_common_params(params, user_id, attributes)
+    self._add_required_params_for_conversion(params, event_key, event_tags, decisions)
     return Event(self.EVENTS_URL,
-                 self.params,
+                 params,
                  http_verb=self.HTTP_VERB,
                  headers=self.HTTP_HEADERS)
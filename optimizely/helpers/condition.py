@@ -11,7 +11,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
+from . import datafile as datafile_helper
 
 
 class ConditionalOperatorTypes(object):
@@ -162,6 +162,25 @@ def _audience_condition_deserializer(obj_dict):
   return [obj_dict.get('name'), obj_dict.get('value')]
 
 
+def _apply_object_hook(obj, object_hook):
+  """ Helper method to replace every dict in a decoded JSON value with what object_hook returns for it,
+  in the order json.JSONDecoder calls object_hook: nested dicts before the dicts holding them.
+
+  Args:
+    obj: Decoded JSON value.
+    object_hook: Method taking a dict.
+
+  Returns:
+    Decoded JSON value with every dict replaced.
+  """
+
+  if isinstance(obj, dict):
+    return object_hook(dict((key, _apply_object_hook(value, object_hook)) for key, value in obj.items()))
+  if isinstance(obj, list):
+    return [_apply_object_hook(item, object_hook) for item in obj]
+  return obj
+
+
 def loads(conditions_string):
   """ Deserializes the conditions property into its corresponding
   components: the condition_structure and the condition_list.
@@ -176,12 +195,9 @@ def loads(conditions_string):
   """
   decoder = ConditionDecoder(_audience_condition_deserializer)
 
-  # Create a custom JSONDecoder using the ConditionDecoder's object_hook method
-  # to create the condition_structure as well as populate the condition_list
-  json_decoder = json.JSONDecoder(object_hook=decoder.object_hook)
-
-  # Perform the decoding
-  condition_structure = json_decoder.decode(conditions_string)
+  # Decode with the JSON library used for the datafile, then pass every dict to the ConditionDecoder's object_hook
+  # method to create the condition_structure as well as populate the condition_list
+  condition_structure = _apply_object_hook(datafile_helper.loads(conditions_string), decoder.object_hook)
   condition_list = decoder.condition_list
 
   return (condition_structure, condition_list)
@@ -0,0 +1,54 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+try:
+  import orjson
+except ImportError:
+  orjson = None
+try:
+  import ujson
+except ImportError:
+  ujson = None
+
+if orjson is not None:
+  JSON_BACKEND = 'orjson'
+  _decode = orjson.loads
+elif ujson is not None:
+  JSON_BACKEND = 'ujson'
+  _decode = ujson.loads
+else:
+  JSON_BACKEND = 'json'
+  _decode = json.loads
+
+
+def loads(datafile):
+  """ Decode the datafile, using the fastest JSON library available.
+
+  Args:
+    datafile: JSON string or bytes representing the project, or dict it was already decoded into.
+
+  Returns:
+    Dict representing the project.
+
+  Raises:
+    Exception if the datafile can not be decoded.
+  """
+
+  if isinstance(datafile, dict):
+    return datafile
+
+  if isinstance(datafile, bytes) and JSON_BACKEND == 'json':
+    datafile = datafile.decode('utf-8')
+
+  return _decode(datafile)
@@ -39,5 +39,18 @@ class Errors(object):
   INVALID_DATAFILE = 'Datafile has invalid format. Failing "{}".'
   INVALID_GROUP_ID_ERROR = 'Provided group is not in datafile.'
   INVALID_VARIATION_ERROR = 'Provided variation is not in datafile.'
+  LAZY_CONFIG_WITH_CONFIG_FILE = 'Provided "lazy_config" can not be combined with a config snapshot or shared ' \
+                                 'config, as writing either builds every entity.'
   UNSUPPORTED_DATAFILE_VERSION = 'Provided datafile has unsupported version. ' \
                                  'Please use SDK version 1.1.0 or earlier for datafile version 1.'
+
+
+class ValidationFailurePolicies(object):
+  INVALIDATE = 'invalidate'
+  KEEP_LAST_VALID = 'keep_last_valid'
+
+
+class ValidationOutcomes(object):
+  PENDING = 'pending'
+  VALID = 'valid'
+  INVALID = 'invalid'
@@ -11,34 +11,140 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 import jsonschema
+import numbers
 
 from optimizely.user_profile import UserProfile
 from . import constants
+from . import datafile as datafile_helper
+
+try:
+  STRING_TYPES = (basestring,)
+except NameError:
+  STRING_TYPES = (str,)
+
+# Checks of the Draft 4 primitive types. Booleans are not numbers in JSON, though they are in Python
+TYPE_CHECKS = {
+  'array': lambda instance: isinstance(instance, list),
+  'boolean': lambda instance: isinstance(instance, bool),
+  'integer': lambda instance: isinstance(instance, numbers.Integral) and not isinstance(instance, bool),
+  'null': lambda instance: instance is None,
+  'number': lambda instance: isinstance(instance, numbers.Number) and not isinstance(instance, bool),
+  'object': lambda instance: isinstance(instance, dict),
+  'string': lambda instance: isinstance(instance, STRING_TYPES)
+}
+
+# Keywords the schema compiler supports, which are all that constants.JSON_SCHEMA uses
+COMPILABLE_KEYWORDS = frozenset(['$schema', 'items', 'properties', 'required', 'type'])
+
+_datafile_validator = None
+
+
+def _is_compilable(schema):
+  """ Determine if the schema only uses keywords which the schema compiler supports.
+
+  Args:
+    schema: Dict representing a JSON schema.
+
+  Returns:
+    Boolean depending upon whether the schema can be compiled or not.
+  """
+
+  if not set(schema).issubset(COMPILABLE_KEYWORDS):
+    return False
+
+  types = schema.get('type', [])
+  if not all(schema_type in TYPE_CHECKS for schema_type in (types if isinstance(types, list) else [types])):
+    return False
+
+  if 'items' in schema and not (isinstance(schema['items'], dict) and _is_compilable(schema['items'])):
+    return False
+
+  return all(_is_compilable(property_schema) for property_schema in schema.get('properties', {}).values())
+
+
+def _compile_schema(schema):
+  """ Compile a JSON schema into a function checking instances against it, which only visits what the schema
+  constrains instead of interpreting the schema at every node as jsonschema does.
+
+  Args:
+    schema: Dict representing a JSON schema for which _is_compilable holds.
+
+  Returns:
+    Function taking an instance and returning a boolean depending upon whether it is valid or not.
+  """
+
+  checks = []
+
+  if 'type' in schema:
+    types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+    if len(types) == 1:
+      checks.append(TYPE_CHECKS[types[0]])
+    else:
+      type_checks = [TYPE_CHECKS[schema_type] for schema_type in types]
+      checks.append(lambda instance: any(type_check(instance) for type_check in type_checks))
+
+  if schema.get('required'):
+    required = list(schema['required'])
+    checks.append(lambda instance: not isinstance(instance, dict) or all(name in instance for name in required))
+
+  if schema.get('properties'):
+    property_checks = [(name, _compile_schema(property_schema))
+                       for name, property_schema in schema['properties'].items()]
+
+    def check_properties(instance):
+      if not isinstance(instance, dict):
+        return True
+      for name, property_check in property_checks:
+        if name in instance and not property_check(instance[name]):
+          return False
+      return True
+
+    checks.append(check_properties)
+
+  if 'items' in schema:
+    item_check = _compile_schema(schema['items'])
+    checks.append(lambda instance: not isinstance(instance, list) or all(item_check(item) for item in instance))
+
+  if len(checks) == 1:
+    return checks[0]
+  return lambda instance: all(check(instance) for check in checks)
+
+
+def _get_datafile_validator():
+  """ Get the function validating decoded datafiles against constants.JSON_SCHEMA, which is built once per process.
+
+  Returns:
+    Function taking a decoded datafile and returning a boolean depending upon whether it is valid or not.
+  """
+
+  global _datafile_validator
+
+  if _datafile_validator is None:
+    if _is_compilable(constants.JSON_SCHEMA):
+      _datafile_validator = _compile_schema(constants.JSON_SCHEMA)
+    else:
+      _datafile_validator = jsonschema.Draft4Validator(constants.JSON_SCHEMA).is_valid
+
+  return _datafile_validator
 
 
 def is_datafile_valid(datafile):
   """ Given a datafile determine if it is valid or not.
 
   Args:
-    datafile: JSON string representing the project.
+    datafile: JSON string or bytes representing the project, or dict it was decoded into.
 
   Returns:
     Boolean depending upon whether datafile is valid or not.
   """
 
   try:
-    datafile_json = json.loads(datafile)
+    datafile_json = datafile_helper.loads(datafile)
   except:
     return False
 
-  try:
-    jsonschema.Draft4Validator(constants.JSON_SCHEMA).validate(datafile_json)
-  except:
-    return False
-
-  return True
+  return _get_datafile_validator()(datafile_json)
 
 
 def _has_method(obj, method):
@@ -0,0 +1,306 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+try:
+  from collections.abc import Mapping
+except ImportError:
+  from collections import Mapping
+
+from .helpers import datafile as datafile_helper
+from . import entities
+from .lookup_miss_cache import LookupMissCache
+from .project_config import ProjectConfig
+from .project_config import UNSUPPORTED_VERSIONS
+
+
+class LazyMap(Mapping):
+  """ Read-only map which builds the value of a key from its source on first access and keeps it.
+  Values are built under a lock, so that all threads get the same object for a key. """
+
+  def __init__(self, sources, build_value, lock):
+    """ LazyMap init method.
+
+    Args:
+      sources: Dict mapping every key of the map to what its value is built from.
+      build_value: Callable which is given a key and its source and returns the value.
+      lock: Lock held while building values. Shared by the maps of a config as values are built from one another.
+    """
+
+    self._sources = sources
+    self._build_value = build_value
+    self._lock = lock
+    self._values = {}
+
+  def __getitem__(self, key):
+    value = self._values.get(key, self._values)
+    if value is not self._values:
+      return value
+
+    if key not in self._sources:
+      raise KeyError(key)
+
+    with self._lock:
+      # Another thread may have built the value while this one was waiting for the lock
+      value = self._values.get(key, self._values)
+      if value is self._values:
+        value = self._build_value(key, self._sources[key])
+        self._values[key] = value
+
+    return value
+
+  def __contains__(self, key):
+    return key in self._sources
+
+  def __iter__(self):
+    return iter(self._sources)
+
+  def __len__(self):
+    return len(self._sources)
+
+  def __reduce__(self):
+    # Pickle the values rather than the sources and the lock
+    return dict, (dict(self),)
+
+
+class LazyProjectConfig(ProjectConfig):
+  """ Project config which builds entities and their maps on first access.
+
+  Loading only indexes the dicts of the datafile by key, so a service which uses few of the experiments and features
+  of a large datafile neither waits for nor holds the entities of the others. Lookups return the same objects as
+  long as the config is in use, like those of ProjectConfig.
+  """
+
+  def __init__(self, datafile, logger, error_handler):
+    """ LazyProjectConfig init method to index the datafile for building entities later on.
+
+    Args:
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
+                The dict is used as is, so it should not be modified afterwards.
+      logger: Provides a log message to send log messages to.
+      error_handler: Provides a handle_error method to handle exceptions.
+    """
+
+    config = datafile_helper.loads(datafile)
+    self.parsing_succeeded = False
+    self.logger = logger
+    self.error_handler = error_handler
+    self.lookup_misses = LookupMissCache()
+    self.version = config.get('version')
+    if self.version in UNSUPPORTED_VERSIONS:
+      return
+    self.account_id = config.get('accountId')
+    self.project_id = config.get('projectId')
+    self.revision = config.get('revision')
+    self.groups = config.get('groups', [])
+    self.experiments = config.get('experiments', [])
+    self.events = config.get('events', [])
+    self.attributes = config.get('attributes', [])
+    self.audiences = config.get('audiences', [])
+    self.features = config.get('features', [])
+    self.layers = config.get('layers', [])
+    # Entities are built on first access, so there is nothing for a later config to reuse
+    self._entity_sources = {}
+
+    group_sources = {}
+    for group_dict in self.groups:
+      group_sources[group_dict['id']] = group_dict
+
+    # Experiments take precedence in the same order as in ProjectConfig: groups over layers over the rest
+    experiment_sources = {}
+    for experiment_dict in self.experiments:
+      experiment_sources[experiment_dict['key']] = (experiment_dict, None)
+    for layer_dict in self.layers:
+      for experiment_dict in layer_dict['experiments']:
+        experiment_sources[experiment_dict['key']] = (experiment_dict, None)
+    for group_dict in self.groups:
+      for experiment_dict in group_dict['experiments']:
+        experiment_sources[experiment_dict['key']] = (experiment_dict, group_dict)
+
+    experiment_id_sources = {}
+    variation_sources = {}
+    whitelisted_user_sources = {}
+    for experiment_key, (experiment_dict, _) in experiment_sources.items():
+      experiment_id_sources[experiment_dict['id']] = experiment_key
+      for variation_dict in experiment_dict['variations']:
+        if variation_dict.get('variables'):
+          variation_sources[variation_dict['id']] = experiment_key
+      for user_id in experiment_dict['forcedVariations']:
+        whitelisted_user_sources.setdefault(user_id, []).append(experiment_key)
+
+    # Variations of the experiments and rollouts of features take the default values of the feature variables
+    variable_type_sources = {}
+    variable_value_sources = dict((variation_id, []) for variation_id in variation_sources)
+    layer_experiment_keys = {}
+    for layer_dict in self.layers:
+      layer_experiment_keys[layer_dict['id']] = [experiment_dict['key']
+                                                 for experiment_dict in layer_dict['experiments']]
+    for feature_dict in self.features:
+      for variable_dict in feature_dict['variables']:
+        variable_type_sources[variable_dict['id']] = variable_dict['type']
+      experiment_keys = [experiment_id_sources[experiment_id] for experiment_id in feature_dict['experimentIds']
+                         if experiment_id in experiment_id_sources]
+      experiment_keys.extend(layer_experiment_keys.get(feature_dict['layerId'], []))
+      for experiment_key in experiment_keys:
+        if experiment_key not in experiment_sources:
+          continue
+        for variation_dict in experiment_sources[experiment_key][0]['variations']:
+          variable_value_sources.setdefault(variation_dict['id'], []).append(feature_dict['key'])
+    self._variable_type_map = variable_type_sources
+
+    traffic_allocation_sources = dict((experiment_id, experiment_id) for experiment_id in experiment_id_sources)
+    traffic_allocation_sources.update((group_id, group_id) for group_id in group_sources)
+
+    lock = threading.RLock()
+    self.group_id_map = LazyMap(group_sources, self._build_group, lock)
+    self.experiment_key_map = LazyMap(experiment_sources, self._build_experiment, lock)
+    self.experiment_id_map = LazyMap(experiment_id_sources, self._get_experiment, lock)
+    self.event_key_map = self._generate_lazy_key_map(self.events, 'key', entities.Event, lock)
+    self.attribute_key_map = self._generate_lazy_key_map(self.attributes, 'key', entities.Attribute, lock)
+    self.audience_id_map = LazyMap(
+      dict((audience_dict['id'], audience_dict) for audience_dict in self.audiences), self._build_audience, lock
+    )
+    self.layer_id_map = LazyMap(
+      dict((entities.intern_id(layer_dict['id']), layer_dict) for layer_dict in self.layers), self._build_layer, lock
+    )
+    self.variation_key_map = LazyMap(experiment_sources, self._build_variation_key_map, lock)
+    self.variation_id_map = LazyMap(experiment_sources, self._build_variation_id_map, lock)
+    self.variation_variable_usage_map = LazyMap(variation_sources, self._build_variable_usage_map, lock)
+    self.variation_variable_value_map = LazyMap(variable_value_sources, self._build_variable_value_map, lock)
+    self.forced_variation_map = LazyMap(experiment_sources, self._build_forced_variation_map, lock)
+    self.whitelisted_user_map = LazyMap(whitelisted_user_sources, self._build_whitelisted_variations, lock)
+    self.traffic_allocation_index_map = LazyMap(traffic_allocation_sources, self._build_traffic_allocation_index, lock)
+    self.feature_key_map = LazyMap(
+      dict((feature_dict['key'], feature_dict) for feature_dict in self.features), self._build_feature, lock
+    )
+
+    self.parsing_succeeded = True
+
+  @staticmethod
+  def _generate_lazy_key_map(list, key, entity_class, lock):
+    """ Helper method to generate lazy map from key to entity object for given list of dicts.
+
+    Args:
+      list: List consisting of dict.
+      key: Key in each dict which will be key in the map.
+      entity_class: Class representing the entity.
+      lock: Lock held while building entities.
+
+    Returns:
+      LazyMap mapping key to entity object.
+    """
+
+    return LazyMap(dict((entities.intern_id(obj[key]), obj) for obj in list), lambda _, obj: entity_class(**obj), lock)
+
+  def _build_group(self, group_id, group_dict):
+    """ Helper method to build the group object with the experiment objects of the experiment maps. """
+
+    group = entities.Group(**group_dict)
+    group.experiments = [self.experiment_key_map[experiment_dict['key']] for experiment_dict in group.experiments]
+    return group
+
+  def _build_layer(self, layer_id, layer_dict):
+    """ Helper method to build the layer object with the experiment objects of the experiment maps. """
+
+    layer = entities.Layer(**layer_dict)
+    layer.experiments = [self.experiment_key_map[experiment_dict['key']] for experiment_dict in layer.experiments]
+    return layer
+
+  def _build_experiment(self, experiment_key, source):
+    """ Helper method to build the experiment object, adding the group it is in. """
+
+    experiment_dict, group_dict = source
+    experiment = entities.Experiment(**experiment_dict)
+    if group_dict is not None:
+      experiment.groupId = entities.intern_id(group_dict['id'])
+      experiment.groupPolicy = group_dict['policy']
+    return experiment
+
+  def _get_experiment(self, experiment_id, experiment_key):
+    """ Helper method to look up the experiment object by the key its ID maps to. """
+
+    return self.experiment_key_map[experiment_key]
+
+  def _build_audience(self, audience_id, audience_dict):
+    """ Helper method to build the audience object with its conditions de-serialized. """
+
+    audience = entities.Audience(**audience_dict)
+    self._deserialize_audience({audience_id: audience})
+    return audience
+
+  def _build_variation_key_map(self, experiment_key, source):
+    """ Helper method to build the map from variation key to variation object of an experiment. """
+
+    return self._generate_key_map(self.experiment_key_map[experiment_key].variations, 'key', entities.Variation)
+
+  def _build_variation_id_map(self, experiment_key, source):
+    """ Helper method to map variation ID to the variation objects of an experiment. """
+
+    return dict((variation.id, variation) for variation in self.variation_key_map[experiment_key].values())
+
+  def _build_variable_usage_map(self, variation_id, experiment_key):
+    """ Helper method to build the map from variable ID to variable usage of a variation. """
+
+    variation = self.variation_id_map[experiment_key][variation_id]
+    return self._generate_key_map(variation.variables, 'id', entities.Variation.VariableUsage)
+
+  def _build_variable_value_map(self, variation_id, feature_keys):
+    """ Helper method to type-cast the variable values of a variation, with the defaults of its features. """
+
+    variables = []
+    for feature_key in feature_keys:
+      variables.extend(self.feature_key_map[feature_key].variables.values())
+    return self._generate_variable_value_map(self.variation_variable_usage_map.get(variation_id),
+                                             self._variable_type_map, variables)
+
+  def _build_forced_variation_map(self, experiment_key, source):
+    """ Helper method to resolve the whitelisted users of an experiment to their variations. """
+
+    variation_key_map = self.variation_key_map[experiment_key]
+    forced_variations = self.experiment_key_map[experiment_key].forcedVariations
+    return dict((user_id, variation_key_map.get(variation_key)) for user_id, variation_key in forced_variations.items())
+
+  def _build_whitelisted_variations(self, user_id, experiment_keys):
+    """ Helper method to build the experiments and variations a user is whitelisted in. """
+
+    return [(self.experiment_key_map[experiment_key], self.forced_variation_map[experiment_key][user_id])
+            for experiment_key in experiment_keys]
+
+  def _build_traffic_allocation_index(self, parent_id, source):
+    """ Helper method to compile the traffic allocation of a group or experiment. """
+
+    # Compile the traffic allocation of the entity, so that lookups passing it find the index.
+    # Experiments take precedence over groups with the same ID, as in ProjectConfig.
+    if parent_id in self.experiment_id_map:
+      parent = self.experiment_id_map[parent_id]
+    else:
+      parent = self.group_id_map[parent_id]
+    return self._generate_traffic_allocation_index(parent.trafficAllocation)
+
+  def _build_feature(self, feature_key, feature_dict):
+    """ Helper method to build the feature object with its variables. """
+
+    # Check if any of the experiments are in a group and add the group id for faster bucketing later on
+    group_id = None
+    for exp_id in feature_dict['experimentIds']:
+      experiment_in_feature = self.experiment_id_map[exp_id]
+      if experiment_in_feature.groupId:
+        group_id = experiment_in_feature.groupId
+        # Experiments in feature can only belong to one mutex group
+        break
+
+    feature = entities.Feature(**feature_dict)
+    feature.variables = self._generate_key_map(feature.variables, 'key', entities.Variable)
+    if group_id:
+      feature.groupId = group_id
+    return feature
@@ -0,0 +1,79 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Vectorized MurmurHash3 x86_32 implementation backed by NumPy.
+
+Produces the same values as mmh3.hash (masked to unsigned 32 bit) for many keys at once.
+Keys are laid out as a zero padded matrix of 4-byte blocks and the hash state of every key only advances
+for the blocks that key actually has.
+"""
+
+import numpy
+
+C1 = numpy.uint32(0xcc9e2d51)
+C2 = numpy.uint32(0x1b873593)
+M = numpy.uint32(5)
+N = numpy.uint32(0xe6546b64)
+FMIX_1 = numpy.uint32(0x85ebca6b)
+FMIX_2 = numpy.uint32(0xc2b2ae35)
+
+
+def _rotl32(value, shift):
+  return (value << numpy.uint32(shift)) | (value >> numpy.uint32(32 - shift))
+
+
+def hash_many(keys, seed=0x0):
+  """ Implements 32bit murmur3 hash for a sequence of keys.
+
+  Args:
+    keys: Sequence of bytes objects to be hashed.
+    seed: Seed for the hash.
+
+  Returns:
+    numpy.uint32 array holding the unsigned hash of every key, in the order of keys.
+  """
+
+  count = len(keys)
+  if not count:
+    return numpy.empty(0, dtype=numpy.uint32)
+
+  lengths = numpy.fromiter(map(len, keys), dtype=numpy.uint32, count=count)
+  nblocks = lengths >> numpy.uint32(2)
+
+  # Lay the keys out as a zero padded matrix with room for at least one more block than the longest key has
+  width = (int(nblocks.max()) + 1) * 4
+  blocks = numpy.array(keys, dtype='S%d' % width).view('<u4').reshape(count, -1)
+
+  h1 = numpy.full(count, seed, dtype=numpy.uint32)
+
+  # body
+  for block_index in range(int(nblocks.max())):
+    k1 = _rotl32(blocks[:, block_index] * C1, 15) * C2
+    mixed = _rotl32(h1 ^ k1, 13) * M + N
+    numpy.copyto(h1, mixed, where=nblocks > block_index)
+
+  # tail
+  tail_size = lengths & numpy.uint32(3)
+  k1 = blocks[numpy.arange(count), nblocks]
+  k1 &= (numpy.uint32(1) << (tail_size * numpy.uint32(8))) - numpy.uint32(1)
+  k1 = _rotl32(k1 * C1, 15) * C2
+  h1 ^= numpy.where(tail_size > 0, k1, numpy.uint32(0))
+
+  # finalization
+  h1 ^= lengths
+  h1 ^= h1 >> numpy.uint32(16)
+  h1 *= FMIX_1
+  h1 ^= h1 >> numpy.uint32(13)
+  h1 *= FMIX_2
+  h1 ^= h1 >> numpy.uint32(16)
+  return h1
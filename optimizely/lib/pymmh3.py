@@ -9,14 +9,16 @@ https://code.google.com/p/smhasher/wiki/MurmurHash3
 This was written for the times when you do not want to compile c-code and install modules,
 and you only want a drop-in murmur3 implementation.
 
-As this is purely python it is FAR from performant and if performance is anything that is needed
-a proper c-module is suggested!
+As this is purely python it is far from the performance of a c-module, which is suggested if
+performance is anything that is needed. The 32bit hash unpacks the key in bulk with struct and
+inlines its constants to keep the per call overhead as low as pure python allows.
 
 This module is written to have the same format as mmh3 python package found here for simple conversions:
 
 https://pypi.python.org/pypi/mmh3/2.3.1
 '''
 
+import struct as _struct
 import sys as _sys
 if (_sys.version_info > (3, 0)):
     def xrange( a, b, c ):
@@ -31,67 +33,116 @@ else:
         return x
 del _sys
 
+# Block unpackers for little endian 32bit words, compiled once per block count
+_block_unpackers = {}
+_unpack_word = _struct.Struct( '<I' ).unpack
+_TAIL_PADDING = ( b'', b'\x00\x00\x00', b'\x00\x00', b'\x00' )
+
+
+def _get_block_unpacker( nblocks ):
+    unpacker = _block_unpackers.get( nblocks )
+    if unpacker is None:
+        unpacker = _block_unpackers[ nblocks ] = _struct.Struct( '<%dI' % nblocks ).unpack_from
+    return unpacker
+
+
 def hash( key, seed = 0x0 ):
     ''' Implements 32bit murmur3 hash. '''
 
-    key = bytearray( xencode(key) )
-
-    def fmix( h ):
-        h ^= h >> 16
-        h  = ( h * 0x85ebca6b ) & 0xFFFFFFFF
-        h ^= h >> 13
-        h  = ( h * 0xc2b2ae35 ) & 0xFFFFFFFF
-        h ^= h >> 16
-        return h
+    key = xencode( key )
 
     length = len( key )
-    nblocks = int( length / 4 )
+    nblocks = length >> 2
 
-    h1 = seed
-
-    c1 = 0xcc9e2d51
-    c2 = 0x1b873593
+    h1 = seed & 0xFFFFFFFF
 
     # body
-    for block_start in xrange( 0, nblocks * 4, 4 ):
-        # ??? big endian?
-        k1 = key[ block_start + 3 ] << 24 | \
-             key[ block_start + 2 ] << 16 | \
-             key[ block_start + 1 ] <<  8 | \
-             key[ block_start + 0 ]
-             
-        k1 = ( c1 * k1 ) & 0xFFFFFFFF
-        k1 = ( k1 << 15 | k1 >> 17 ) & 0xFFFFFFFF # inlined ROTL32
-        k1 = ( c2 * k1 ) & 0xFFFFFFFF
-        
-        h1 ^= k1
-        h1  = ( h1 << 13 | h1 >> 19 ) & 0xFFFFFFFF # inlined ROTL32
-        h1  = ( h1 * 5 + 0xe6546b64 ) & 0xFFFFFFFF
+    # Constants are inlined as literals, which are cheaper to load than names. Masking is only
+    # needed before a right shift, as products and sums modulo 2**32 only depend on the low 32 bits.
+    if nblocks:
+        for k1 in _get_block_unpacker( nblocks )( key ):
+            k1  = k1 * 0xcc9e2d51 & 0xFFFFFFFF
+            h1 ^= ( k1 << 15 | k1 >> 17 ) * 0x1b873593 & 0xFFFFFFFF # inlined ROTL32
+            h1  = ( ( h1 << 13 | h1 >> 19 ) * 5 + 0xe6546b64 ) & 0xFFFFFFFF # inlined ROTL32
 
     # tail
-    tail_index = nblocks * 4
-    k1 = 0
     tail_size = length & 3
+    if tail_size:
+        k1  = _unpack_word( bytes( key[ nblocks * 4: ] ) + _TAIL_PADDING[ tail_size ] )[ 0 ]
+        k1  = k1 * 0xcc9e2d51 & 0xFFFFFFFF
+        h1 ^= ( k1 << 15 | k1 >> 17 ) * 0x1b873593 & 0xFFFFFFFF # inlined ROTL32
+
+    # finalization, inlined fmix
+    h1 ^= length
+    h1 ^= h1 >> 16
+    h1  = h1 * 0x85ebca6b & 0xFFFFFFFF
+    h1 ^= h1 >> 13
+    h1  = h1 * 0xc2b2ae35 & 0xFFFFFFFF
+    h1 ^= h1 >> 16
+
+    if h1 & 0x80000000 == 0:
+        return h1
+    else:
+        return h1 - 0x100000000
 
-    if tail_size >= 3:
-        k1 ^= key[ tail_index + 2 ] << 16
-    if tail_size >= 2:
-        k1 ^= key[ tail_index + 1 ] << 8
-    if tail_size >= 1:
-        k1 ^= key[ tail_index + 0 ]
-    
-    if tail_size > 0:
-        k1  = ( k1 * c1 ) & 0xFFFFFFFF
-        k1  = ( k1 << 15 | k1 >> 17 ) & 0xFFFFFFFF # inlined ROTL32
-        k1  = ( k1 * c2 ) & 0xFFFFFFFF
-        h1 ^= k1
-
-    #finalization
-    unsigned_val = fmix( h1 ^ length )
-    if unsigned_val & 0x80000000 == 0:
-        return unsigned_val
+
+def _hash_blocks( key, nblocks, h1 ):
+    ''' Mixes the first nblocks 4-byte blocks of key into the 32bit murmur3 hash state h1. '''
+
+    if nblocks:
+        for k1 in _get_block_unpacker( nblocks )( key ):
+            k1  = k1 * 0xcc9e2d51 & 0xFFFFFFFF
+            h1 ^= ( k1 << 15 | k1 >> 17 ) * 0x1b873593 & 0xFFFFFFFF # inlined ROTL32
+            h1  = ( ( h1 << 13 | h1 >> 19 ) * 5 + 0xe6546b64 ) & 0xFFFFFFFF # inlined ROTL32
+    return h1
+
+
+def hash_prefix( prefix, seed = 0x0 ):
+    ''' Starts the 32bit murmur3 hash of keys beginning with prefix.
+
+    Consumes the 4-byte aligned part of prefix once, so that hash_from_prefix can hash
+    prefix + suffix for many suffixes without mixing the prefix again.
+
+    Returns:
+        Opaque state to be passed to hash_from_prefix.
+    '''
+
+    prefix = xencode( prefix )
+    nblocks = len( prefix ) >> 2
+    h1 = _hash_blocks( prefix, nblocks, seed & 0xFFFFFFFF )
+    return ( h1, nblocks * 4, bytes( prefix[ nblocks * 4: ] ) )
+
+
+def hash_from_prefix( state, suffix ):
+    ''' Implements 32bit murmur3 hash of prefix + suffix given the state hash_prefix returned for prefix.
+    Returns the same value as hash( prefix + suffix, seed ). '''
+
+    h1, consumed_length, key = state
+    key = key + bytes( xencode( suffix ) )
+
+    length = consumed_length + len( key )
+    nblocks = len( key ) >> 2
+    h1 = _hash_blocks( key, nblocks, h1 )
+
+    # tail
+    tail_size = length & 3
+    if tail_size:
+        k1  = _unpack_word( key[ nblocks * 4: ] + _TAIL_PADDING[ tail_size ] )[ 0 ]
+        k1  = k1 * 0xcc9e2d51 & 0xFFFFFFFF
+        h1 ^= ( k1 << 15 | k1 >> 17 ) * 0x1b873593 & 0xFFFFFFFF # inlined ROTL32
+
+    # finalization, inlined fmix
+    h1 ^= length
+    h1 ^= h1 >> 16
+    h1  = h1 * 0x85ebca6b & 0xFFFFFFFF
+    h1 ^= h1 >> 13
+    h1  = h1 * 0xc2b2ae35 & 0xFFFFFFFF
+    h1 ^= h1 >> 16
+
+    if h1 & 0x80000000 == 0:
+        return h1
     else:
-        return -( (unsigned_val ^ 0xFFFFFFFF) + 1 )
+        return h1 - 0x100000000
 
 
 def hash128( key, seed = 0x0, x64arch = True ):
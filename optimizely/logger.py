@@ -18,16 +18,25 @@ from .helpers import enums
 
 
 class BaseLogger(object):
-  """ Class encapsulating logging functionality. Override with your own logger providing log method. """
+  """ Class encapsulating logging functionality. Override with your own logger providing log method.
+  Optionally provide is_enabled_for method to let the SDK skip building messages which would not be logged. """
 
   @staticmethod
   def log(*args):
     pass
 
+  @staticmethod
+  def is_enabled_for(log_level):
+    return True
+
 
 class NoOpLogger(BaseLogger):
   """ Class providing log method which logs nothing. """
 
+  @staticmethod
+  def is_enabled_for(log_level):
+    return False
+
 
 class SimpleLogger(BaseLogger):
   """ Class providing log method which logs to stdout. """
@@ -35,11 +44,50 @@ class SimpleLogger(BaseLogger):
   def __init__(self, min_level=enums.LogLevels.INFO):
     logging.basicConfig(level=min_level,
                         format='%(levelname)-8s %(asctime)s %(message)s')
+    self.logger = logging.getLogger()
+
+  def is_enabled_for(self, log_level):
+    return self.logger.isEnabledFor(log_level)
 
   def log(self, log_level, message):
-    # Figure out calling method and format message to include that information before logging
-    caller = inspect.stack()[1][0]
-    info = inspect.getframeinfo(caller)
-    self.logger = logging.getLogger()
+    # Figure out calling method and format message to include that information before logging.
+    # Frames of this module, such as the log helper below, are skipped to report the original caller.
+    caller = inspect.currentframe().f_back
+    while caller.f_back is not None and caller.f_code.co_filename == _LOGGER_FILENAME:
+      caller = caller.f_back
+    info = inspect.getframeinfo(caller, context=0)
     message = '%s:%s:%s' % (info.filename, info.lineno, message)
     self.logger.log(log_level, message)
+
+
+def is_enabled_for(logger, log_level):
+  """ Determine if the logger would log messages at the given level.
+
+  Args:
+    logger: Provides a log method to log messages.
+    log_level: Level of the message to be logged.
+
+  Returns:
+    Boolean depending upon whether messages at log_level need to be built and logged.
+    True for loggers which do not provide is_enabled_for method.
+  """
+
+  is_logger_enabled_for = getattr(logger, 'is_enabled_for', None)
+  return is_logger_enabled_for is None or bool(is_logger_enabled_for(log_level))
+
+
+def log(logger, log_level, message, *args):
+  """ Log the message formatted with args, building it only if the logger would log messages at the given level.
+
+  Args:
+    logger: Provides a log method to log messages.
+    log_level: Level of the message to be logged.
+    message: Message, or format string for the message if args are given.
+    args: Arguments to format the message with.
+  """
+
+  if is_enabled_for(logger, log_level):
+    logger.log(log_level, message % args if args else message)
+
+
+_LOGGER_FILENAME = log.__code__.co_filename
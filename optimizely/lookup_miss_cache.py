@@ -0,0 +1,114 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import timeit
+
+DEFAULT_REPORT_INTERVAL = 60
+DEFAULT_MAX_KEYS = 1000
+DEFAULT_MAX_REPORTS = 100
+
+
+class LookupMissCache(object):
+  """ Negative-lookup cache of keys which were not found in the config, deciding which misses are reported.
+
+  A key is reported on its first miss and then at most once per report interval, along with the number of misses
+  suppressed meanwhile. At most max_reports misses are reported per interval across all keys, so that many distinct
+  bad keys do not flood the log either.
+  """
+
+  def __init__(self, report_interval=DEFAULT_REPORT_INTERVAL, max_keys=DEFAULT_MAX_KEYS,
+               max_reports=DEFAULT_MAX_REPORTS):
+    """ LookupMissCache init method.
+
+    Args:
+      report_interval: Number of seconds for which repeated misses of a key are not reported again.
+      max_keys: Maximum number of keys to remember. The least recently missed keys are forgotten first.
+      max_reports: Maximum number of misses to report per interval across all keys.
+    """
+
+    self.report_interval = report_interval
+    self.max_keys = max_keys
+    self.max_reports = max_reports
+    self.miss_count = 0
+    self.reported_count = 0
+    self.suppressed_count = 0
+    # Maps kind and key of a miss to a list of the time it was last reported and the misses suppressed since
+    self._misses = collections.OrderedDict()
+    self._interval_start = None
+    self._interval_report_count = 0
+    self._lock = threading.Lock()
+
+  def record(self, kind, key):
+    """ Record a miss and decide if it is to be reported.
+
+    Args:
+      kind: Kind of lookup which missed, such as the message reporting it.
+      key: Key which was not found.
+
+    Returns:
+      Number of misses of the key suppressed since it was last reported if this miss is to be reported.
+      None if this miss is to be suppressed.
+    """
+
+    now = timeit.default_timer()
+    miss_key = (kind, key)
+    with self._lock:
+      self.miss_count += 1
+      if self._interval_start is None or now - self._interval_start >= self.report_interval:
+        self._interval_start = now
+        self._interval_report_count = 0
+
+      miss = self._misses.pop(miss_key, None)
+      if miss is None:
+        miss = [None, 0]
+        while len(self._misses) >= self.max_keys:
+          self._misses.popitem(last=False)
+      # Reinsert the miss to mark it as most recently missed
+      self._misses[miss_key] = miss
+
+      if (miss[0] is not None and now - miss[0] < self.report_interval) or \
+         self._interval_report_count >= self.max_reports:
+        miss[1] += 1
+        self.suppressed_count += 1
+        return None
+
+      suppressed_count = miss[1]
+      miss[0] = now
+      miss[1] = 0
+      self._interval_report_count += 1
+      self.reported_count += 1
+      return suppressed_count
+
+  def clear(self):
+    """ Forget all keys and reset the counters. """
+
+    with self._lock:
+      self._misses.clear()
+      self._interval_start = None
+      self._interval_report_count = 0
+      self.miss_count = 0
+      self.reported_count = 0
+      self.suppressed_count = 0
+
+  def __getstate__(self):
+    # Misses and counters belong to the process which recorded them
+    return {
+      'report_interval': self.report_interval,
+      'max_keys': self.max_keys,
+      'max_reports': self.max_reports
+    }
+
+  def __setstate__(self, state):
+    self.__init__(**state)
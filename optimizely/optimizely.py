@@ -13,13 +13,20 @@
 
 import numbers
 import sys
+import threading
 
+from . import config_snapshot
 from . import decision_service
+from . import deferred_validation
 from . import event_builder
 from . import exceptions
+from . import lazy_config
+from . import logger as optimizely_logger
 from . import project_config
+from . import shared_config
 from .error_handler import NoOpErrorHandler as noop_error_handler
 from .event_dispatcher import EventDispatcher as default_event_dispatcher
+from .helpers import datafile as datafile_helper
 from .helpers import enums
 from .helpers import validator
 from .logger import NoOpLogger as noop_logger
@@ -27,7 +34,10 @@ from .logger import SimpleLogger
 
 
 class Optimizely(object):
-  """ Class encapsulating all SDK functionality. """
+  """ Class encapsulating all SDK functionality.
+  An instance can be shared across threads. API calls only read the project config and keep their state local.
+  Each API call reads the config, decision service and event builder together once, so a datafile update
+  swapping them in does not affect calls which are in flight. """
 
   def __init__(self,
                datafile,
@@ -35,11 +45,17 @@ class Optimizely(object):
                logger=None,
                error_handler=None,
                skip_json_validation=False,
-               user_profile_service=None):
+               user_profile_service=None,
+               decision_cache=None,
+               config_snapshot_path=None,
+               shared_config_path=None,
+               lazy_config=False,
+               deferred_json_validation=False,
+               validation_failure_policy=enums.ValidationFailurePolicies.INVALIDATE):
     """ Optimizely init method for managing Custom projects.
 
     Args:
-      datafile: JSON string representing the project.
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
       event_dispatcher: Provides a dispatch_event method which if given a URL and params sends a request to it.
       logger: Optional component which provides a log method to log messages. By default nothing would be logged.
       error_handler: Optional component which provides a handle_error method to handle exceptions.
@@ -47,23 +63,85 @@ class Optimizely(object):
       skip_json_validation: Optional boolean param which allows skipping JSON schema validation upon object invocation.
                             By default JSON schema validation will be performed.
       user_profile_service: Optional component which provides methods to store and manage user profiles.
+      decision_cache: Optional DecisionCache to reuse decisions which do not depend on a user profile.
+      config_snapshot_path: Optional path of a config snapshot file. The config is loaded from the snapshot if it was
+                            built from the same datafile. Otherwise the config is built and saved to the snapshot.
+      shared_config_path: Optional path of a shared config file. If it was written for the same datafile, the config
+                          is served from it through a memory map which all processes attached to it share.
+                          Otherwise the config is built and written to the file for other processes to attach to.
+      lazy_config: Optional boolean param which defers building entities until they are first used.
+                   By default all entities of the datafile are built upon object invocation.
+                   Can not be combined with config_snapshot_path or shared_config_path, which need every entity.
+      deferred_json_validation: Optional boolean param which serves the config right away while JSON schema validation
+                                of the datafile, and of datafiles it is updated to, runs on a background thread.
+                                By default JSON schema validation completes before the config is served.
+      validation_failure_policy: Optional ValidationFailurePolicies value deciding what happens when deferred
+                                 validation finds the datafile in use invalid. By default the client becomes invalid.
+                                 With KEEP_LAST_VALID it reverts to the last valid datafile, and only becomes invalid
+                                 if there is none.
     """
 
     self.is_valid = True
+    # Project config, decision service and event builder are swapped together on datafile updates
+    self._snapshot = (None, None, None)
+    self._user_profile_service = user_profile_service
+    self._decision_cache = decision_cache
+    self._lazy_config = lazy_config
+    self._deferred_json_validation = deferred_json_validation and not skip_json_validation
+    self._validation_failure_policy = validation_failure_policy
+    # Guards the last valid snapshot, which deferred validations completing on background threads update
+    self._validation_lock = threading.Lock()
+    self._snapshot_count = 0
+    self._last_valid_snapshot = (None, None)
+    self.datafile_validation = None
     self.event_dispatcher = event_dispatcher or default_event_dispatcher
     self.logger = logger or noop_logger
     self.error_handler = error_handler or noop_error_handler
 
+    if lazy_config and (config_snapshot_path or shared_config_path):
+      self.is_valid = False
+      self.logger = SimpleLogger()
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.LAZY_CONFIG_WITH_CONFIG_FILE)
+      return
+
+    config = None
+    is_loaded_config_validated = True
+    datafile_hash = None
+    if config_snapshot_path or shared_config_path:
+      try:
+        datafile_hash = config_snapshot.get_datafile_hash(datafile)
+      except:
+        # A datafile which can not be hashed is reported as invalid when it is decoded below
+        pass
+    if datafile_hash is not None:
+      config, config_path = self._load_config(datafile_hash, config_snapshot_path, shared_config_path,
+                                              require_validated=not skip_json_validation)
+      if config is None and self._deferred_json_validation:
+        # Use a file written before the validation of its datafile completed, validating the datafile meanwhile
+        config, config_path = self._load_config(datafile_hash, config_snapshot_path, shared_config_path,
+                                                require_validated=False)
+        is_loaded_config_validated = False
+
     try:
-      self._validate_instantiation_options(datafile, skip_json_validation)
+      if config is None:
+        # Decode the datafile once for both validating it and building the config
+        datafile = self._decode_datafile(datafile)
+      # A snapshot or shared config is only used for the datafile it was built from, which was validated then
+      self._validate_instantiation_options(datafile,
+                                           skip_json_validation or self._deferred_json_validation or config is not None)
     except exceptions.InvalidInputException as error:
       self.is_valid = False
       self.logger = SimpleLogger()
       self.logger.log(enums.LogLevels.ERROR, str(error))
       return
 
+    if config is not None:
+      optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'Loaded config from %s.', config_path)
+      self._use_snapshot(self._create_snapshot(config), None if is_loaded_config_validated else datafile)
+      return
+
     try:
-      self.config = project_config.ProjectConfig(datafile, self.logger, self.error_handler)
+      self.config = self._build_config(datafile)
     except:
       self.is_valid = False
       self.config = None
@@ -77,14 +155,201 @@ class Optimizely(object):
       self.logger.log(enums.LogLevels.ERROR, enums.Errors.UNSUPPORTED_DATAFILE_VERSION)
       return
 
-    self.event_builder = event_builder.EventBuilder(self.config)
-    self.decision_service = decision_service.DecisionService(self.config, user_profile_service)
+    self._use_snapshot(self._create_snapshot(self.config), datafile if self._deferred_json_validation else None)
+    # A config whose validation is deferred is saved as not validated, as it is not known yet if its datafile is valid
+    is_validated = not skip_json_validation and not self._deferred_json_validation
+    if config_snapshot_path and datafile_hash is not None:
+      try:
+        config_snapshot.save(config_snapshot_path, self.config, datafile_hash, is_validated)
+      except:
+        error = sys.exc_info()[1]
+        self.logger.log(enums.LogLevels.ERROR,
+                        'Unable to save config snapshot to %s. Error: %s' % (config_snapshot_path, str(error)))
+    if shared_config_path and datafile_hash is not None:
+      try:
+        shared_config.write(shared_config_path, self.config, datafile_hash, is_validated)
+      except:
+        error = sys.exc_info()[1]
+        self.logger.log(enums.LogLevels.ERROR,
+                        'Unable to write shared config to %s. Error: %s' % (shared_config_path, str(error)))
+
+  @property
+  def config(self):
+    """ ProjectConfig currently in use. """
+
+    return self._snapshot[0]
+
+  @config.setter
+  def config(self, config):
+    self._snapshot = (config,) + self._snapshot[1:]
+
+  @property
+  def decision_service(self):
+    """ DecisionService deciding with the current config. """
+
+    return self._snapshot[1]
+
+  @decision_service.setter
+  def decision_service(self, decision_service):
+    self._snapshot = (self._snapshot[0], decision_service, self._snapshot[2])
+
+  @property
+  def event_builder(self):
+    """ EventBuilder building events with the current config. """
+
+    return self._snapshot[2]
+
+  @event_builder.setter
+  def event_builder(self, event_builder):
+    self._snapshot = self._snapshot[:2] + (event_builder,)
+
+  def _build_config(self, datafile, previous_config=None):
+    """ Helper method to build the project config for a datafile.
+
+    Args:
+      datafile: Dict representing the project.
+      previous_config: Optional ProjectConfig whose entities and indexes are reused where the datafile is unchanged.
+
+    Returns:
+      ProjectConfig, or LazyProjectConfig if entities are built on first use.
+    """
+
+    if self._lazy_config:
+      return lazy_config.LazyProjectConfig(datafile, self.logger, self.error_handler)
+
+    return project_config.ProjectConfig(datafile, self.logger, self.error_handler, previous_config=previous_config)
+
+  def _load_config(self, datafile_hash, config_snapshot_path, shared_config_path, require_validated):
+    """ Helper method to load the config from the shared config file, or else from the config snapshot.
+
+    Args:
+      datafile_hash: Content hash of the datafile the config is needed for.
+      config_snapshot_path: Path of the config snapshot file. None if there is none.
+      shared_config_path: Path of the shared config file. None if there is none.
+      require_validated: Boolean representing whether the datafile must have passed JSON schema validation.
+
+    Returns:
+      Tuple of the config and the path of the file it was loaded from. None and None if neither file is usable.
+    """
+
+    if shared_config_path:
+      config = shared_config.attach(shared_config_path, datafile_hash, self.logger, self.error_handler,
+                                    require_validated=require_validated)
+      if config is not None:
+        return config, shared_config_path
+
+    if config_snapshot_path:
+      config = config_snapshot.load(config_snapshot_path, datafile_hash, self.logger, self.error_handler,
+                                    require_validated=require_validated)
+      if config is not None:
+        return config, config_snapshot_path
+
+    return None, None
+
+  def _create_snapshot(self, config):
+    """ Helper method to create the decision service and event builder for a config.
+
+    Args:
+      config: ProjectConfig to use.
+
+    Returns:
+      Tuple of config, decision service and event builder.
+    """
+
+    return (
+      config,
+      decision_service.DecisionService(config, self._user_profile_service, self._decision_cache),
+      event_builder.EventBuilder(config)
+    )
+
+  def _use_snapshot(self, snapshot, datafile=None):
+    """ Helper method to swap in a snapshot, validating its datafile on a background thread if it was not validated.
+
+    Args:
+      snapshot: Tuple of config, decision service and event builder.
+      datafile: Optional datafile the config was built from, if its validation is deferred.
+    """
+
+    with self._validation_lock:
+      self._snapshot_count += 1
+      sequence = self._snapshot_count
+      # Swap in the new config with its decision service and event builder in a single assignment
+      self._snapshot = snapshot
+      if datafile is None:
+        self._last_valid_snapshot = (sequence, snapshot)
+
+    if datafile is None:
+      return
+
+    validation = deferred_validation.DeferredValidation(
+      datafile, snapshot[0].revision, lambda validation: self._complete_validation(validation, sequence, snapshot)
+    )
+    self.datafile_validation = validation
+    validation.start()
+
+  def _complete_validation(self, validation, sequence, snapshot):
+    """ Helper method to handle the outcome of a deferred validation according to the validation failure policy.
+
+    Args:
+      validation: DeferredValidation which completed.
+      sequence: Number of the snapshot among those swapped in, which orders the snapshots found valid.
+      snapshot: Tuple of config, decision service and event builder built from the validated datafile.
+    """
+
+    if validation.is_valid:
+      with self._validation_lock:
+        # Validations of successive datafiles may complete out of order
+        if self._last_valid_snapshot[0] is None or sequence > self._last_valid_snapshot[0]:
+          self._last_valid_snapshot = (sequence, snapshot)
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO, 'Validated datafile revision "%s" in %.3f seconds.',
+                            validation.revision, validation.duration)
+      return
+
+    self.logger.log(enums.LogLevels.ERROR, 'Datafile revision "%s" failed JSON schema validation in %.3f seconds.'
+                    % (validation.revision, validation.duration))
+    with self._validation_lock:
+      if snapshot is not self._snapshot:
+        # A newer datafile is in use already
+        return
+
+      last_valid_snapshot = self._last_valid_snapshot[1]
+      is_reverted = self._validation_failure_policy == enums.ValidationFailurePolicies.KEEP_LAST_VALID and \
+        last_valid_snapshot is not None
+      if is_reverted:
+        self._snapshot = last_valid_snapshot
+      else:
+        self.is_valid = False
+
+    if is_reverted:
+      self.logger.log(enums.LogLevels.WARNING,
+                      'Reverted to datafile revision "%s".' % last_valid_snapshot[0].revision)
+    else:
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
+
+  @staticmethod
+  def _decode_datafile(datafile):
+    """ Helper method to decode the datafile.
+
+    Args:
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
+
+    Returns:
+      Dict representing the project.
+
+    Raises:
+      InvalidInputException if the datafile can not be decoded.
+    """
+
+    try:
+      return datafile_helper.loads(datafile)
+    except:
+      raise exceptions.InvalidInputException(enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
 
   def _validate_instantiation_options(self, datafile, skip_json_validation):
     """ Helper method to validate all instantiation parameters.
 
     Args:
-      datafile: JSON string representing the project.
+      datafile: Dict representing the project.
       skip_json_validation: Boolean representing whether JSON schema validation needs to be skipped or not.
 
     Raises:
@@ -94,6 +359,10 @@ class Optimizely(object):
     if not skip_json_validation and not validator.is_datafile_valid(datafile):
      raise exceptions.InvalidInputException(enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
 
+    if self._validation_failure_policy not in (enums.ValidationFailurePolicies.INVALIDATE,
+                                               enums.ValidationFailurePolicies.KEEP_LAST_VALID):
+     raise exceptions.InvalidInputException(enums.Errors.INVALID_INPUT_ERROR.format('validation_failure_policy'))
+
     if not validator.is_event_dispatcher_valid(self.event_dispatcher):
      raise exceptions.InvalidInputException(enums.Errors.INVALID_INPUT_ERROR.format('event_dispatcher'))
 
@@ -127,10 +396,11 @@ class Optimizely(object):
 
     return True
 
-  def _get_decisions(self, event, user_id, attributes):
+  def _get_decisions(self, decision_service, event, user_id, attributes):
     """ Helper method to retrieve decisions for the user for experiment(s) using the provided event.
 
     Args:
+      decision_service: DecisionService of the snapshot in use.
       event: The event which needs to be recorded.
       user_id: ID for user.
       attributes: Dict representing user attributes.
@@ -140,18 +410,67 @@ class Optimizely(object):
     """
     decisions = []
     for experiment_id in event.experimentIds:
-      experiment = self.config.get_experiment_from_id(experiment_id)
-      variation_key = self.get_variation(experiment.key, user_id, attributes)
+      experiment = decision_service.config.get_experiment_from_id(experiment_id)
+      variation = decision_service.get_variation(experiment, user_id, attributes)
 
-      if not variation_key:
-        self.logger.log(enums.LogLevels.INFO, 'Not tracking user "%s" for experiment "%s".' % (user_id, experiment.key))
+      if not variation:
+        optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                              'Not tracking user "%s" for experiment "%s".', user_id, experiment.key)
         continue
 
-      variation = self.config.get_variation_from_key(experiment.key, variation_key)
       decisions.append((experiment_id, variation.id))
 
     return decisions
 
+  def _is_feature_enabled(self, decision_service, feature, user_id, attributes, decision_context=None):
+    """ Helper method to determine if the feature is enabled for the given user.
+
+    Args:
+      decision_service: DecisionService of the snapshot in use.
+      feature: Feature for which we are determining if it is enabled or not for the given user.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+      decision_context: Optional DecisionContext shared across the features evaluated for the user.
+
+    Returns:
+      True if the feature is enabled for the user. False otherwise.
+    """
+
+    variation = decision_service.get_variation_for_feature(feature, user_id, attributes, decision_context)
+    if variation:
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'Feature "%s" is enabled for user "%s".', feature.key, user_id)
+      return True
+
+    optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                          'Feature "%s" is not enabled for user "%s".', feature.key, user_id)
+    return False
+
+  def _get_variation(self, decision_service, experiment_key, user_id, attributes):
+    """ Helper method to get the experiment and the variation where user will be bucketed.
+
+    Args:
+      decision_service: DecisionService of the snapshot in use.
+      experiment_key: Experiment for which user variation needs to be determined.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+
+    Returns:
+      Tuple of experiment and variation. Variation is None if user is not in experiment,
+      if experiment is not Running or if the inputs are invalid.
+    """
+
+    experiment = decision_service.config.get_experiment_from_key(experiment_key)
+    if not experiment:
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'Experiment key "%s" is invalid. Not activating user "%s".', experiment_key, user_id)
+      return None, None
+
+    if not self._validate_user_inputs(attributes):
+      return experiment, None
+
+    return experiment, decision_service.get_variation(experiment, user_id, attributes)
+
   def activate(self, experiment_key, user_id, attributes=None):
     """ Buckets visitor and sends impression event to Optimizely.
 
@@ -169,20 +488,19 @@ class Optimizely(object):
       self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('activate'))
       return None
 
-    variation_key = self.get_variation(experiment_key, user_id, attributes)
+    _, decision_service, event_builder = self._snapshot
+    experiment, variation = self._get_variation(decision_service, experiment_key, user_id, attributes)
 
-    if not variation_key:
-      self.logger.log(enums.LogLevels.INFO, 'Not activating user "%s".' % user_id)
+    if not variation:
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO, 'Not activating user "%s".', user_id)
       return None
 
     # Create and dispatch impression event
-    experiment = self.config.get_experiment_from_key(experiment_key)
-    variation = self.config.get_variation_from_key(experiment_key, variation_key)
-    impression_event = self.event_builder.create_impression_event(experiment, variation.id, user_id, attributes)
-    self.logger.log(enums.LogLevels.INFO, 'Activating user "%s" in experiment "%s".' % (user_id, experiment.key))
-    self.logger.log(enums.LogLevels.DEBUG,
-                    'Dispatching impression event to URL %s with params %s.' % (impression_event.url,
-                                                                                impression_event.params))
+    impression_event = event_builder.create_impression_event(experiment, variation.id, user_id, attributes)
+    optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                          'Activating user "%s" in experiment "%s".', user_id, experiment.key)
+    optimizely_logger.log(self.logger, enums.LogLevels.DEBUG, 'Dispatching impression event to URL %s with params %s.',
+                          impression_event.url, impression_event.params)
     try:
       self.event_dispatcher.dispatch_event(impression_event)
     except:
@@ -216,24 +534,27 @@ class Optimizely(object):
     if not self._validate_user_inputs(attributes, event_tags):
       return
 
-    event = self.config.get_event(event_key)
+    config, decision_service, event_builder = self._snapshot
+    event = config.get_event(event_key)
     if not event:
-      self.logger.log(enums.LogLevels.INFO, 'Not tracking user "%s" for event "%s".' % (user_id, event_key))
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'Not tracking user "%s" for event "%s".', user_id, event_key)
       return
 
     # Filter out experiments that are not running or that do not include the user in audience
     # conditions and then determine the decision i.e. the corresponding variation
-    decisions = self._get_decisions(event, user_id, attributes)
+    decisions = self._get_decisions(decision_service, event, user_id, attributes)
 
     # Create and dispatch conversion event if there are any decisions
     if decisions:
-      conversion_event = self.event_builder.create_conversion_event(
+      conversion_event = event_builder.create_conversion_event(
         event_key, user_id, attributes, event_tags, decisions
       )
-      self.logger.log(enums.LogLevels.INFO, 'Tracking event "%s" for user "%s".' % (event_key, user_id))
-      self.logger.log(enums.LogLevels.DEBUG,
-                      'Dispatching conversion event to URL %s with params %s.' % (conversion_event.url,
-                                                                                  conversion_event.params))
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'Tracking event "%s" for user "%s".', event_key, user_id)
+      optimizely_logger.log(self.logger, enums.LogLevels.DEBUG,
+                            'Dispatching conversion event to URL %s with params %s.',
+                            conversion_event.url, conversion_event.params)
       try:
         self.event_dispatcher.dispatch_event(conversion_event)
       except:
@@ -241,7 +562,8 @@ class Optimizely(object):
         self.logger.log(enums.LogLevels.ERROR, 'Unable to dispatch conversion event. Error: %s' % str(error))
 
     else:
-      self.logger.log(enums.LogLevels.INFO, 'There are no valid experiments for event "%s" to track.' % event_key)
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'There are no valid experiments for event "%s" to track.', event_key)
 
   def get_variation(self, experiment_key, user_id, attributes=None):
     """ Gets variation where user will be bucketed.
@@ -260,21 +582,40 @@ class Optimizely(object):
       self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('get_variation'))
       return None
 
-    experiment = self.config.get_experiment_from_key(experiment_key)
+    _, variation = self._get_variation(self.decision_service, experiment_key, user_id, attributes)
+    if variation:
+      return variation.key
+
+    return None
+
+  def explain_variation(self, experiment_key, user_id, attributes=None):
+    """ Gets variation where user will be bucketed along with a record of how it was determined.
+
+    Args:
+      experiment_key: Experiment for which user variation needs to be determined.
+      user_id: ID for user.
+      attributes: Dict representing user attributes.
+
+    Returns:
+      DecisionRecord holding the variation, the decision stage which determined it and per stage durations.
+      None if the experiment key or the user inputs are invalid.
+    """
+
+    if not self.is_valid:
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('explain_variation'))
+      return None
+
+    decision_service = self.decision_service
+    experiment = decision_service.config.get_experiment_from_key(experiment_key)
     if not experiment:
-      self.logger.log(enums.LogLevels.INFO,
-                      'Experiment key "%s" is invalid. Not activating user "%s".' % (experiment_key,
-                                                                                     user_id))
+      optimizely_logger.log(self.logger, enums.LogLevels.INFO,
+                            'Experiment key "%s" is invalid. Not activating user "%s".', experiment_key, user_id)
       return None
 
     if not self._validate_user_inputs(attributes):
       return None
 
-    variation = self.decision_service.get_variation(experiment, user_id, attributes)
-    if variation:
-      return variation.key
-
-    return None
+    return decision_service.explain_variation(experiment, user_id, attributes)
 
   def is_feature_enabled(self, feature_key, user_id, attributes=None):
     """ Returns true if the feature is enabled for the given user.
@@ -291,17 +632,12 @@ class Optimizely(object):
       self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('is_feature_enabled'))
       return False
 
-    feature = self.config.get_feature_from_key(feature_key)
+    decision_service = self.decision_service
+    feature = decision_service.config.get_feature_from_key(feature_key)
     if not feature:
       return False
 
-    variation = self.decision_service.get_variation_for_feature(feature, user_id, attributes)
-    if variation:
-      self.logger.log(enums.LogLevels.INFO, 'Feature "%s" is enabled for user "%s".' % (feature_key, user_id))
-      return True
-
-    self.logger.log(enums.LogLevels.INFO, 'Feature "%s" is not enabled for user "%s".' % (feature_key, user_id))
-    return False
+    return self._is_feature_enabled(decision_service, feature, user_id, attributes)
 
   def get_enabled_features(self, user_id, attributes=None):
     """ Returns the list of features that are enabled for the user.
@@ -318,9 +654,55 @@ class Optimizely(object):
       self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('get_enabled_features'))
       return False
 
+    # Look up the user profile once for all features and save new decisions together
+    decision_service = self.decision_service
+    decision_context = decision_service.create_decision_context(user_id)
     enabled_features = []
-    for feature in self.config.feature_key_map.values():
-      if self.is_feature_enabled(feature.key, user_id, attributes):
+    for feature in decision_service.config.feature_key_map.values():
+      if self._is_feature_enabled(decision_service, feature, user_id, attributes, decision_context):
         enabled_features.append(feature.key)
 
+    decision_context.save()
     return enabled_features
+
+  def update_datafile(self, datafile, skip_json_validation=False):
+    """ Switches to a new datafile, reusing the entities and indexes of the current config which did not change.
+    Calls in flight keep using the config they started with. If JSON schema validation is deferred, the new datafile
+    is used right away and validated on a background thread.
+
+    Args:
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
+      skip_json_validation: Optional boolean param which allows skipping JSON schema validation of the datafile.
+
+    Returns:
+      True if the new datafile is in use. False if it is invalid and the current one is kept.
+    """
+
+    if not self.is_valid:
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_DATAFILE.format('update_datafile'))
+      return False
+
+    try:
+      datafile = self._decode_datafile(datafile)
+    except exceptions.InvalidInputException as error:
+      self.logger.log(enums.LogLevels.ERROR, str(error))
+      return False
+
+    is_validation_deferred = self._deferred_json_validation and not skip_json_validation
+    if not skip_json_validation and not is_validation_deferred and not validator.is_datafile_valid(datafile):
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
+      return False
+
+    try:
+      config = self._build_config(datafile, previous_config=self.config)
+    except:
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
+      return False
+
+    if not config.was_parsing_successful():
+      self.logger.log(enums.LogLevels.ERROR, enums.Errors.UNSUPPORTED_DATAFILE_VERSION)
+      return False
+
+    self._use_snapshot(self._create_snapshot(config), datafile if is_validation_deferred else None)
+    optimizely_logger.log(self.logger, enums.LogLevels.INFO, 'Updated datafile to revision "%s".', config.revision)
+    return True
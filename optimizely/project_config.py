@@ -11,12 +11,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-
 from .helpers import condition as condition_helper
+from .helpers import datafile as datafile_helper
 from .helpers import enums
 from . import entities
+from . import error_handler as optimizely_error_handler
 from . import exceptions
+from . import logger as optimizely_logger
+from .lookup_miss_cache import LookupMissCache
 
 REVENUE_GOAL_KEY = 'Total Revenue'
 V1_CONFIG_VERSION = '1'
@@ -27,21 +29,25 @@ UNSUPPORTED_VERSIONS = [V1_CONFIG_VERSION]
 
 
 class ProjectConfig(object):
-  """ Representation of the Optimizely project config. """
+  """ Representation of the Optimizely project config.
+  It is not modified once loaded, so it can be read from many threads without locking. """
 
-  def __init__(self, datafile, logger, error_handler):
+  def __init__(self, datafile, logger, error_handler, previous_config=None):
     """ ProjectConfig init method to load and set project config data.
 
     Args:
-      datafile: JSON string representing the project.
+      datafile: JSON string or bytes representing the project, or dict it was decoded into.
+                The dict is used as is, so it should not be modified afterwards.
       logger: Provides a log message to send log messages to.
       error_handler: Provides a handle_error method to handle exceptions.
+      previous_config: Optional ProjectConfig whose entities and indexes are reused where the datafile is unchanged.
     """
 
-    config = json.loads(datafile)
+    config = datafile_helper.loads(datafile)
     self.parsing_succeeded = False
     self.logger = logger
     self.error_handler = error_handler
+    self.lookup_misses = LookupMissCache()
     self.version = config.get('version')
     if self.version in UNSUPPORTED_VERSIONS:
       return
@@ -55,59 +61,326 @@ class ProjectConfig(object):
     self.audiences = config.get('audiences', [])
     self.features = config.get('features', [])
     self.layers = config.get('layers', [])
+    if previous_config is not None and \
+       (not previous_config.was_parsing_successful() or not previous_config._entity_sources):
+      previous_config = None
+    previous_group_id_map = previous_config.group_id_map if previous_config else None
+    previous_audience_id_map = previous_config.audience_id_map if previous_config else None
+    previous_experiment_id_map = previous_config.experiment_id_map if previous_config else None
+
+    # Dicts the entities were built from, for a later config to reuse the entities which did not change
+    self._entity_sources = {}
+    # Dicts of the datafile equal to dicts which entities were built from earlier, mapped by object ID to those
+    self._replaced_sources = {}
 
     # Utility maps for quick lookup
-    self.group_id_map = self._generate_key_map(self.groups, 'id', entities.Group)
-    self.experiment_key_map = self._generate_key_map(self.experiments, 'key', entities.Experiment)
+    self.group_id_map = {}
+    for group_dict in self.groups:
+      self.group_id_map[group_dict['id']] = self._build_entity(previous_config, entities.Group, group_dict)
+    self.experiment_key_map = {}
+    for experiment_dict in self.experiments:
+      experiment = self._build_entity(previous_config, entities.Experiment, experiment_dict)
+      self.experiment_key_map[experiment.key] = experiment
     self.event_key_map = self._generate_key_map(self.events, 'key', entities.Event)
     self.attribute_key_map = self._generate_key_map(self.attributes, 'key', entities.Attribute)
-    self.audience_id_map = self._generate_key_map(self.audiences, 'id', entities.Audience)
+    self.audience_id_map = {}
+    new_audience_id_map = {}
+    for audience_dict in self.audiences:
+      audience = self._build_entity(previous_config, entities.Audience, audience_dict)
+      self.audience_id_map[audience.id] = audience
+      if not self._is_reused(previous_audience_id_map, audience.id, audience):
+        new_audience_id_map[audience.id] = audience
+    # Layers and groups hold the experiment objects of the experiment maps
     self.layer_id_map = self._generate_key_map(self.layers, 'id', entities.Layer)
     for layer in self.layer_id_map.values():
-      for experiment in layer.experiments:
-        self.experiment_key_map[experiment['key']] = entities.Experiment(**experiment)
-
-    self.audience_id_map = self._deserialize_audience(self.audience_id_map)
-    for group in self.group_id_map.values():
-      experiments_in_group_key_map = self._generate_key_map(group.experiments, 'key', entities.Experiment)
-      for experiment in experiments_in_group_key_map.values():
-        experiment.__dict__.update({
-          'groupId': group.id,
-          'groupPolicy': group.policy
-        })
-      self.experiment_key_map.update(experiments_in_group_key_map)
+      layer_experiments = []
+      for experiment_dict in layer.experiments:
+        experiment = self._build_entity(previous_config, entities.Experiment, experiment_dict)
+        self.experiment_key_map[experiment.key] = experiment
+        layer_experiments.append(experiment)
+      layer.experiments = layer_experiments
+
+    self._deserialize_audience(new_audience_id_map)
+    for group_dict in self.groups:
+      group = self.group_id_map[group_dict['id']]
+      group_experiments = []
+      for experiment_dict in group_dict['experiments']:
+        experiment = self._build_entity(previous_config, entities.Experiment, experiment_dict, group.id, group.policy)
+        experiment.groupId = group.id
+        experiment.groupPolicy = group.policy
+        self.experiment_key_map[experiment.key] = experiment
+        group_experiments.append(experiment)
+      # Groups reused from the previous config or built for an earlier equal dict already hold their experiments
+      if group.experiments is group_dict['experiments']:
+        group.experiments = group_experiments
 
     self.experiment_id_map = {}
     self.variation_key_map = {}
     self.variation_id_map = {}
     self.variation_variable_usage_map = {}
+    self.forced_variation_map = {}
+    self.whitelisted_user_map = {}
+    self.traffic_allocation_index_map = {}
+    for group in self.group_id_map.values():
+      if self._is_reused(previous_group_id_map, group.id, group):
+        self.traffic_allocation_index_map[group.id] = previous_config.traffic_allocation_index_map[group.id]
+      else:
+        self.traffic_allocation_index_map[group.id] = self._generate_traffic_allocation_index(group.trafficAllocation)
     for experiment in self.experiment_key_map.values():
       self.experiment_id_map[experiment.id] = experiment
-      self.variation_key_map[experiment.key] = self._generate_key_map(
-        experiment.variations, 'key', entities.Variation
-      )
-      self.variation_id_map[experiment.key] = {}
-      for variation in self.variation_key_map.get(experiment.key).values():
-        self.variation_id_map[experiment.key][variation.id] = variation
-        if variation.variables:
-          self.variation_variable_usage_map[variation.id] = self._generate_key_map(
-            variation.variables, 'id', entities.Variation.VariableUsage
-          )
-
-    self.feature_key_map = self._generate_key_map(self.features, 'key', entities.Feature)
-    for feature in self.feature_key_map.values():
-      feature.variables = self._generate_key_map(feature.variables, 'key', entities.Variable)
+      if self._is_reused(previous_experiment_id_map, experiment.id, experiment):
+        self._copy_experiment_maps(previous_config, experiment)
+      else:
+        self._generate_experiment_maps(experiment)
+
+      # Index whitelisted users by user to skip the check for other users
+      for user_id, variation in self.forced_variation_map[experiment.key].items():
+        self.whitelisted_user_map.setdefault(user_id, []).append((experiment, variation))
 
+    self.feature_key_map = {}
+    for feature_dict in self.features:
       # Check if any of the experiments are in a group and add the group id for faster bucketing later on
-      for exp_id in feature.experimentIds:
+      group_id = None
+      for exp_id in feature_dict['experimentIds']:
         experiment_in_feature = self.experiment_id_map[exp_id]
         if experiment_in_feature.groupId:
-          feature.groupId = experiment_in_feature.groupId
+          group_id = experiment_in_feature.groupId
           # Experiments in feature can only belong to one mutex group
           break
 
+      feature = self._build_entity(previous_config, entities.Feature, feature_dict, group_id)
+      # Features reused from the previous config or built for an earlier equal dict already have their variables mapped
+      if feature.variables is feature_dict['variables']:
+        feature.variables = self._generate_key_map(feature.variables, 'key', entities.Variable)
+        if group_id:
+          feature.groupId = group_id
+      self.feature_key_map[feature.key] = feature
+
+    if self._replaced_sources:
+      self._replace_sources()
+    del self._replaced_sources
+
+    # Type-cast the variable values of every variation once, so that reading a value is a lookup
+    variable_type_map = {}
+    variation_variables = {}
+    for feature in self.feature_key_map.values():
+      for variable in feature.variables.values():
+        variable_type_map[variable.id] = variable.type
+      for experiment in self._get_feature_experiments(feature):
+        for variation in self.variation_key_map[experiment.key].values():
+          variation_variables.setdefault(variation.id, []).extend(feature.variables.values())
+    self.variation_variable_value_map = {}
+    for variation_id in set(variation_variables) | set(self.variation_variable_usage_map):
+      self.variation_variable_value_map[variation_id] = self._generate_variable_value_map(
+        self.variation_variable_usage_map.get(variation_id), variable_type_map,
+        variation_variables.get(variation_id, [])
+      )
+
     self.parsing_succeeded = True
 
+  def _build_entity(self, previous_config, entity_class, obj, *derived_from):
+    """ Helper method to build the entity object for a dict, reusing the entity already built for an equal dict
+    in this config or the previous config.
+
+    Args:
+      previous_config: ProjectConfig to reuse entities from. None to build every entity.
+      entity_class: Class representing the entity.
+      obj: Dict representing the entity.
+      derived_from: Other values the entity depends on, such as the group of an experiment.
+
+    Returns:
+      Entity object.
+    """
+
+    source_key = (entity_class.__name__, obj['id'])
+    source = (obj,) + derived_from
+    # Experiments reached through more than one part of the datafile are built once
+    current_source = self._entity_sources.get(source_key)
+    if current_source is not None and current_source[0] == source:
+      if current_source[0][0] is not obj:
+        self._replaced_sources[id(obj)] = current_source[0][0]
+      return current_source[1]
+
+    if previous_config is not None:
+      previous_source = previous_config._entity_sources.get(source_key)
+      if previous_source is not None and previous_source[0] == source:
+        self._entity_sources[source_key] = previous_source
+        self._replaced_sources[id(obj)] = previous_source[0][0]
+        return previous_source[1]
+
+    entity = entity_class(**obj)
+    self._entity_sources[source_key] = (source, entity)
+    return entity
+
+  def _replace_sources(self):
+    """ Helper method to replace dicts of the datafile with the equal dicts which entities were built from earlier,
+    so that the parts of the datafile which did not change since the previous config are not held twice.
+    The datafile may be a dict the caller holds on to, so its lists are copied rather than modified. """
+
+    replaced_sources = self._replaced_sources
+
+    def replace_sources(source_list):
+      return [replaced_sources.get(id(obj), obj) for obj in source_list]
+
+    def replace_experiment_sources(parent_list):
+      parents = []
+      for parent_dict in replace_sources(parent_list):
+        experiment_dicts = replace_sources(parent_dict['experiments'])
+        if any(new is not old for new, old in zip(experiment_dicts, parent_dict['experiments'])):
+          parent_dict = dict(parent_dict, experiments=experiment_dicts)
+        parents.append(parent_dict)
+      return parents
+
+    self.groups = replace_experiment_sources(self.groups)
+    self.layers = replace_experiment_sources(self.layers)
+    self.experiments = replace_sources(self.experiments)
+    self.audiences = replace_sources(self.audiences)
+    self.features = replace_sources(self.features)
+
+  @staticmethod
+  def _is_reused(previous_entity_map, key, entity):
+    """ Helper method to determine if an entity object was reused from the previous config.
+
+    Args:
+      previous_entity_map: Map of the previous config which would hold the entity. None if there is no previous config.
+      key: Key of the entity in the map.
+      entity: Entity object.
+
+    Returns:
+      Boolean representing if the entity object is the one in the previous config.
+    """
+
+    return previous_entity_map is not None and previous_entity_map.get(key) is entity
+
+  def _generate_experiment_maps(self, experiment):
+    """ Helper method to compile the traffic allocation, variations and whitelisted users of an experiment.
+
+    Args:
+      experiment: Experiment object.
+    """
+
+    self.traffic_allocation_index_map[experiment.id] = self._generate_traffic_allocation_index(
+      experiment.trafficAllocation
+    )
+    self.variation_key_map[experiment.key] = self._generate_key_map(
+      experiment.variations, 'key', entities.Variation
+    )
+    self.variation_id_map[experiment.key] = {}
+    for variation in self.variation_key_map.get(experiment.key).values():
+      self.variation_id_map[experiment.key][variation.id] = variation
+      if variation.variables:
+        self.variation_variable_usage_map[variation.id] = self._generate_key_map(
+          variation.variables, 'id', entities.Variation.VariableUsage
+        )
+
+    # Resolve whitelisted users to their variations
+    self.forced_variation_map[experiment.key] = {}
+    for user_id, variation_key in experiment.forcedVariations.items():
+      self.forced_variation_map[experiment.key][user_id] = self.variation_key_map.get(experiment.key).get(variation_key)
+
+  def _copy_experiment_maps(self, previous_config, experiment):
+    """ Helper method to take over the compiled maps of an unchanged experiment from the previous config.
+
+    Args:
+      previous_config: ProjectConfig the experiment object was reused from.
+      experiment: Experiment object.
+    """
+
+    self.traffic_allocation_index_map[experiment.id] = previous_config.traffic_allocation_index_map[experiment.id]
+    self.variation_key_map[experiment.key] = previous_config.variation_key_map[experiment.key]
+    self.variation_id_map[experiment.key] = previous_config.variation_id_map[experiment.key]
+    for variation in self.variation_key_map[experiment.key].values():
+      if variation.id in previous_config.variation_variable_usage_map:
+        self.variation_variable_usage_map[variation.id] = previous_config.variation_variable_usage_map[variation.id]
+    self.forced_variation_map[experiment.key] = previous_config.forced_variation_map[experiment.key]
+
+  def _get_feature_experiments(self, feature):
+    """ Helper method to get the experiments of a feature and of its rollout.
+
+    Args:
+      feature: Feature object.
+
+    Returns:
+      List of experiment objects.
+    """
+
+    experiments = [self.experiment_id_map[experiment_id] for experiment_id in feature.experimentIds
+                   if experiment_id in self.experiment_id_map]
+    layer = self.layer_id_map.get(feature.layerId)
+    if layer:
+      experiments.extend(layer.experiments)
+
+    return experiments
+
+  def _generate_variable_value_map(self, variable_usages, variable_type_map, variables):
+    """ Helper method to type-cast the variable values of a variation,
+    filling in the default values of the variables it does not set.
+
+    Args:
+      variable_usages: Dict mapping variable ID to variable usage of the variation. None if it sets no variables.
+      variable_type_map: Dict mapping variable ID to type of the variable.
+      variables: List of variables of the features the variation is part of.
+
+    Returns:
+      Dict mapping variable ID to type-casted value. Values which can not be type-casted are left out.
+    """
+
+    variable_values = {}
+    for variable in variables:
+      self._set_typecast_value(variable_values, variable.id, variable.defaultValue, variable.type)
+    if variable_usages:
+      for variable_id, variable_usage in variable_usages.items():
+        self._set_typecast_value(variable_values, variable_id, variable_usage.value, variable_type_map.get(variable_id))
+
+    return variable_values
+
+  def _set_typecast_value(self, variable_values, variable_id, value, type):
+    """ Helper method to type-cast a variable value into the given dict, logging values which are not of the type.
+
+    Args:
+      variable_values: Dict mapping variable ID to type-casted value.
+      variable_id: ID of the variable.
+      value: Value in string form as it was parsed from datafile.
+      type: Type denoting the feature flag type.
+    """
+
+    try:
+      variable_values[variable_id] = self._get_typecast_value(value, type)
+    except ValueError:
+      variable_values.pop(variable_id, None)
+      self.logger.log(enums.LogLevels.ERROR,
+                      'Value "%s" of variable with ID "%s" is not a valid %s.' % (value, variable_id, type))
+
+  def _report_lookup_miss(self, message, key, exception_class=None, error=None):
+    """ Helper method to report a key which is not in the datafile. Repeated misses of a key are reported
+    at most once per interval, and the exception for the error handler is only built if it handles exceptions.
+
+    Args:
+      message: Format string of the message to log, with a placeholder for the key.
+      key: Key which is not in the datafile.
+      exception_class: Optional class of the exception to hand to the error handler.
+      error: Message of the exception.
+    """
+
+    suppressed_count = self.lookup_misses.record(message, key)
+    if suppressed_count:
+      optimizely_logger.log(self.logger, enums.LogLevels.ERROR, message + ' Suppressed %s times since last reported.',
+                            key, suppressed_count)
+    elif suppressed_count is not None:
+      optimizely_logger.log(self.logger, enums.LogLevels.ERROR, message, key)
+
+    # Error handlers may raise to stop the caller, so they get every miss
+    if exception_class is not None:
+      optimizely_error_handler.handle_error(self.error_handler, exception_class, error)
+
+  def __getstate__(self):
+    """ Leave out the logger and error handler when pickling, as they belong to the process using the config. """
+
+    state = self.__dict__.copy()
+    state['logger'] = None
+    state['error_handler'] = None
+    return state
+
   @staticmethod
   def _generate_key_map(list, key, entity_class):
     """ Helper method to generate map from key to entity object for given list of dicts.
@@ -123,10 +396,40 @@ class ProjectConfig(object):
 
     key_map = {}
     for obj in list:
-      key_map[obj[key]] = entity_class(**obj)
+      # Key the map by the interned ID or key of the entity
+      entity = entity_class(**obj)
+      key_map[getattr(entity, key)] = entity
 
     return key_map
 
+  @staticmethod
+  def _generate_traffic_allocation_index(traffic_allocation):
+    """ Helper method to compile traffic allocation into parallel lists which can be searched with bisect.
+
+    Args:
+      traffic_allocation: List of dicts representing traffic allotted to experiments or variations.
+
+    Returns:
+      Tuple of (traffic_allocation, ends_of_range, entity_ids).
+      traffic_allocation: the list the index was compiled from.
+      ends_of_range: sorted list holding the running maximum of endOfRange across the allocations.
+      entity_ids: list of entity IDs in the order of the allocations.
+    """
+
+    ends_of_range = []
+    entity_ids = []
+    current_end_of_range = None
+    for allocation in traffic_allocation:
+      # The first allocation whose end of range exceeds a bucket value is the first one whose running maximum does,
+      # so taking the running maximum keeps the list sorted without changing which allocation is found.
+      end_of_range = allocation.get('endOfRange')
+      if current_end_of_range is None or end_of_range > current_end_of_range:
+        current_end_of_range = end_of_range
+      ends_of_range.append(current_end_of_range)
+      entity_ids.append(entities.intern_id(allocation.get('entityId')))
+
+    return traffic_allocation, ends_of_range, entity_ids
+
   @staticmethod
   def _deserialize_audience(audience_map):
     """ Helper method to de-serialize and populate audience map with the condition list and structure.
@@ -140,10 +443,8 @@ class ProjectConfig(object):
 
     for audience in audience_map.values():
       condition_structure, condition_list = condition_helper.loads(audience.conditions)
-      audience.__dict__.update({
-        'conditionStructure': condition_structure,
-        'conditionList': condition_list
-      })
+      audience.conditionStructure = condition_structure
+      audience.conditionList = condition_list
 
     return audience_map
 
@@ -227,8 +528,8 @@ class ProjectConfig(object):
     if experiment:
       return experiment
 
-    self.logger.log(enums.LogLevels.ERROR, 'Experiment key "%s" is not in datafile.' % experiment_key)
-    self.error_handler.handle_error(exceptions.InvalidExperimentException(enums.Errors.INVALID_EXPERIMENT_KEY_ERROR))
+    self._report_lookup_miss('Experiment key "%s" is not in datafile.', experiment_key,
+                             exceptions.InvalidExperimentException, enums.Errors.INVALID_EXPERIMENT_KEY_ERROR)
     return None
 
   def get_experiment_from_id(self, experiment_id):
@@ -246,10 +547,41 @@ class ProjectConfig(object):
     if experiment:
       return experiment
 
-    self.logger.log(enums.LogLevels.ERROR, 'Experiment ID "%s" is not in datafile.' % experiment_id)
-    self.error_handler.handle_error(exceptions.InvalidExperimentException(enums.Errors.INVALID_EXPERIMENT_KEY_ERROR))
+    self._report_lookup_miss('Experiment ID "%s" is not in datafile.', experiment_id,
+                             exceptions.InvalidExperimentException, enums.Errors.INVALID_EXPERIMENT_KEY_ERROR)
     return None
 
+  def get_traffic_allocation_index(self, parent_id, traffic_allocation):
+    """ Get compiled traffic allocation index for the provided group or experiment.
+
+    Args:
+      parent_id: ID representing group or experiment.
+      traffic_allocation: Traffic allocation of the group or experiment.
+
+    Returns:
+      Tuple of (traffic_allocation, ends_of_range, entity_ids) as compiled at load time.
+      Compiled on the fly if traffic_allocation is not the one of the group or experiment in the datafile.
+    """
+
+    index = self.traffic_allocation_index_map.get(parent_id)
+    if index is not None and index[0] is traffic_allocation:
+      return index
+
+    return self._generate_traffic_allocation_index(traffic_allocation)
+
+  def get_whitelisted_variations(self, user_id):
+    """ Get experiments in which the user is whitelisted along with the variations the user is forced in.
+
+    Args:
+      user_id: ID for user.
+
+    Returns:
+      List of tuples of experiment and variation. Variation is None if its key is not in the datafile.
+      Empty list if the user is not whitelisted in any experiment.
+    """
+
+    return self.whitelisted_user_map.get(user_id, [])
+
   def get_group(self, group_id):
     """ Get group for the provided group ID.
 
@@ -265,8 +597,8 @@ class ProjectConfig(object):
     if group:
       return group
 
-    self.logger.log(enums.LogLevels.ERROR, 'Group ID "%s" is not in datafile.' % group_id)
-    self.error_handler.handle_error(exceptions.InvalidGroupException(enums.Errors.INVALID_GROUP_ID_ERROR))
+    self._report_lookup_miss('Group ID "%s" is not in datafile.', group_id,
+                             exceptions.InvalidGroupException, enums.Errors.INVALID_GROUP_ID_ERROR)
     return None
 
   def get_audience(self, audience_id):
@@ -283,8 +615,8 @@ class ProjectConfig(object):
     if audience:
       return audience
 
-    self.logger.log(enums.LogLevels.ERROR, 'Audience ID "%s" is not in datafile.' % audience_id)
-    self.error_handler.handle_error(exceptions.InvalidAudienceException((enums.Errors.INVALID_AUDIENCE_ERROR)))
+    self._report_lookup_miss('Audience ID "%s" is not in datafile.', audience_id,
+                             exceptions.InvalidAudienceException, enums.Errors.INVALID_AUDIENCE_ERROR)
 
   def get_variation_from_key(self, experiment_key, variation_key):
     """ Get variation given experiment and variation key.
@@ -304,12 +636,12 @@ class ProjectConfig(object):
       if variation:
         return variation
       else:
-        self.logger.log(enums.LogLevels.ERROR, 'Variation key "%s" is not in datafile.' % variation_key)
-        self.error_handler.handle_error(exceptions.InvalidVariationException(enums.Errors.INVALID_VARIATION_ERROR))
+        self._report_lookup_miss('Variation key "%s" is not in datafile.', variation_key,
+                                 exceptions.InvalidVariationException, enums.Errors.INVALID_VARIATION_ERROR)
         return None
 
-    self.logger.log(enums.LogLevels.ERROR, 'Experiment key "%s" is not in datafile.' % experiment_key)
-    self.error_handler.handle_error(exceptions.InvalidExperimentException(enums.Errors.INVALID_EXPERIMENT_KEY_ERROR))
+    self._report_lookup_miss('Experiment key "%s" is not in datafile.', experiment_key,
+                             exceptions.InvalidExperimentException, enums.Errors.INVALID_EXPERIMENT_KEY_ERROR)
     return None
 
   def get_variation_from_id(self, experiment_key, variation_id):
@@ -330,12 +662,12 @@ class ProjectConfig(object):
       if variation:
         return variation
       else:
-        self.logger.log(enums.LogLevels.ERROR, 'Variation ID "%s" is not in datafile.' % variation_id)
-        self.error_handler.handle_error(exceptions.InvalidVariationException(enums.Errors.INVALID_VARIATION_ERROR))
+        self._report_lookup_miss('Variation ID "%s" is not in datafile.', variation_id,
+                                 exceptions.InvalidVariationException, enums.Errors.INVALID_VARIATION_ERROR)
         return None
 
-    self.logger.log(enums.LogLevels.ERROR, 'Experiment key "%s" is not in datafile.' % experiment_key)
-    self.error_handler.handle_error(exceptions.InvalidExperimentException(enums.Errors.INVALID_EXPERIMENT_KEY_ERROR))
+    self._report_lookup_miss('Experiment key "%s" is not in datafile.', experiment_key,
+                             exceptions.InvalidExperimentException, enums.Errors.INVALID_EXPERIMENT_KEY_ERROR)
     return None
 
   def get_event(self, event_key):
@@ -353,8 +685,8 @@ class ProjectConfig(object):
     if event:
       return event
 
-    self.logger.log(enums.LogLevels.ERROR, 'Event "%s" is not in datafile.' % event_key)
-    self.error_handler.handle_error(exceptions.InvalidEventException(enums.Errors.INVALID_EVENT_KEY_ERROR))
+    self._report_lookup_miss('Event "%s" is not in datafile.', event_key,
+                             exceptions.InvalidEventException, enums.Errors.INVALID_EVENT_KEY_ERROR)
     return None
 
   def get_attribute(self, attribute_key):
@@ -372,8 +704,8 @@ class ProjectConfig(object):
     if attribute:
       return attribute
 
-    self.logger.log(enums.LogLevels.ERROR, 'Attribute "%s" is not in datafile.' % attribute_key)
-    self.error_handler.handle_error(exceptions.InvalidAttributeException(enums.Errors.INVALID_ATTRIBUTE_ERROR))
+    self._report_lookup_miss('Attribute "%s" is not in datafile.', attribute_key,
+                             exceptions.InvalidAttributeException, enums.Errors.INVALID_ATTRIBUTE_ERROR)
     return None
 
   def get_feature_from_key(self, feature_key):
@@ -390,7 +722,7 @@ class ProjectConfig(object):
     if feature:
       return feature
 
-    self.logger.log(enums.LogLevels.ERROR, 'Feature "%s" is not in datafile.' % feature_key)
+    self._report_lookup_miss('Feature "%s" is not in datafile.', feature_key)
     return None
 
   def get_layer_from_id(self, layer_id):
@@ -407,7 +739,7 @@ class ProjectConfig(object):
     if layer:
       return layer
 
-    self.logger.log(enums.LogLevels.ERROR, 'Layer with ID "%s" is not in datafile.' % layer_id)
+    self._report_lookup_miss('Layer with ID "%s" is not in datafile.', layer_id)
     return None
 
   def get_variable_value_for_variation(self, variable, variation):
@@ -418,23 +750,19 @@ class ProjectConfig(object):
       Variation: The Variation for which we are getting the variable value.
 
     Returns:
-      The type-casted variable value or None if any of the inputs are invalid.
+      The type-casted variable value, which is the default value of the variable if the variation does not set it.
+      None if any of the inputs are invalid.
     """
     if not variable or not variation:
       return None
 
-    if variation.id not in self.variation_variable_usage_map:
-      self.logger.log(enums.LogLevels.ERROR, 'Variation with ID "%s" is not in the datafile.' % variation.id)
+    # Values are type-casted at load time, with the default values of variables the variation does not set
+    variable_values = self.variation_variable_value_map.get(variation.id)
+    if variable_values is None:
+      self._report_lookup_miss('Variation with ID "%s" is not in the datafile.', variation.id)
       return None
 
-    # Get all variable usages for the given variation
-    variable_usages = self.variation_variable_usage_map[variation.id]
-
-    # Find usage in given variation
-    variable_usage = variable_usages[variable.id]
-
-    value = self._get_typecast_value(variable_usage.value, variable.type)
-    return value
+    return variable_values.get(variable.id)
 
   def get_variable_for_feature(self, feature_key, variable_key):
     """ Get the variable with the given variable key for the given feature
@@ -448,11 +776,11 @@ class ProjectConfig(object):
     """
     feature = self.feature_key_map.get(feature_key)
     if not feature:
-      self.logger.log(enums.LogLevels.ERROR, 'Feature with key "%s" not found in the datafile.' % feature_key)
+      self._report_lookup_miss('Feature with key "%s" not found in the datafile.', feature_key)
       return None
 
     if variable_key not in feature.variables:
-      self.logger.log(enums.LogLevels.ERROR, 'Variable with key "%s" not found in the datafile.' % variable_key)
+      self._report_lookup_miss('Variable with key "%s" not found in the datafile.', variable_key)
       return None
 
     return feature.variables.get(variable_key)
@@ -0,0 +1,465 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import copy
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+try:
+  from collections.abc import Mapping
+except ImportError:
+  from collections import Mapping
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+from . import version
+from .lookup_miss_cache import LookupMissCache
+from .project_config import ProjectConfig
+
+MAGIC = b'OPTIMIZELY-SHARED-CONFIG\n'
+# Increment when the layout of the file, ProjectConfig or its entities changes
+FORMAT_VERSION = 5
+
+# Maps of ProjectConfig which are served from the shared file
+MAP_NAMES = [
+  'group_id_map',
+  'experiment_key_map',
+  'experiment_id_map',
+  'event_key_map',
+  'attribute_key_map',
+  'audience_id_map',
+  'layer_id_map',
+  'variation_key_map',
+  'variation_id_map',
+  'variation_variable_usage_map',
+  'variation_variable_value_map',
+  'forced_variation_map',
+  'whitelisted_user_map',
+  'traffic_allocation_index_map',
+  'feature_key_map'
+]
+
+
+def _encode_whitelisted_variations(whitelisted_variations):
+  """ Helper method to reference the experiments a user is whitelisted in by key. """
+
+  return [experiment.key for experiment, _ in whitelisted_variations]
+
+
+def _encode_experiment_references(entity):
+  """ Helper method to reference the experiments of a group or layer by key. """
+
+  encoded = copy.copy(entity)
+  encoded.experiments = [experiment.key for experiment in entity.experiments]
+  return encoded
+
+
+# Encoders of map values which hold entities of other maps, so that records reference them instead of repeating them
+VALUE_ENCODERS = {
+  'group_id_map': _encode_experiment_references,
+  'layer_id_map': _encode_experiment_references,
+  'whitelisted_user_map': _encode_whitelisted_variations
+}
+
+# Maps which most lookups miss on every decision, such as for users who are not whitelisted,
+# so that remembering the keys they miss would only churn the memo of missing keys
+EXPECTED_MISS_MAP_NAMES = frozenset(['forced_variation_map', 'whitelisted_user_map'])
+
+# Number of recently used values every map of a process keeps unpickled
+DEFAULT_CACHE_SIZE = 256
+
+# Index entry of a record: hash of the key, offset of the record and length of the record
+INDEX_ENTRY = struct.Struct('<IQI')
+KEY_LENGTH = struct.Struct('<I')
+HEADER_LENGTH = struct.Struct('<Q')
+
+
+def _hash_key(key_bytes):
+  """ Helper method to hash a key the same way in every process. """
+
+  return zlib.crc32(key_bytes) & 0xffffffff
+
+
+def _encode_key(key):
+  """ Helper method to encode a map key into bytes. """
+
+  return key.encode('utf-8') if not isinstance(key, bytes) else key
+
+
+def _get_header(datafile_hash, is_validated):
+  """ Helper method to build the part of the header describing the file and the SDK which wrote it. """
+
+  return {
+    'format_version': FORMAT_VERSION,
+    'sdk_version': version.__version__,
+    'python_version': sys.version_info[0],
+    'datafile_hash': datafile_hash,
+    'is_validated': is_validated
+  }
+
+
+def write(path, config, datafile_hash, is_validated):
+  """ Write the lookup maps of a config to a file which processes can map into memory and share.
+
+  Every map value is stored as a separate record, located through an index sorted by the hash of its key.
+
+  Args:
+    path: Path of the shared config file.
+    config: ProjectConfig to write.
+    datafile_hash: Content hash of the datafile the config was built from.
+    is_validated: Boolean representing whether the datafile passed JSON schema validation.
+  """
+
+  body = bytearray()
+  maps = {}
+  for map_name in MAP_NAMES:
+    index_entries = []
+    encode_value = VALUE_ENCODERS.get(map_name)
+    for key, value in getattr(config, map_name).items():
+      if encode_value:
+        value = encode_value(value)
+      key_bytes = _encode_key(key)
+      record = KEY_LENGTH.pack(len(key_bytes)) + key_bytes + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+      index_entries.append((_hash_key(key_bytes), len(body), len(record)))
+      body.extend(record)
+
+    index_entries.sort()
+    maps[map_name] = (len(body), len(index_entries))
+    for index_entry in index_entries:
+      body.extend(INDEX_ENTRY.pack(*index_entry))
+
+  header = _get_header(datafile_hash, is_validated)
+  header.update({
+    'version': config.version,
+    'account_id': config.account_id,
+    'project_id': config.project_id,
+    'revision': config.revision,
+    'maps': maps
+  })
+  header_bytes = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+
+  directory = os.path.dirname(os.path.abspath(path))
+  file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.shared-config-')
+  try:
+    with os.fdopen(file_descriptor, 'wb') as shared_file:
+      shared_file.write(MAGIC)
+      shared_file.write(HEADER_LENGTH.pack(len(header_bytes)))
+      shared_file.write(header_bytes)
+      shared_file.write(body)
+    # Processes attaching meanwhile map either the previous file or the complete new one
+    getattr(os, 'replace', os.rename)(temp_path, path)
+  except:
+    os.remove(temp_path)
+    raise
+
+
+def attach(path, datafile_hash, logger, error_handler, require_validated=False, cache_size=DEFAULT_CACHE_SIZE):
+  """ Map a shared config file into memory if it was written for the same datafile by a compatible SDK.
+  Records are unpickled, so the file must only be attached from locations the application trusts.
+
+  Args:
+    path: Path of the shared config file.
+    datafile_hash: Content hash of the datafile the config is needed for.
+    logger: Provides a log message to send log messages to.
+    error_handler: Provides a handle_error method to handle exceptions.
+    require_validated: Boolean representing whether the datafile must have passed JSON schema validation.
+    cache_size: Number of recently used values every map keeps unpickled.
+
+  Returns:
+    SharedProjectConfig. None if there is no file or it is stale or incompatible.
+  """
+
+  try:
+    with open(path, 'rb') as shared_file:
+      memory_map = mmap.mmap(shared_file.fileno(), 0, access=mmap.ACCESS_READ)
+  except:
+    return None
+
+  try:
+    if memory_map[:len(MAGIC)] != MAGIC:
+      raise ValueError('Not a shared config file.')
+
+    header_length, = HEADER_LENGTH.unpack_from(memory_map, len(MAGIC))
+    header_offset = len(MAGIC) + HEADER_LENGTH.size
+    header = pickle.loads(memory_map[header_offset:header_offset + header_length])
+    expected_header = _get_header(datafile_hash, header.get('is_validated'))
+    if dict((key, header.get(key)) for key in expected_header) != expected_header or \
+       (require_validated and not header.get('is_validated')):
+      raise ValueError('Shared config file is stale or incompatible.')
+  except:
+    memory_map.close()
+    return None
+
+  return SharedProjectConfig(memory_map, header, header_offset + header_length, logger, error_handler, cache_size)
+
+
+class SharedMap(Mapping):
+  """ Read-only map whose values are unpickled from a shared config file.
+  The most recently used values are kept unpickled, so that only the entities in use take up memory of their own.
+  """
+
+  def __init__(self, memory_map, body_offset, index_offset, count, cache_size, remember_missing_keys=True):
+    self._memory_map = memory_map
+    self._body_offset = body_offset
+    self._index_offset = body_offset + index_offset
+    self._count = count
+    self._cache_size = cache_size
+    self._cache = collections.OrderedDict()
+    self._remember_missing_keys = remember_missing_keys and cache_size > 0
+    # Recently looked up keys which are not in the map, so that repeated bad keys skip the search
+    self._missing_keys = collections.OrderedDict()
+    self._cache_lock = threading.Lock()
+
+  def _get_index_entry(self, position):
+    return INDEX_ENTRY.unpack_from(self._memory_map, self._index_offset + position * INDEX_ENTRY.size)
+
+  def _find_record(self, key):
+    """ Helper method to find the record of a key, remembering keys which are not in the map.
+
+    Args:
+      key: Key of the map.
+
+    Returns:
+      Tuple of offset and length of the pickled value. None if the key is not in the map.
+    """
+
+    if key in self._missing_keys:
+      return None
+
+    record = self._get_record(key)
+    if record is None and self._remember_missing_keys:
+      with self._cache_lock:
+        self._missing_keys[key] = True
+        while len(self._missing_keys) > self._cache_size:
+          self._missing_keys.popitem(last=False)
+
+    return record
+
+  def _get_record(self, key):
+    """ Helper method to find the record of a key.
+
+    Args:
+      key: Key of the map.
+
+    Returns:
+      Tuple of offset and length of the pickled value. None if the key is not in the map.
+    """
+
+    try:
+      key_bytes = _encode_key(key)
+    except AttributeError:
+      # Keys in the datafile are strings
+      return None
+
+    key_hash = _hash_key(key_bytes)
+
+    # Binary search for the first entry with the hash, then check the keys of all entries with it
+    low = 0
+    high = self._count
+    while low < high:
+      middle = (low + high) // 2
+      if self._get_index_entry(middle)[0] < key_hash:
+        low = middle + 1
+      else:
+        high = middle
+
+    while low < self._count:
+      entry_hash, offset, length = self._get_index_entry(low)
+      if entry_hash != key_hash:
+        break
+
+      record_offset = self._body_offset + offset
+      key_length, = KEY_LENGTH.unpack_from(self._memory_map, record_offset)
+      value_offset = record_offset + KEY_LENGTH.size + key_length
+      if self._memory_map[record_offset + KEY_LENGTH.size:value_offset] == key_bytes:
+        return value_offset, length - KEY_LENGTH.size - key_length
+      low += 1
+
+    return None
+
+  def __getitem__(self, key):
+    with self._cache_lock:
+      value = self._cache.pop(key, self._cache)
+      if value is not self._cache:
+        # Reinsert the value to mark it as most recently used
+        self._cache[key] = value
+        return value
+
+    record = self._find_record(key)
+    if record is None:
+      raise KeyError(key)
+
+    value_offset, value_length = record
+    value = self._decode_value(pickle.loads(self._memory_map[value_offset:value_offset + value_length]))
+    if self._cache_size:
+      with self._cache_lock:
+        # Keep the value another thread cached meanwhile, so that all callers get the same object
+        value = self._cache.setdefault(key, value)
+        while len(self._cache) > self._cache_size:
+          self._cache.popitem(last=False)
+
+    return value
+
+  def __contains__(self, key):
+    return key in self._cache or self._find_record(key) is not None
+
+  def _decode_value(self, value):
+    """ Helper method to resolve the references an unpickled value holds to entities of other maps.
+
+    Args:
+      value: Value unpickled from the record.
+
+    Returns:
+      Value to return for lookups.
+    """
+
+    return value
+
+  def replace_cached_value(self, key, value):
+    """ Keep the given value unpickled in place of an equal value stored for the key.
+
+    Args:
+      key: Key of the map.
+      value: Value equal to the one stored for the key.
+    """
+
+    if self._cache_size:
+      with self._cache_lock:
+        self._cache.pop(key, None)
+        self._cache[key] = value
+        while len(self._cache) > self._cache_size:
+          self._cache.popitem(last=False)
+
+  def __iter__(self):
+    for position in range(self._count):
+      _, offset, _ = self._get_index_entry(position)
+      record_offset = self._body_offset + offset
+      key_length, = KEY_LENGTH.unpack_from(self._memory_map, record_offset)
+      key_offset = record_offset + KEY_LENGTH.size
+      yield self._memory_map[key_offset:key_offset + key_length].decode('utf-8')
+
+  def __len__(self):
+    return self._count
+
+
+class SharedWhitelistMap(SharedMap):
+  """ Shared map of whitelisted users, whose records hold the keys of the experiments the user is whitelisted in.
+  Experiments and variations are resolved through the experiment key and forced variation maps of the config,
+  as storing them in every record would repeat the forced variations of an experiment for each of its users.
+  """
+
+  def __init__(self, config, *args, **kwargs):
+    SharedMap.__init__(self, *args, **kwargs)
+    self._config = config
+
+  def __getitem__(self, user_id):
+    config = self._config
+    return [(config.experiment_key_map[experiment_key], config.forced_variation_map[experiment_key][user_id])
+            for experiment_key in SharedMap.__getitem__(self, user_id)]
+
+
+class SharedExperimentContainerMap(SharedMap):
+  """ Shared map of groups or layers, whose records hold the keys of their experiments.
+  Experiments are resolved through the experiment key map of the config when a record is unpickled,
+  so that a group or layer holds the experiment objects which lookups of the config return.
+  """
+
+  def __init__(self, config, *args, **kwargs):
+    SharedMap.__init__(self, *args, **kwargs)
+    self._config = config
+
+  def _decode_value(self, entity):
+    experiment_key_map = self._config.experiment_key_map
+    entity.experiments = [experiment_key_map[experiment_key] for experiment_key in entity.experiments]
+    return entity
+
+
+class SharedProjectConfig(ProjectConfig):
+  """ Project config served from a memory mapped file.
+
+  Lookups unpickle the entities they return from pages shared by all processes mapping the file,
+  instead of every process holding its own copy of all entities and maps.
+  Entities returned by lookups are equal to, but not always the same objects as, those of earlier lookups.
+  """
+
+  def __init__(self, memory_map, header, body_offset, logger, error_handler, cache_size=DEFAULT_CACHE_SIZE):
+    """ SharedProjectConfig init method. Use attach to create one from a file.
+
+    Args:
+      memory_map: Memory map of the shared config file.
+      header: Dict read from the header of the file.
+      body_offset: Offset in the file at which the records start.
+      logger: Provides a log message to send log messages to.
+      error_handler: Provides a handle_error method to handle exceptions.
+      cache_size: Number of recently used values every map keeps unpickled.
+    """
+
+    self.logger = logger
+    self.error_handler = error_handler
+    self.lookup_misses = LookupMissCache()
+    self.version = header['version']
+    self.account_id = header['account_id']
+    self.project_id = header['project_id']
+    self.revision = header['revision']
+    self._memory_map = memory_map
+    # Nothing to reuse for a config updated from this one
+    self._entity_sources = {}
+    for map_name, (index_offset, count) in header['maps'].items():
+      setattr(self, map_name, SharedMap(memory_map, body_offset, index_offset, count, cache_size,
+                                        remember_missing_keys=map_name not in EXPECTED_MISS_MAP_NAMES))
+    for map_name in ['group_id_map', 'layer_id_map']:
+      index_offset, count = header['maps'][map_name]
+      setattr(self, map_name, SharedExperimentContainerMap(self, memory_map, body_offset, index_offset, count,
+                                                           cache_size))
+    index_offset, count = header['maps']['whitelisted_user_map']
+    self.whitelisted_user_map = SharedWhitelistMap(self, memory_map, body_offset, index_offset, count, cache_size,
+                                                   remember_missing_keys=False)
+    self.parsing_succeeded = True
+
+  def __getstate__(self):
+    raise TypeError('SharedProjectConfig can not be pickled. Attach to the shared config file instead.')
+
+  def get_traffic_allocation_index(self, parent_id, traffic_allocation):
+    """ Get compiled traffic allocation index for the provided group or experiment.
+
+    Args:
+      parent_id: ID representing group or experiment.
+      traffic_allocation: Traffic allocation of the group or experiment.
+
+    Returns:
+      Tuple of (traffic_allocation, ends_of_range, entity_ids) as compiled at load time.
+      Compiled on the fly if traffic_allocation is not the one of the group or experiment in the datafile.
+    """
+
+    index = self.traffic_allocation_index_map.get(parent_id)
+    if index is None:
+      return self._generate_traffic_allocation_index(traffic_allocation)
+
+    if index[0] is traffic_allocation:
+      return index
+
+    # Unpickled entities do not share their traffic allocation with the index, so compare the contents once
+    # and keep an index sharing the traffic allocation of the entity for further lookups
+    if index[0] == traffic_allocation:
+      index = (traffic_allocation,) + tuple(index[1:])
+      self.traffic_allocation_index_map.replace_cached_value(parent_id, index)
+      return index
+
+    return self._generate_traffic_allocation_index(traffic_allocation)
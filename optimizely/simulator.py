@@ -0,0 +1,379 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Offline simulation of bucketing decisions for synthetic users.
+
+Runs synthetic user IDs through the Bucketer and DecisionService of a datafile to check allocation skew per
+variation, exclusivity of mutually exclusive groups and rollout coverage before shipping datafile changes.
+The user ID space is sharded across a multiprocessing pool and counts are aggregated into compact arrays.
+
+Usage: python -m optimizely.simulator path/to/datafile.json --users 10000000 --processes 8
+"""
+
+import argparse
+import array
+import json
+import multiprocessing
+import timeit
+
+from . import bucketer
+from . import decision_service
+from . import exceptions
+from . import project_config
+from .error_handler import NoOpErrorHandler
+from .helpers import enums
+from .helpers import experiment as experiment_helper
+from .helpers import validator
+from .logger import NoOpLogger
+
+USER_ID_TEMPLATE = 'user_{index}'
+DEFAULT_SHARD_SIZE = 100000
+
+
+class SimulationModes(object):
+  # Bucket users with Bucketer.bucket_many, ignoring audiences and whitelisting of experiments and rollouts
+  BUCKETER = 'bucketer'
+  # Decide with DecisionService.get_variation, including audiences and whitelisting
+  DECISION_SERVICE = 'decision_service'
+
+
+# Per process state set up by the pool initializer so that the config is only built once per worker
+_worker_state = {}
+
+
+def _load_config(datafile):
+  """ Helper method to build the project config from a datafile without logging.
+
+  Args:
+    datafile: JSON string representing the project.
+
+  Returns:
+    ProjectConfig built from the datafile.
+
+  Raises:
+    InvalidInputException if the datafile is invalid or has an unsupported version.
+  """
+
+  if not validator.is_datafile_valid(datafile):
+    raise exceptions.InvalidInputException(enums.Errors.INVALID_INPUT_ERROR.format('datafile'))
+
+  config = project_config.ProjectConfig(datafile, NoOpLogger(), NoOpErrorHandler())
+  if not config.was_parsing_successful():
+    raise exceptions.InvalidInputException(enums.Errors.UNSUPPORTED_DATAFILE_VERSION)
+
+  return config
+
+
+def _get_simulated_experiments(config):
+  """ Helper method to list the running experiments to simulate, sorted by key. """
+
+  return [config.experiment_key_map[experiment_key] for experiment_key in sorted(config.experiment_key_map)
+          if experiment_helper.is_experiment_running(config.experiment_key_map[experiment_key])]
+
+
+def _get_simulated_features(config):
+  """ Helper method to list the features which have a rollout, sorted by key. """
+
+  return [config.feature_key_map[feature_key] for feature_key in sorted(config.feature_key_map)
+          if config.feature_key_map[feature_key].layerId]
+
+
+def _initialize_worker(datafile, mode, attributes):
+  """ Pool initializer building the config and decision service of a worker process. """
+
+  config = _load_config(datafile)
+  _worker_state.update({
+    'config': config,
+    'decision_service': decision_service.DecisionService(config, None),
+    'mode': mode,
+    'attributes': attributes
+  })
+
+
+def _simulate_shard(shard):
+  """ Simulate the users of one shard of the user ID space.
+
+  Args:
+    shard: Tuple of (start, end) indices of the synthetic users to simulate.
+
+  Returns:
+    Tuple of (experiment_counts, group_violations, rollout_counts).
+    experiment_counts: List holding for every experiment an array of counts per variation,
+                       with users in no variation counted last.
+    group_violations: Array holding for every group the number of users bucketed into more than one experiment.
+    rollout_counts: Array holding for every feature the number of users the rollout returned a variation for.
+  """
+
+  config = _worker_state['config']
+  decisions = _worker_state['decision_service']
+  attributes = _worker_state['attributes']
+  start, end = shard
+  user_ids = [USER_ID_TEMPLATE.format(index=index) for index in range(start, end)]
+
+  experiments = _get_simulated_experiments(config)
+  group_ids = sorted(config.group_id_map)
+  # Number of experiments of its group every user is bucketed into, two bytes per user
+  group_experiment_counts = dict((group_id, array.array('H', [0]) * len(user_ids)) for group_id in group_ids)
+
+  experiment_counts = []
+  for experiment in experiments:
+    if _worker_state['mode'] == SimulationModes.DECISION_SERVICE:
+      variations = [decisions.get_variation(experiment, user_id, attributes, ignore_user_profile=True)
+                    for user_id in user_ids]
+    else:
+      variations = decisions.bucketer.bucket_many(experiment, user_ids)
+
+    variation_indices = dict((variation.get('id'), index) for index, variation in enumerate(experiment.variations))
+    no_variation_index = len(experiment.variations)
+    counts = array.array('l', [0] * (no_variation_index + 1))
+    users_in_group_experiment = group_experiment_counts.get(experiment.groupId)
+    for user_index, variation in enumerate(variations):
+      if variation:
+        counts[variation_indices[variation.id]] += 1
+        if users_in_group_experiment is not None:
+          users_in_group_experiment[user_index] += 1
+      else:
+        counts[no_variation_index] += 1
+    experiment_counts.append(counts)
+
+  group_violations = array.array('l', [
+    sum(1 for count in group_experiment_counts[group_id] if count > 1) for group_id in group_ids
+  ])
+
+  rollout_counts = array.array('l')
+  for feature in _get_simulated_features(config):
+    layer = config.get_layer_from_id(feature.layerId)
+    if _worker_state['mode'] == SimulationModes.DECISION_SERVICE:
+      rollout_counts.append(sum(
+        1 for user_id in user_ids
+        if decisions.get_variation_for_layer(layer, user_id, attributes, ignore_user_profile=True)
+      ))
+    else:
+      rollout_counts.append(_count_bucketed_rollout_users(decisions.bucketer, layer, user_ids))
+
+  return experiment_counts, group_violations, rollout_counts
+
+
+def _count_bucketed_rollout_users(bucketer_obj, layer, user_ids):
+  """ Helper method to count the users bucketed into a variation of any running experiment of a rollout,
+  bucketing the users not covered by the experiments before each experiment in one vectorized pass.
+
+  Args:
+    bucketer_obj: Bucketer to bucket users with.
+    layer: Layer of the rollout. None if it is not in the datafile.
+    user_ids: List of user IDs.
+
+  Returns:
+    Number of users the rollout returns a variation for when audiences are ignored.
+  """
+
+  covered = 0
+  uncovered_user_ids = user_ids
+  for experiment in layer.experiments if layer else []:
+    if not uncovered_user_ids:
+      break
+    if not experiment_helper.is_experiment_running(experiment):
+      continue
+
+    variations = bucketer_obj.bucket_many(experiment, uncovered_user_ids)
+    remaining_user_ids = [user_id for user_id, variation in zip(uncovered_user_ids, variations) if not variation]
+    covered += len(uncovered_user_ids) - len(remaining_user_ids)
+    uncovered_user_ids = remaining_user_ids
+
+  return covered
+
+
+def _get_expected_shares(config, experiment):
+  """ Helper method to compute the share of users every variation of the experiment is expected to get
+  when bucketing ignores audiences and whitelisting.
+
+  Args:
+    config: ProjectConfig the experiment belongs to.
+    experiment: Object representing the experiment.
+
+  Returns:
+    List of expected shares in the order of the experiment's variations.
+  """
+
+  def get_allocated_shares(traffic_allocation):
+    shares = {}
+    previous_end_of_range = 0
+    for allocation in traffic_allocation:
+      end_of_range = max(allocation.get('endOfRange'), previous_end_of_range)
+      entity_id = allocation.get('entityId')
+      shares[entity_id] = shares.get(entity_id, 0.0) + \
+          float(end_of_range - previous_end_of_range) / bucketer.MAX_TRAFFIC_VALUE
+      previous_end_of_range = end_of_range
+    return shares
+
+  experiment_share = 1.0
+  if experiment.groupPolicy in bucketer.GROUP_POLICIES:
+    group = config.group_id_map.get(experiment.groupId)
+    experiment_share = get_allocated_shares(group.trafficAllocation).get(experiment.id, 0.0) if group else 0.0
+
+  variation_shares = get_allocated_shares(experiment.trafficAllocation)
+  return [experiment_share * variation_shares.get(variation.get('id'), 0.0) for variation in experiment.variations]
+
+
+class SimulationResult(object):
+  """ Class holding the aggregated outcome of a simulation.
+
+  user_count: Number of users simulated.
+  elapsed_time: Wall clock time in seconds the simulation took.
+  experiments: Dict mapping experiment key to dict with the 'counts' per variation key (None for no variation),
+               the 'expected' share per variation key and the 'max_skew', the largest relative deviation of
+               a variation's observed share from its expected share.
+  groups: Dict mapping group ID to the number of users bucketed into more than one of its experiments.
+  rollouts: Dict mapping feature key to dict with the number of users 'covered' by its rollout and the 'coverage'.
+  """
+
+  def __init__(self, user_count, elapsed_time, experiments, groups, rollouts):
+    self.user_count = user_count
+    self.elapsed_time = elapsed_time
+    self.experiments = experiments
+    self.groups = groups
+    self.rollouts = rollouts
+
+  @property
+  def throughput(self):
+    """ Number of users simulated per second. """
+
+    return self.user_count / self.elapsed_time if self.elapsed_time else float('inf')
+
+  def format_report(self):
+    """ Format the result as a human readable report.
+
+    Returns:
+      String holding the report.
+    """
+
+    lines = ['Simulated %d users in %.2fs (%d users/s).' % (self.user_count, self.elapsed_time, self.throughput)]
+    for experiment_key in sorted(self.experiments):
+      experiment = self.experiments[experiment_key]
+      lines.append('Experiment "%s" (max skew %.4f):' % (experiment_key, experiment['max_skew']))
+      for variation_key, count in sorted(experiment['counts'].items(), key=lambda item: str(item[0])):
+        expected = experiment['expected'].get(variation_key)
+        lines.append('  %s: %d (%.4f observed%s)' % (
+          variation_key, count, float(count) / self.user_count,
+          '' if expected is None else ', %.4f expected' % expected
+        ))
+    for group_id in sorted(self.groups):
+      lines.append('Group %s: %d users in more than one experiment.' % (group_id, self.groups[group_id]))
+    for feature_key in sorted(self.rollouts):
+      lines.append('Rollout of feature "%s": %.4f coverage.' % (feature_key, self.rollouts[feature_key]['coverage']))
+
+    return '\n'.join(lines)
+
+
+def simulate(datafile_path, user_count, processes=None, mode=SimulationModes.BUCKETER, attributes=None,
+             shard_size=DEFAULT_SHARD_SIZE):
+  """ Simulate synthetic users against a datafile.
+
+  Args:
+    datafile_path: Path to the JSON datafile.
+    user_count: Number of synthetic users to simulate.
+    processes: Number of worker processes. Defaults to the number of CPUs. 1 simulates in this process.
+    mode: One of SimulationModes.
+    attributes: Dict representing attributes of every synthetic user.
+    shard_size: Number of users per unit of work handed to a worker.
+
+  Returns:
+    SimulationResult holding distribution statistics and throughput.
+  """
+
+  with open(datafile_path) as datafile_file:
+    datafile = datafile_file.read()
+
+  config = _load_config(datafile)
+  experiments = _get_simulated_experiments(config)
+  group_ids = sorted(config.group_id_map)
+  features = _get_simulated_features(config)
+  shards = [(start, min(start + shard_size, user_count)) for start in range(0, user_count, shard_size)]
+
+  experiment_counts = [array.array('l', [0] * (len(experiment.variations) + 1)) for experiment in experiments]
+  group_violations = array.array('l', [0] * len(group_ids))
+  rollout_counts = array.array('l', [0] * len(features))
+
+  def aggregate(shard_result):
+    shard_experiment_counts, shard_group_violations, shard_rollout_counts = shard_result
+    for counts, shard_counts in zip(experiment_counts, shard_experiment_counts):
+      for index, count in enumerate(shard_counts):
+        counts[index] += count
+    for index, count in enumerate(shard_group_violations):
+      group_violations[index] += count
+    for index, count in enumerate(shard_rollout_counts):
+      rollout_counts[index] += count
+
+  start_time = timeit.default_timer()
+  if processes == 1:
+    _initialize_worker(datafile, mode, attributes)
+    for shard in shards:
+      aggregate(_simulate_shard(shard))
+  else:
+    pool = multiprocessing.Pool(processes, _initialize_worker, (datafile, mode, attributes))
+    try:
+      for shard_result in pool.imap_unordered(_simulate_shard, shards):
+        aggregate(shard_result)
+    finally:
+      pool.terminate()
+      pool.join()
+  elapsed_time = timeit.default_timer() - start_time
+
+  experiment_results = {}
+  for experiment, counts in zip(experiments, experiment_counts):
+    variation_keys = [variation.get('key') for variation in experiment.variations]
+    expected_shares = _get_expected_shares(config, experiment)
+    max_skew = 0.0
+    for count, expected_share in zip(counts, expected_shares):
+      if expected_share and user_count:
+        max_skew = max(max_skew, abs(float(count) / user_count / expected_share - 1))
+
+    result_counts = dict(zip(variation_keys, counts))
+    result_counts[None] = counts[-1]
+    experiment_results[experiment.key] = {
+      'counts': result_counts,
+      'expected': dict(zip(variation_keys, expected_shares)),
+      'max_skew': max_skew
+    }
+
+  return SimulationResult(
+    user_count,
+    elapsed_time,
+    experiment_results,
+    dict(zip(group_ids, group_violations)),
+    dict((feature.key, {
+      'covered': covered,
+      'coverage': float(covered) / user_count if user_count else 0.0
+    }) for feature, covered in zip(features, rollout_counts))
+  )
+
+
+def main(args=None):
+  parser = argparse.ArgumentParser(description='Simulate synthetic users against an Optimizely datafile.')
+  parser.add_argument('datafile_path', help='Path to the JSON datafile.')
+  parser.add_argument('--users', type=int, default=1000000, help='Number of synthetic users.')
+  parser.add_argument('--processes', type=int, default=None, help='Number of worker processes.')
+  parser.add_argument('--mode', choices=[SimulationModes.BUCKETER, SimulationModes.DECISION_SERVICE],
+                      default=SimulationModes.BUCKETER, help='Whether to bucket or decide with audiences.')
+  parser.add_argument('--attributes', type=json.loads, default=None,
+                      help='JSON object of attributes given to every user.')
+  parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Users per unit of work.')
+  options = parser.parse_args(args)
+
+  result = simulate(options.datafile_path, options.users, processes=options.processes, mode=options.mode,
+                    attributes=options.attributes, shard_size=options.shard_size)
+  print(result.format_report())
+
+
+if __name__ == '__main__':
+  main()
@@ -11,6 +11,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import collections
+import sys
+import threading
+import timeit
+
+from .helpers import enums
+from .logger import NoOpLogger
+
+# Write-behind user profile services which were not closed yet
+_open_write_behind_services = set()
+_open_write_behind_services_lock = threading.Lock()
+
 
 class UserProfile(object):
   """ Class encapsulating information representing a user's profile.
@@ -60,7 +73,9 @@ class UserProfile(object):
 
 class UserProfileService(object):
   """ Class encapsulating user profile service functionality.
-  Override with your own implementation for storing and retrieving the user profile. """
+  Override with your own implementation for storing and retrieving the user profile.
+  Optionally add a save_many method taking a list of user profile dicts, which WriteBehindUserProfileService
+  then uses to store a batch of user profiles in one round trip. """
 
   def lookup(self, user_id):
     """ Fetch the user profile dict corresponding to the user ID.
@@ -80,3 +95,230 @@ class UserProfileService(object):
       user_profile: Dict representing the user's profile.
     """
     pass
+
+
+class WriteBehindUserProfileService(object):
+  """ Class wrapping a user profile service to save user profiles in the background.
+
+  Saves are buffered and coalesced per user, so that many decisions for the same user result in one write.
+  The buffer is flushed on a background thread once it holds max_batch_size users or every flush_interval seconds,
+  using save_many of the wrapped service if it provides one. Lookups see buffered profiles, including those of a flush
+  in progress, until the wrapped service saved them. Lookups get copies, so buffered profiles only change on save.
+  Profiles which fail to save stay in the buffer, and the background thread retries them after flush_interval seconds.
+  The background thread keeps the service alive until close is called, which flushes the remaining profiles.
+  Call close once the service is no longer needed. Services still open when the interpreter exits are closed then.
+  """
+
+  def __init__(self, user_profile_service, max_batch_size=100, flush_interval=1.0, logger=None):
+    """ WriteBehindUserProfileService init method.
+
+    Args:
+      user_profile_service: Component which provides lookup and save methods and optionally save_many.
+      max_batch_size: Number of buffered users which triggers a flush.
+      flush_interval: Maximum number of seconds a saved user profile stays in the buffer.
+      logger: Optional component which provides a log method to log messages. By default nothing would be logged.
+    """
+
+    self.user_profile_service = user_profile_service
+    self.max_batch_size = max_batch_size
+    self.flush_interval = flush_interval
+    self.logger = logger or NoOpLogger
+    self.flush_count = 0
+    self.last_flush_latency = None
+    self.max_flush_latency = 0.0
+    self._pending_user_profiles = collections.OrderedDict()
+    # Profiles of the flush in progress, which the wrapped service may not have saved yet
+    self._flushing_user_profiles = {}
+    self._flush_lock = threading.Lock()
+    self._condition = threading.Condition()
+    self._is_closed = False
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+    with _open_write_behind_services_lock:
+      _open_write_behind_services.add(self)
+
+  @property
+  def backlog(self):
+    """ Number of users whose profiles are waiting to be flushed. """
+
+    return len(self._pending_user_profiles)
+
+  def lookup(self, user_id):
+    """ Fetch the user profile dict corresponding to the user ID, preferring a buffered profile.
+
+    Args:
+      user_id: ID for user whose profile needs to be retrieved.
+
+    Returns:
+      Dict representing the user's profile.
+    """
+
+    with self._condition:
+      user_profile = self._get_buffered_user_profile(user_id)
+    if user_profile is not None:
+      return user_profile
+
+    return self.user_profile_service.lookup(user_id)
+
+  def _get_buffered_user_profile(self, user_id):
+    """ Helper method to copy the buffered profile of a user, preferring one saved after the flush in progress.
+    Must be called holding the condition.
+
+    Args:
+      user_id: ID for user whose profile needs to be retrieved.
+
+    Returns:
+      Dict representing the user's profile. None if it is not buffered.
+    """
+
+    user_profile = self._pending_user_profiles.get(user_id)
+    if user_profile is None:
+      user_profile = self._flushing_user_profiles.get(user_id)
+    if user_profile is None:
+      return None
+
+    # Decisions update the experiment bucket map of the returned profile in place
+    return {
+      UserProfile.USER_ID_KEY: user_id,
+      UserProfile.EXPERIMENT_BUCKET_MAP_KEY: dict(user_profile[UserProfile.EXPERIMENT_BUCKET_MAP_KEY])
+    }
+
+  def save(self, user_profile):
+    """ Buffer the user profile dict, merging it with a buffered profile of the same user.
+
+    Args:
+      user_profile: Dict representing the user's profile.
+    """
+
+    user_id = user_profile.get(UserProfile.USER_ID_KEY)
+    with self._condition:
+      pending_user_profile = self._pending_user_profiles.get(user_id)
+      if pending_user_profile is None:
+        self._pending_user_profiles[user_id] = {
+          UserProfile.USER_ID_KEY: user_id,
+          UserProfile.EXPERIMENT_BUCKET_MAP_KEY: dict(user_profile.get(UserProfile.EXPERIMENT_BUCKET_MAP_KEY) or {})
+        }
+      else:
+        pending_user_profile[UserProfile.EXPERIMENT_BUCKET_MAP_KEY].update(
+          user_profile.get(UserProfile.EXPERIMENT_BUCKET_MAP_KEY) or {}
+        )
+
+      if len(self._pending_user_profiles) >= self.max_batch_size:
+        self._condition.notify()
+
+  def flush(self):
+    """ Save all buffered user profiles with the wrapped user profile service.
+    Profiles which fail to save are put back in the buffer for the next flush.
+
+    Returns:
+      Boolean representing whether all buffered user profiles were saved.
+    """
+
+    with self._flush_lock:
+      with self._condition:
+        if not self._pending_user_profiles:
+          return True
+        self._flushing_user_profiles = self._pending_user_profiles
+        self._pending_user_profiles = collections.OrderedDict()
+      user_profiles = list(self._flushing_user_profiles.values())
+
+      start_time = timeit.default_timer()
+      failed_user_profiles = []
+      error = None
+      save_many = getattr(self.user_profile_service, 'save_many', None)
+      if save_many:
+        try:
+          save_many(user_profiles)
+        except:
+          error = sys.exc_info()[1]
+          failed_user_profiles = user_profiles
+      else:
+        for user_profile in user_profiles:
+          try:
+            self.user_profile_service.save(user_profile)
+          except:
+            error = sys.exc_info()[1]
+            failed_user_profiles.append(user_profile)
+
+      with self._condition:
+        if failed_user_profiles:
+          self._requeue(failed_user_profiles)
+        self._flushing_user_profiles = {}
+
+      if failed_user_profiles:
+        self.logger.log(enums.LogLevels.ERROR, 'Unable to save %s user profiles. Retrying on next flush. Error: %s' %
+                        (len(failed_user_profiles), str(error)))
+
+      self.last_flush_latency = timeit.default_timer() - start_time
+      self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+      self.flush_count += 1
+      return not failed_user_profiles
+
+  def _requeue(self, user_profiles):
+    """ Helper method to put user profiles which failed to save back in the buffer, ahead of the profiles buffered
+    meanwhile. Decisions saved meanwhile take precedence. Must be called holding the condition.
+
+    Args:
+      user_profiles: List of dicts representing the users' profiles.
+    """
+
+    # Copy the profiles, as the wrapped service may still refer to those it was given
+    pending_user_profiles = collections.OrderedDict()
+    for user_profile in user_profiles:
+      user_id = user_profile[UserProfile.USER_ID_KEY]
+      pending_user_profiles[user_id] = {
+        UserProfile.USER_ID_KEY: user_id,
+        UserProfile.EXPERIMENT_BUCKET_MAP_KEY: dict(user_profile[UserProfile.EXPERIMENT_BUCKET_MAP_KEY])
+      }
+    for user_id, user_profile in self._pending_user_profiles.items():
+      failed_user_profile = pending_user_profiles.get(user_id)
+      if failed_user_profile is None:
+        pending_user_profiles[user_id] = user_profile
+      else:
+        failed_user_profile[UserProfile.EXPERIMENT_BUCKET_MAP_KEY].update(
+          user_profile[UserProfile.EXPERIMENT_BUCKET_MAP_KEY]
+        )
+    self._pending_user_profiles = pending_user_profiles
+
+  def close(self):
+    """ Stop the background thread and flush the remaining user profiles. """
+
+    with self._condition:
+      self._is_closed = True
+      self._condition.notify()
+    self._thread.join()
+    self.flush()
+    with _open_write_behind_services_lock:
+      _open_write_behind_services.discard(self)
+
+  def _run(self):
+    """ Flush the buffer whenever it is full or the flush interval elapsed, until closed.
+    After a failed flush the full flush interval passes before retrying, even if the buffer is full. """
+
+    is_retrying = False
+    while True:
+      with self._condition:
+        if is_retrying:
+          retry_time = timeit.default_timer() + self.flush_interval
+          while not self._is_closed and timeit.default_timer() < retry_time:
+            self._condition.wait(retry_time - timeit.default_timer())
+        elif not self._is_closed and len(self._pending_user_profiles) < self.max_batch_size:
+          self._condition.wait(self.flush_interval)
+        if self._is_closed:
+          return
+      is_retrying = not self.flush()
+
+
+def _close_open_write_behind_services():
+  """ Close the write-behind user profile services which are still open when the interpreter exits,
+  so that buffered user profiles are saved. """
+
+  with _open_write_behind_services_lock:
+    write_behind_services = list(_open_write_behind_services)
+
+  for write_behind_service in write_behind_services:
+    write_behind_service.close()
+
+
+atexit.register(_close_open_write_behind_services)
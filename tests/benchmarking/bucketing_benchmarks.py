@@ -0,0 +1,359 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import json
+import math
+import random
+import timeit
+from tabulate import tabulate
+
+from optimizely import bucketer
+from optimizely import optimizely
+from optimizely.helpers import enums
+from optimizely.lib import pymmh3
+
+try:
+  import mmh3
+except ImportError:
+  mmh3 = None
+
+
+USER_COUNTS = [10000, 100000, 1000000]
+ALLOCATION_SIZES = [2, 10, 50, 200]
+
+
+def create_datafile(variation_count=2, group_experiment_count=2):
+  """ Helper method to create a datafile with one experiment and one mutually exclusive group.
+
+  Args:
+    variation_count: Number of variations in every experiment.
+    group_experiment_count: Number of experiments in the group.
+
+  Returns:
+    Dict representing the datafile.
+  """
+
+  def create_experiment(experiment_id, key):
+    variations = [{'id': '%s%s' % (experiment_id, index), 'key': 'variation_%s' % index}
+                  for index in range(variation_count)]
+    return {
+      'id': experiment_id,
+      'key': key,
+      'status': 'Running',
+      'layerId': 'layer_%s' % experiment_id,
+      'audienceIds': [],
+      'forcedVariations': {},
+      'variations': variations,
+      'trafficAllocation': [{'entityId': variation['id'], 'endOfRange': (index + 1) * 10000 // variation_count}
+                            for index, variation in enumerate(variations)]
+    }
+
+  group_experiments = [create_experiment('2%04d' % index, 'group_experiment_%s' % index)
+                       for index in range(group_experiment_count)]
+  return {
+    'version': '2',
+    'revision': '1',
+    'accountId': '12001',
+    'projectId': '111001',
+    'experiments': [create_experiment('10000', 'experiment')],
+    'groups': [{
+      'id': '30000',
+      'policy': 'random',
+      'experiments': group_experiments,
+      'trafficAllocation': [{'entityId': experiment['id'], 'endOfRange': (index + 1) * 10000 // group_experiment_count}
+                            for index, experiment in enumerate(group_experiments)]
+    }],
+    'events': [],
+    'attributes': [],
+    'audiences': []
+  }
+
+
+def get_bucketer(variation_count=2, group_experiment_count=2):
+  """ Helper method to create a bucketer for a generated datafile. """
+
+  client = optimizely.Optimizely(json.dumps(create_datafile(variation_count, group_experiment_count)))
+  return bucketer.Bucketer(client.config)
+
+
+def benchmark_bucket_many():
+  """ Compare bucketing users one at a time against bucketing them in one vectorized pass.
+
+  Returns:
+    List of rows holding the experiment, user count and users bucketed per second for each approach.
+  """
+
+  bucketer_obj = get_bucketer()
+  rows = []
+  for experiment_key in ['experiment', 'group_experiment_0']:
+    experiment = bucketer_obj.config.get_experiment_from_key(experiment_key)
+    for user_count in USER_COUNTS:
+      user_ids = ['user_%s' % index for index in range(user_count)]
+
+      start_time = timeit.default_timer()
+      bucket_many_result = bucketer_obj.bucket_many(experiment, user_ids)
+      bucket_many_time = timeit.default_timer() - start_time
+
+      # Bucketing one user at a time is slow, so only time it on a sample and extrapolate
+      sample = user_ids[:min(user_count, 100000)]
+      start_time = timeit.default_timer()
+      bucket_result = [bucketer_obj.bucket(experiment, user_id) for user_id in sample]
+      bucket_time = (timeit.default_timer() - start_time) * user_count / len(sample)
+
+      assert bucket_result == bucket_many_result[:len(sample)]
+      rows.append([experiment_key, user_count, int(user_count / bucket_time), int(user_count / bucket_many_time)])
+
+  return rows
+
+
+def legacy_find_entity(bucketing_number, traffic_allocations):
+  """ Linear scan over the traffic allocations as find_bucket did it before allocations were compiled. """
+
+  for traffic_allocation in traffic_allocations:
+    current_end_of_range = traffic_allocation.get('endOfRange')
+    if bucketing_number < current_end_of_range:
+      return traffic_allocation.get('entityId')
+
+  return None
+
+
+def compiled_find_entity(bucketing_number, config, parent_id, traffic_allocations):
+  """ Lookup in the traffic allocation index compiled by the project config, as find_bucket does it. """
+
+  _, ends_of_range, entity_ids = config.get_traffic_allocation_index(parent_id, traffic_allocations)
+  index = bisect.bisect_right(ends_of_range, bucketing_number)
+  if index < len(entity_ids):
+    return entity_ids[index]
+
+  return None
+
+
+def benchmark_find_bucket(iterations=20000):
+  """ Compare resolving a bucket value to an entity with a linear scan against a bisect over the compiled index,
+  for experiments with many variations and groups with many experiments.
+
+  Returns:
+    List of rows holding the entity, allocation size and nanoseconds per lookup for each approach.
+  """
+
+  bucketing_numbers = [random.randint(0, 9999) for _ in range(iterations)]
+  rows = []
+  for allocation_size in ALLOCATION_SIZES:
+    bucketer_obj = get_bucketer(variation_count=allocation_size, group_experiment_count=allocation_size)
+    config = bucketer_obj.config
+    experiment = config.get_experiment_from_key('experiment')
+    group = config.get_group('30000')
+    for entity_name, parent_id, traffic_allocations in [('experiment', experiment.id, experiment.trafficAllocation),
+                                                         ('group', group.id, group.trafficAllocation)]:
+      for bucketing_number in bucketing_numbers[:1000]:
+        assert legacy_find_entity(bucketing_number, traffic_allocations) == \
+            compiled_find_entity(bucketing_number, config, parent_id, traffic_allocations)
+
+      legacy_time = min(timeit.repeat(
+        lambda: [legacy_find_entity(number, traffic_allocations) for number in bucketing_numbers], number=1, repeat=5
+      ))
+      compiled_time = min(timeit.repeat(
+        lambda: [compiled_find_entity(number, config, parent_id, traffic_allocations) for number in bucketing_numbers],
+        number=1, repeat=5
+      ))
+      rows.append([entity_name, allocation_size,
+                   int(legacy_time * 1e9 / iterations), int(compiled_time * 1e9 / iterations)])
+
+  return rows
+
+
+def legacy_generate_bucket_value(bucketer_obj, bucketing_id):
+  """ Floating point bucket value computation as _generate_bucket_value did it before using integers. """
+
+  ratio = float(bucketer_obj._generate_unsigned_hash_code_32_bit(bucketing_id)) / math.pow(2, 32)
+  return math.floor(ratio * bucketer.MAX_TRAFFIC_VALUE)
+
+
+def legacy_find_bucket(bucketer_obj, user_id, parent_id, traffic_allocations):
+  """ find_bucket as it was before: formatted bucketing ID, floating point bucket value,
+  eagerly formatted debug message and linear scan over the traffic allocations. """
+
+  bucketing_id = bucketer.BUCKETING_ID_TEMPLATE.format(user_id=user_id, parent_id=parent_id)
+  bucketing_number = legacy_generate_bucket_value(bucketer_obj, bucketing_id)
+  bucketer_obj.config.logger.log(enums.LogLevels.DEBUG,
+                                 'Assigned bucket %s to user "%s".' % (bucketing_number, user_id))
+  return legacy_find_entity(bucketing_number, traffic_allocations)
+
+
+def benchmark_find_bucket_per_call(iterations=20000):
+  """ Measure the per call cost of the bucketing hot path before and after moving to integer arithmetic,
+  concatenated bucketing IDs and level-gated debug logging. Uses the NoOpLogger.
+
+  Returns:
+    List of rows holding the operation and nanoseconds per call before and after.
+  """
+
+  bucketer_obj = get_bucketer()
+  experiment = bucketer_obj.config.get_experiment_from_key('experiment')
+  bucketing_id = 'user_42' + experiment.id
+  assert legacy_generate_bucket_value(bucketer_obj, bucketing_id) == bucketer_obj._generate_bucket_value(bucketing_id)
+  assert legacy_find_bucket(bucketer_obj, 'user_42', experiment.id, experiment.trafficAllocation) == \
+      bucketer_obj.find_bucket('user_42', experiment.id, experiment.trafficAllocation)
+
+  def per_call(method):
+    return int(min(timeit.repeat(method, number=iterations, repeat=5)) * 1e9 / iterations)
+
+  return [
+    ['_generate_bucket_value',
+     per_call(lambda: legacy_generate_bucket_value(bucketer_obj, bucketing_id)),
+     per_call(lambda: bucketer_obj._generate_bucket_value(bucketing_id))],
+    ['find_bucket',
+     per_call(lambda: legacy_find_bucket(bucketer_obj, 'user_42', experiment.id, experiment.trafficAllocation)),
+     per_call(lambda: bucketer_obj.find_bucket('user_42', experiment.id, experiment.trafficAllocation))],
+  ]
+
+
+def benchmark_bucket_experiments(iterations=200):
+  """ Compare bucketing one user into many experiments one at a time against bucket_experiments,
+  which hashes the user ID prefix once and reuses group buckets. Hashing uses pymmh3, then mmh3 if available.
+
+  Returns:
+    List of rows holding the hash implementation, experiment count and microseconds per user for each approach.
+  """
+
+  rows = []
+  hash_modules = [('pymmh3', pymmh3)]
+  if mmh3:
+    hash_modules.append(('mmh3', mmh3))
+
+  for experiment_count in [10, 50]:
+    bucketer_obj = get_bucketer(group_experiment_count=experiment_count)
+    experiments = [bucketer_obj.config.get_experiment_from_key('experiment')]
+    experiments.extend([bucketer_obj.config.get_experiment_from_key('group_experiment_%s' % index)
+                        for index in range(experiment_count)])
+    user_ids = ['user_%s' % index for index in range(iterations)]
+
+    for hash_name, hash_module in hash_modules:
+      original_hash_module = bucketer.mmh3
+      bucketer.mmh3 = hash_module
+      try:
+        assert [bucketer_obj.bucket(experiment, 'user_42') for experiment in experiments] == \
+            bucketer_obj.bucket_experiments(experiments, 'user_42')
+        bucket_time = min(timeit.repeat(
+          lambda: [[bucketer_obj.bucket(experiment, user_id) for experiment in experiments] for user_id in user_ids],
+          number=1, repeat=3
+        ))
+        bucket_experiments_time = min(timeit.repeat(
+          lambda: [bucketer_obj.bucket_experiments(experiments, user_id) for user_id in user_ids], number=1, repeat=3
+        ))
+      finally:
+        bucketer.mmh3 = original_hash_module
+
+      rows.append([hash_name, len(experiments),
+                   int(bucket_time * 1e6 / iterations), int(bucket_experiments_time * 1e6 / iterations)])
+
+  return rows
+
+
+def legacy_pymmh3_hash(key, seed=0x0):
+  """ Byte by byte pure Python murmur3 hash as it was implemented in pymmh3 before it unpacked blocks in bulk.
+  Kept as the baseline for benchmark_pymmh3. """
+
+  key = bytearray(key.encode() if not isinstance(key, (bytes, bytearray)) else key)
+
+  def fmix(h):
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h
+
+  length = len(key)
+  nblocks = int(length / 4)
+  h1 = seed
+  c1 = 0xcc9e2d51
+  c2 = 0x1b873593
+
+  for block_start in range(0, nblocks * 4, 4):
+    k1 = key[block_start + 3] << 24 | key[block_start + 2] << 16 | key[block_start + 1] << 8 | key[block_start + 0]
+    k1 = (c1 * k1) & 0xFFFFFFFF
+    k1 = (k1 << 15 | k1 >> 17) & 0xFFFFFFFF
+    k1 = (c2 * k1) & 0xFFFFFFFF
+    h1 ^= k1
+    h1 = (h1 << 13 | h1 >> 19) & 0xFFFFFFFF
+    h1 = (h1 * 5 + 0xe6546b64) & 0xFFFFFFFF
+
+  tail_index = nblocks * 4
+  k1 = 0
+  tail_size = length & 3
+  if tail_size >= 3:
+    k1 ^= key[tail_index + 2] << 16
+  if tail_size >= 2:
+    k1 ^= key[tail_index + 1] << 8
+  if tail_size >= 1:
+    k1 ^= key[tail_index + 0]
+  if tail_size > 0:
+    k1 = (k1 * c1) & 0xFFFFFFFF
+    k1 = (k1 << 15 | k1 >> 17) & 0xFFFFFFFF
+    k1 = (k1 * c2) & 0xFFFFFFFF
+    h1 ^= k1
+
+  unsigned_val = fmix(h1 ^ length)
+  if unsigned_val & 0x80000000 == 0:
+    return unsigned_val
+  return -((unsigned_val ^ 0xFFFFFFFF) + 1)
+
+
+def benchmark_pymmh3(iterations=20000):
+  """ Compare the murmur3 implementations on typical bucketing IDs i.e. user ID followed by experiment ID.
+
+  Returns:
+    List of rows holding the bucketing ID length and nanoseconds per hash for each implementation.
+  """
+
+  bucketing_ids = [
+    'user_42' + '8355521',
+    'c9f8bcd0-3e5c-4ce3-a95e-0e8b5a8b2b3a' + '8355521',
+    'someone.with.a.long.name@example.com' + '10390965532',
+  ]
+  implementations = [('legacy pymmh3', legacy_pymmh3_hash), ('pymmh3', pymmh3.hash)]
+  if mmh3:
+    implementations.append(('mmh3', mmh3.hash))
+
+  rows = []
+  for bucketing_id in bucketing_ids:
+    row = [len(bucketing_id)]
+    for _, hash_method in implementations:
+      assert hash_method(bucketing_id, 1) == pymmh3.hash(bucketing_id, 1)
+      elapsed = min(timeit.repeat(lambda: hash_method(bucketing_id, 1), number=iterations, repeat=5))
+      row.append(int(elapsed * 1e9 / iterations))
+    rows.append(row)
+
+  return rows, ['Bucketing ID length'] + ['%s (ns/hash)' % name for name, _ in implementations]
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_bucket_many(),
+                 headers=['Experiment', 'Users', 'bucket (users/s)', 'bucket_many (users/s)']))
+  print('')
+  rows, headers = benchmark_pymmh3()
+  print(tabulate(rows, headers=headers))
+  print('')
+  print(tabulate(benchmark_find_bucket(),
+                 headers=['Entity', 'Allocations', 'linear scan (ns/lookup)', 'compiled bisect (ns/lookup)']))
+  print('')
+  print(tabulate(benchmark_find_bucket_per_call(), headers=['Operation', 'before (ns/call)', 'after (ns/call)']))
+  print('')
+  print(tabulate(benchmark_bucket_experiments(),
+                 headers=['Hash', 'Experiments', 'bucket (us/user)', 'bucket_experiments (us/user)']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
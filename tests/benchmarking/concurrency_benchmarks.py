@@ -0,0 +1,112 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import timeit
+from tabulate import tabulate
+
+from optimizely import optimizely
+
+import bucketing_benchmarks
+
+
+THREAD_COUNTS = [1, 2, 4, 8, 16, 32]
+
+
+class CollectingEventDispatcher(object):
+  """ Event dispatcher keeping the dispatched events per thread instead of sending them. """
+
+  def __init__(self):
+    self.local = threading.local()
+
+  def dispatch_event(self, event):
+    self.local.events.append(event)
+
+
+def create_datafile():
+  """ Helper method to create a datafile with a feature and an event on top of the bucketing benchmark datafile. """
+
+  datafile = bucketing_benchmarks.create_datafile()
+  datafile['version'] = '4'
+  datafile['events'] = [{'id': '50000', 'key': 'event', 'experimentIds': ['10000', '20000']}]
+  datafile['features'] = [{'id': '40000', 'key': 'feature', 'experimentIds': ['10000'], 'layerId': '', 'variables': []}]
+  datafile['layers'] = []
+  return datafile
+
+
+def run_api_calls(client, user_ids):
+  """ Make activate, track and is_feature_enabled calls for every user.
+
+  Returns:
+    List of tuples holding the outcome of the calls for every user, leaving out event timestamps.
+  """
+
+  client.event_dispatcher.local.events = []
+  outcomes = []
+  for user_id in user_ids:
+    attributes = {}
+    variation_key = client.activate('experiment', user_id, attributes)
+    client.track('event', user_id, attributes)
+    is_feature_enabled = client.is_feature_enabled('feature', user_id, attributes)
+    outcomes.append((user_id, variation_key, is_feature_enabled))
+
+  for event in client.event_dispatcher.local.events:
+    event.params.pop('timestamp')
+    outcomes.append((event.url, json.dumps(event.params, sort_keys=True)))
+
+  return outcomes
+
+
+def benchmark_concurrency(users_per_thread=2000):
+  """ Run API calls on one shared client from a growing number of threads. Every thread checks that
+  it gets the same decisions and events as a single thread making the same calls.
+
+  Returns:
+    List of rows holding the thread count, API calls per second and the speedup over one thread.
+  """
+
+  client = optimizely.Optimizely(json.dumps(create_datafile()), event_dispatcher=CollectingEventDispatcher())
+  user_ids = ['user_%s' % index for index in range(users_per_thread)]
+  expected_outcomes = run_api_calls(client, user_ids)
+
+  rows = []
+  for thread_count in THREAD_COUNTS:
+    outcomes = [None] * thread_count
+
+    def run(thread_index):
+      outcomes[thread_index] = run_api_calls(client, user_ids)
+
+    threads = [threading.Thread(target=run, args=(thread_index,)) for thread_index in range(thread_count)]
+    start_time = timeit.default_timer()
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    elapsed_time = timeit.default_timer() - start_time
+
+    assert all(thread_outcomes == expected_outcomes for thread_outcomes in outcomes), \
+        'Concurrent API calls produced different decisions or events.'
+
+    calls_per_second = int(3 * users_per_thread * thread_count / elapsed_time)
+    rows.append([thread_count, calls_per_second, '%.2f' % (float(calls_per_second) / rows[0][1] if rows else 1.0)])
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_concurrency(), headers=['Threads', 'API calls/s', 'Speedup']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
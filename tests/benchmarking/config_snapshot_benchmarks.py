@@ -0,0 +1,58 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import timeit
+from tabulate import tabulate
+
+from optimizely import optimizely
+
+import bucketing_benchmarks
+
+
+def benchmark_startup(experiment_counts=(100, 1000, 5000)):
+  """ Compare client construction time when building the config from the datafile
+  against loading it from a snapshot of the same datafile.
+
+  Returns:
+    List of rows holding the number of experiments, build and load time in milliseconds and the speedup.
+  """
+
+  temp_dir = tempfile.mkdtemp()
+  rows = []
+  try:
+    for experiment_count in experiment_counts:
+      datafile = json.dumps(bucketing_benchmarks.create_datafile(group_experiment_count=experiment_count))
+      snapshot_path = os.path.join(temp_dir, 'config_%s.snapshot' % experiment_count)
+      optimizely.Optimizely(datafile, config_snapshot_path=snapshot_path)
+
+      build_time = min(timeit.repeat(lambda: optimizely.Optimizely(datafile), number=1, repeat=3))
+      load_time = min(timeit.repeat(lambda: optimizely.Optimizely(datafile, config_snapshot_path=snapshot_path),
+                                    number=1, repeat=3))
+      rows.append([experiment_count, round(build_time * 1000, 1), round(load_time * 1000, 1),
+                   round(build_time / load_time, 1)])
+  finally:
+    shutil.rmtree(temp_dir)
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_startup(), headers=['experiments', 'build (ms)', 'snapshot (ms)', 'speedup']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
@@ -0,0 +1,257 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+
+from optimizely import entities
+from optimizely.helpers import condition as condition_helper
+
+# Share of experiments which are paused, as in real projects not every experiment is running
+PAUSED_SHARE = 0.1
+MAX_TRAFFIC = 10000
+
+VARIABLE_TYPES = [
+  (entities.Variable.Type.BOOLEAN, lambda rng: rng.choice(['true', 'false'])),
+  (entities.Variable.Type.INTEGER, lambda rng: str(rng.randint(0, 1000))),
+  (entities.Variable.Type.DOUBLE, lambda rng: str(round(rng.random() * 100, 3))),
+  (entities.Variable.Type.STRING, lambda rng: 'value_%s' % rng.randint(0, 1000))
+]
+
+
+class DatafileGenerator(object):
+  """ Generator of datafiles shaped like those of large projects, for benchmarking the SDK at scale.
+
+  All IDs are unique across entities, and the same arguments and seed always generate the same datafile.
+  """
+
+  def __init__(self,
+               experiment_count=100,
+               variation_count=2,
+               group_count=0,
+               group_size=5,
+               attribute_count=10,
+               audience_count=10,
+               audience_depth=2,
+               experiment_audience_count=1,
+               feature_count=0,
+               variable_count=4,
+               rollout_count=0,
+               rollout_rule_count=2,
+               whitelist_size=0,
+               event_count=10,
+               seed=1):
+    """ DatafileGenerator init method.
+
+    Args:
+      experiment_count: Number of experiments, including those in groups and excluding rollout rules.
+      variation_count: Number of variations of every experiment.
+      group_count: Number of mutually exclusive groups.
+      group_size: Number of experiments in every group.
+      attribute_count: Number of attributes audience conditions refer to.
+      audience_count: Number of audiences.
+      audience_depth: Number of levels of and, or and not operators nesting the conditions of every audience.
+      experiment_audience_count: Maximum number of audiences targeted by every experiment.
+      feature_count: Number of features, each using one of the experiments which are not in a group.
+      variable_count: Number of variables of every feature.
+      rollout_count: Number of rollouts, which features use in turn.
+      rollout_rule_count: Number of rules of every rollout.
+      whitelist_size: Number of whitelisted users of every experiment.
+      event_count: Number of events.
+      seed: Seed of the random choices.
+    """
+
+    self.experiment_count = experiment_count
+    self.variation_count = variation_count
+    self.group_count = min(group_count, experiment_count // max(group_size, 1))
+    self.group_size = group_size
+    self.attribute_count = attribute_count
+    self.audience_count = audience_count
+    self.audience_depth = audience_depth
+    self.experiment_audience_count = experiment_audience_count
+    self.feature_count = min(feature_count, experiment_count - self.group_count * group_size)
+    self.variable_count = variable_count
+    self.rollout_count = rollout_count
+    self.rollout_rule_count = rollout_rule_count
+    self.whitelist_size = whitelist_size
+    self.event_count = event_count
+    self.seed = seed
+    self._random = None
+    self._next_id = None
+    self._audience_ids = None
+
+  def _create_id(self):
+    self._next_id += 1
+    return str(self._next_id)
+
+  def _create_condition(self, depth):
+    """ Helper method to create a tree of conditions on attributes nested depth levels deep.
+
+    Args:
+      depth: Number of levels of operators above the leaf conditions.
+
+    Returns:
+      List or dict representing the condition.
+    """
+
+    if depth == 0:
+      return {
+        'name': 'attribute_%s' % self._random.randrange(self.attribute_count),
+        'type': 'custom_attribute',
+        'value': 'value_%s' % self._random.randrange(3)
+      }
+
+    operator = self._random.choice(condition_helper.DEFAULT_OPERATOR_TYPES)
+    operand_count = 1 if operator == condition_helper.ConditionalOperatorTypes.NOT else 2
+    return [operator] + [self._create_condition(depth - 1) for _ in range(operand_count)]
+
+  def _create_experiment(self, key, layer_id, variable_ids=None):
+    """ Helper method to create an experiment with evenly allocated variations, audiences and whitelisted users.
+
+    Args:
+      key: Key of the experiment.
+      layer_id: ID of the layer of the experiment.
+      variable_ids: Optional list of IDs of the feature variables the variations set.
+
+    Returns:
+      Dict representing the experiment.
+    """
+
+    experiment_id = self._create_id()
+    variations = []
+    for index in range(self.variation_count):
+      variation = {'id': self._create_id(), 'key': 'variation_%s' % index}
+      if variable_ids:
+        variation['variables'] = [{'id': variable_id, 'value': str(self._random.randint(0, 1))}
+                                  for variable_id in variable_ids[::2]]
+      variations.append(variation)
+
+    audience_ids = []
+    if self.audience_count:
+      audience_ids = [self._audience_ids[self._random.randrange(self.audience_count)]
+                      for _ in range(self._random.randint(0, self.experiment_audience_count))]
+
+    return {
+      'id': experiment_id,
+      'key': key,
+      'status': 'Paused' if self._random.random() < PAUSED_SHARE else 'Running',
+      'layerId': layer_id,
+      'audienceIds': audience_ids,
+      'forcedVariations': dict(('whitelisted_user_%s' % index, self._random.choice(variations)['key'])
+                               for index in range(self.whitelist_size)),
+      'variations': variations,
+      'trafficAllocation': self._create_traffic_allocation([variation['id'] for variation in variations])
+    }
+
+  @staticmethod
+  def _create_traffic_allocation(entity_ids):
+    return [{'entityId': entity_id, 'endOfRange': (index + 1) * MAX_TRAFFIC // len(entity_ids)}
+            for index, entity_id in enumerate(entity_ids)]
+
+  def generate(self):
+    """ Generate the datafile.
+
+    Returns:
+      Dict representing the datafile.
+    """
+
+    self._random = random.Random(self.seed)
+    self._next_id = 100000
+
+    attributes = [{'id': self._create_id(), 'key': 'attribute_%s' % index} for index in range(self.attribute_count)]
+    audiences = [{
+      'id': self._create_id(),
+      'name': 'audience_%s' % index,
+      'conditions': json.dumps(self._create_condition(self.audience_depth))
+    } for index in range(self.audience_count)]
+    self._audience_ids = [audience['id'] for audience in audiences]
+
+    groups = []
+    for group_index in range(self.group_count):
+      group_experiments = [self._create_experiment('group_%s_experiment_%s' % (group_index, index), self._create_id())
+                           for index in range(self.group_size)]
+      groups.append({
+        'id': self._create_id(),
+        'policy': 'random',
+        'experiments': group_experiments,
+        'trafficAllocation': self._create_traffic_allocation([experiment['id'] for experiment in group_experiments])
+      })
+
+    layers = []
+    for rollout_index in range(self.rollout_count):
+      layer_id = self._create_id()
+      layers.append({
+        'id': layer_id,
+        'policy': 'ordered',
+        'experiments': [self._create_experiment('rollout_%s_rule_%s' % (rollout_index, index), layer_id)
+                        for index in range(self.rollout_rule_count)]
+      })
+
+    experiments = []
+    features = []
+    for index in range(self.experiment_count - self.group_count * self.group_size):
+      variable_ids = None
+      if index < self.feature_count:
+        variables = []
+        for variable_index in range(self.variable_count):
+          variable_type, create_value = VARIABLE_TYPES[variable_index % len(VARIABLE_TYPES)]
+          variables.append({
+            'id': self._create_id(),
+            'key': 'variable_%s' % variable_index,
+            'type': variable_type,
+            'defaultValue': create_value(self._random)
+          })
+        variable_ids = [variable['id'] for variable in variables]
+
+      experiment = self._create_experiment('experiment_%s' % index, self._create_id(), variable_ids)
+      experiments.append(experiment)
+      if variable_ids is not None:
+        features.append({
+          'id': self._create_id(),
+          'key': 'feature_%s' % index,
+          'experimentIds': [experiment['id']],
+          'layerId': layers[index % len(layers)]['id'] if layers else '',
+          'variables': variables
+        })
+
+    experiment_ids = [experiment['id'] for experiment in experiments]
+    events = [{
+      'id': self._create_id(),
+      'key': 'event_%s' % index,
+      'experimentIds': self._random.sample(experiment_ids, min(3, len(experiment_ids)))
+    } for index in range(self.event_count)]
+
+    return {
+      'version': '4' if features or layers else '2',
+      'revision': '1',
+      'accountId': '12001',
+      'projectId': '111001',
+      'anonymizeIP': False,
+      'experiments': experiments,
+      'groups': groups,
+      'layers': layers,
+      'features': features,
+      'events': events,
+      'attributes': attributes,
+      'audiences': audiences
+    }
+
+
+def generate_datafile(**kwargs):
+  """ Generate a datafile. Takes the arguments of DatafileGenerator.
+
+  Returns:
+    Dict representing the datafile.
+  """
+
+  return DatafileGenerator(**kwargs).generate()
@@ -0,0 +1,129 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import json
+import tracemalloc
+from tabulate import tabulate
+
+from optimizely import entities
+from optimizely import error_handler
+from optimizely import logger
+from optimizely import project_config
+
+import shared_config_benchmarks
+
+
+class DictExperiment(object):
+  """ Experiment entity as it was before entities declared __slots__, holding its fields in a __dict__. """
+
+  def __init__(self, id, key, status, audienceIds, variations, forcedVariations,
+               trafficAllocation, layerId, groupId=None, groupPolicy=None, **kwargs):
+    self.id = id
+    self.key = key
+    self.status = status
+    self.audienceIds = audienceIds
+    self.variations = variations
+    self.forcedVariations = forcedVariations
+    self.trafficAllocation = trafficAllocation
+    self.layerId = layerId
+    self.groupId = groupId
+    self.groupPolicy = groupPolicy
+
+
+class DictVariation(object):
+  """ Variation entity as it was before entities declared __slots__, holding its fields in a __dict__. """
+
+  def __init__(self, id, key, variables=None, **kwargs):
+    self.id = id
+    self.key = key
+    self.variables = variables or []
+
+
+def measure_allocated_memory(create):
+  """ Measure the memory still allocated by the objects a callable creates.
+
+  Returns:
+    Tuple of the object created and the number of bytes it holds on to.
+  """
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    before = tracemalloc.get_traced_memory()[0]
+    created = create()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+  finally:
+    tracemalloc.stop()
+
+  return created, after - before
+
+
+def measure_entity_memory(entity_class, dicts):
+  """ Measure the memory held per entity built from the given dicts, leaving out the list holding the entities.
+
+  Returns:
+    Number of bytes per entity.
+  """
+
+  _, allocated = measure_allocated_memory(lambda: [entity_class(**obj) for obj in dicts])
+  return (allocated - len(dicts) * 8) / float(len(dicts))
+
+
+def benchmark_entity_memory(experiment_count=10000):
+  """ Measure the memory held per entity, on top of the decoded datafile the entities are built from,
+  for the entities holding their fields in a __dict__ as before and for the entities declaring __slots__.
+  Slotted entities are built twice from the same dicts: the first time the memory includes the entries interning adds
+  for identifiers which were not interned yet, the second time it is that of the entities alone.
+
+  Returns:
+    List of rows holding the entity or config, the number of objects measured, bytes per object with a __dict__,
+    bytes per object with __slots__, bytes per object with __slots__ including interning and bytes saved per object.
+  """
+
+  datafile_json = json.dumps(shared_config_benchmarks.create_datafile(experiment_count))
+
+  rows = []
+  for name, dict_entity_class, entity_class in [('Experiment', DictExperiment, entities.Experiment),
+                                                ('Variation', DictVariation, entities.Variation)]:
+    # Decode the datafile for every entity, so that none starts with identifiers interned for another
+    experiment_dicts = json.loads(datafile_json)['experiments']
+    if entity_class is entities.Variation:
+      dicts = [variation_dict for experiment_dict in experiment_dicts
+               for variation_dict in experiment_dict['variations']]
+    else:
+      dicts = experiment_dicts
+
+    dict_allocation = measure_entity_memory(dict_entity_class, dicts)
+    allocations = [measure_entity_memory(entity_class, dicts) for _ in range(2)]
+    rows.append([name, len(dicts), round(dict_allocation, 1), round(allocations[1], 1), round(allocations[0], 1),
+                 round(dict_allocation - allocations[1], 1)])
+
+  datafile = json.loads(datafile_json)
+  _, allocated = measure_allocated_memory(
+    lambda: project_config.ProjectConfig(datafile, logger.NoOpLogger(), error_handler.NoOpErrorHandler)
+  )
+  rows.append(['ProjectConfig per experiment', experiment_count, None, None,
+               round(allocated / float(experiment_count), 1), None])
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_entity_memory(),
+                 headers=['entity', 'count', 'bytes per entity with __dict__', 'bytes per entity with __slots__',
+                          'bytes per entity with __slots__ and interning', 'bytes saved per entity']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
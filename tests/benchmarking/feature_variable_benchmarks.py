@@ -0,0 +1,113 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import timeit
+from tabulate import tabulate
+
+from optimizely import entities
+from optimizely import error_handler
+from optimizely import logger
+from optimizely import project_config
+
+import bucketing_benchmarks
+
+VARIABLE_TYPES = [
+  (entities.Variable.Type.BOOLEAN, 'true'),
+  (entities.Variable.Type.INTEGER, '42'),
+  (entities.Variable.Type.DOUBLE, '4.2'),
+  (entities.Variable.Type.STRING, 'value')
+]
+
+
+def create_datafile(variable_count):
+  """ Helper method to create a datafile with a feature whose variations set half of its variables.
+
+  Args:
+    variable_count: Number of variables of the feature.
+
+  Returns:
+    Dict representing the datafile.
+  """
+
+  datafile = bucketing_benchmarks.create_datafile(variation_count=4, group_experiment_count=1)
+  experiment = datafile['experiments'][0]
+  variables = []
+  for index in range(variable_count):
+    variable_type, default_value = VARIABLE_TYPES[index % len(VARIABLE_TYPES)]
+    variables.append({
+      'id': str(500000 + index),
+      'key': 'variable_%s' % index,
+      'type': variable_type,
+      'defaultValue': default_value
+    })
+  for variation in experiment['variations']:
+    variation['variables'] = [{'id': variable['id'], 'value': variable['defaultValue']}
+                              for variable in variables[::2]]
+
+  datafile['version'] = '4'
+  datafile['features'] = [{
+    'id': '400000',
+    'key': 'feature',
+    'experimentIds': [experiment['id']],
+    'layerId': '',
+    'variables': variables
+  }]
+  return datafile
+
+
+def get_value_typecast_on_read(config, variable, variation):
+  """ Read a variable value the way it was read before values were type-cast at load time. """
+
+  variable_usage = config.variation_variable_usage_map[variation.id].get(variable.id)
+  if variable_usage is None:
+    return config._get_typecast_value(variable.defaultValue, variable.type)
+  return config._get_typecast_value(variable_usage.value, variable.type)
+
+
+def benchmark_variable_reads(variable_count=50, request_count=2000):
+  """ Compare reading every variable of a feature per request when the value is type-cast on every read
+  against reading the value type-cast at load time.
+
+  Returns:
+    List of rows holding the way values are read, microseconds per request and variable reads per second.
+  """
+
+  config = project_config.ProjectConfig(create_datafile(variable_count), logger.NoOpLogger(),
+                                        error_handler.NoOpErrorHandler())
+  feature = config.get_feature_from_key('feature')
+  variables = list(feature.variables.values())
+  variation = list(config.variation_key_map[config.get_experiment_from_id(feature.experimentIds[0]).key].values())[0]
+
+  def read_typecast_on_read():
+    for variable in variables:
+      get_value_typecast_on_read(config, variable, variation)
+
+  def read_precomputed():
+    for variable in variables:
+      config.get_variable_value_for_variation(variable, variation)
+
+  rows = []
+  for mode, read in [('type-cast on read', read_typecast_on_read), ('precomputed', read_precomputed)]:
+    duration = min(timeit.repeat(read, number=request_count, repeat=5))
+    rows.append([mode, round(duration / request_count * 1000000, 2),
+                 int(request_count * variable_count / duration)])
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_variable_reads(), headers=['mode', 'us per request (50 variables)', 'reads/s']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
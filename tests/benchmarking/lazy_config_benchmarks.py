@@ -0,0 +1,75 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import multiprocessing
+import timeit
+from tabulate import tabulate
+
+from optimizely import optimizely
+
+import shared_config_benchmarks
+
+
+def run_worker(datafile, lazy_config, used_experiment_count, results):
+  """ Create a client in a worker process, decide in a subset of the experiments
+  and report the startup time and the memory the client added. """
+
+  # Decode first, so that only the config counts towards startup time and memory
+  datafile = json.loads(datafile)
+  rss_before, _ = shared_config_benchmarks.get_memory_usage()
+  start_time = timeit.default_timer()
+  client = optimizely.Optimizely(datafile, skip_json_validation=True, lazy_config=lazy_config)
+  startup_time = timeit.default_timer() - start_time
+  rss_after_startup, _ = shared_config_benchmarks.get_memory_usage()
+
+  start_time = timeit.default_timer()
+  for index in range(used_experiment_count):
+    client.get_variation('experiment_%s' % index, 'user_%s' % index)
+  first_use_time = timeit.default_timer() - start_time
+  rss_after_use, _ = shared_config_benchmarks.get_memory_usage()
+  results.put((startup_time, rss_after_startup - rss_before, first_use_time, rss_after_use - rss_before))
+
+
+def benchmark_startup(experiment_counts=(1000, 10000), used_experiment_count=100):
+  """ Compare startup time and resident memory of eager and lazy configs, before and after
+  the client decides in a subset of the experiments. Every run gets a freshly spawned process.
+
+  Returns:
+    List of rows holding the number of experiments, the mode, startup time in milliseconds, memory after startup
+    in MB, time of the first decisions in milliseconds and memory after them in MB.
+  """
+
+  context = multiprocessing.get_context('spawn')
+  rows = []
+  for experiment_count in experiment_counts:
+    datafile = json.dumps(shared_config_benchmarks.create_datafile(experiment_count))
+    for mode, lazy_config in [('eager', False), ('lazy', True)]:
+      results = context.Queue()
+      worker = context.Process(target=run_worker, args=(datafile, lazy_config, used_experiment_count, results))
+      worker.start()
+      startup_time, startup_memory, first_use_time, used_memory = results.get()
+      worker.join()
+      rows.append([experiment_count, mode, round(startup_time * 1000, 1), round(startup_memory / 1024.0, 1),
+                   round(first_use_time * 1000, 1), round(used_memory / 1024.0, 1)])
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_startup(), headers=['experiments', 'mode', 'startup (ms)', 'RSS after startup (MB)',
+                                               'first 100 decisions (ms)', 'RSS after decisions (MB)']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
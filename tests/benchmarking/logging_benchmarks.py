@@ -0,0 +1,132 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import timeit
+from tabulate import tabulate
+
+from optimizely import error_handler
+from optimizely import logger
+from optimizely import lookup_miss_cache
+from optimizely import optimizely
+
+import bucketing_benchmarks
+
+
+class NoOpEventDispatcher(object):
+
+  @staticmethod
+  def dispatch_event(event):
+    pass
+
+
+def eagerly_formatted_logging():
+  """ Make every log level look enabled so that log messages are formatted and handed to the NoOpLogger
+  as they were before log calls were gated by level. Returns a method restoring level gating. """
+
+  original_is_enabled_for = logger.NoOpLogger.is_enabled_for
+  logger.NoOpLogger.is_enabled_for = staticmethod(lambda log_level: True)
+
+  def restore():
+    logger.NoOpLogger.is_enabled_for = original_is_enabled_for
+
+  return restore
+
+
+def benchmark_noop_logger(iterations=20000):
+  """ Compare API call throughput with the NoOpLogger when log messages are formatted eagerly
+  against when they are skipped for disabled levels.
+
+  Returns:
+    List of rows holding the API call and calls per second before and after.
+  """
+
+  client = optimizely.Optimizely(json.dumps(bucketing_benchmarks.create_datafile()),
+                                 event_dispatcher=NoOpEventDispatcher)
+  user_ids = ['user_%s' % index for index in range(iterations)]
+  api_calls = [
+    ('get_variation', lambda: [client.get_variation('experiment', user_id) for user_id in user_ids]),
+    ('get_variation (group)', lambda: [client.get_variation('group_experiment_0', user_id) for user_id in user_ids]),
+    ('activate', lambda: [client.activate('experiment', user_id) for user_id in user_ids]),
+  ]
+
+  rows = []
+  for api_name, api_call in api_calls:
+    restore = eagerly_formatted_logging()
+    try:
+      before_time = min(timeit.repeat(api_call, number=1, repeat=3))
+    finally:
+      restore()
+    after_time = min(timeit.repeat(api_call, number=1, repeat=3))
+    rows.append([api_name, int(iterations / before_time), int(iterations / after_time)])
+
+  return rows
+
+
+class NullHandlerLogger(logger.BaseLogger):
+  """ Logger handing messages to the standard logging module, which discards them. """
+
+  def __init__(self):
+    self.logger = logging.getLogger('optimizely_benchmark')
+    self.logger.addHandler(logging.NullHandler())
+    self.logger.propagate = False
+
+  def log(self, log_level, message):
+    self.logger.log(log_level, message)
+
+
+class OverriddenNoOpErrorHandler(error_handler.BaseErrorHandler):
+  """ Error handler which is given exceptions like every handler was before exceptions were built on demand. """
+
+  @staticmethod
+  def handle_error(error):
+    pass
+
+
+def benchmark_lookup_misses(iterations=20000):
+  """ Compare API call throughput for keys which are not in the datafile when every miss is logged
+  and given an exception against when repeated misses are rate-limited and exceptions built on demand.
+
+  Returns:
+    List of rows holding the API call and calls per second before and after.
+  """
+
+  before_client = optimizely.Optimizely(json.dumps(bucketing_benchmarks.create_datafile()),
+                                        event_dispatcher=NoOpEventDispatcher, logger=NullHandlerLogger(),
+                                        error_handler=OverriddenNoOpErrorHandler)
+  before_client.config.lookup_misses = lookup_miss_cache.LookupMissCache(report_interval=0, max_reports=iterations)
+  after_client = optimizely.Optimizely(json.dumps(bucketing_benchmarks.create_datafile()),
+                                       event_dispatcher=NoOpEventDispatcher, logger=NullHandlerLogger())
+  user_ids = ['user_%s' % index for index in range(iterations)]
+
+  rows = []
+  for api_name, api_call in [('get_variation (unknown experiment)',
+                              lambda client: [client.get_variation('unknown', user_id) for user_id in user_ids]),
+                             ('track (unknown event)',
+                              lambda client: [client.track('unknown', user_id) for user_id in user_ids])]:
+    before_time = min(timeit.repeat(lambda: api_call(before_client), number=1, repeat=3))
+    after_time = min(timeit.repeat(lambda: api_call(after_client), number=1, repeat=3))
+    rows.append([api_name, int(iterations / before_time), int(iterations / after_time)])
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_noop_logger(), headers=['API call', 'before (calls/s)', 'after (calls/s)']))
+  print('')
+  print(tabulate(benchmark_lookup_misses(), headers=['API call', 'before (calls/s)', 'after (calls/s)']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
@@ -0,0 +1,178 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import json
+import timeit
+import tracemalloc
+from tabulate import tabulate
+
+from optimizely import optimizely
+
+import datafile_generator
+
+EXPERIMENT_COUNTS = [100, 1000, 10000]
+USER_COUNT = 200
+ATTRIBUTES = dict(('attribute_%s' % index, 'value_%s' % (index % 3)) for index in range(10))
+
+
+class NoOpEventDispatcher(object):
+  """ Event dispatcher dropping the events, so that only the SDK counts towards latency. """
+
+  @staticmethod
+  def dispatch_event(event):
+    pass
+
+
+def create_scaled_datafile(experiment_count, audience_depth=2, whitelist_size=5):
+  """ Helper method to create a datafile with all dimensions scaled along with the number of experiments.
+
+  Args:
+    experiment_count: Number of experiments.
+    audience_depth: Nesting depth of the audience conditions.
+    whitelist_size: Number of whitelisted users of every experiment.
+
+  Returns:
+    Datafile serialized to JSON.
+  """
+
+  return json.dumps(datafile_generator.generate_datafile(
+    experiment_count=experiment_count,
+    variation_count=3,
+    group_count=experiment_count // 20,
+    group_size=5,
+    audience_count=max(experiment_count // 10, 10),
+    audience_depth=audience_depth,
+    experiment_audience_count=2,
+    feature_count=experiment_count // 4,
+    variable_count=8,
+    rollout_count=max(experiment_count // 20, 1),
+    whitelist_size=whitelist_size,
+    event_count=max(experiment_count // 10, 10)
+  ))
+
+
+def measure_construction(datafile, skip_json_validation):
+  """ Measure the time and peak memory taken to construct a client.
+
+  Returns:
+    Tuple of the client, the construction time in milliseconds and the peak memory traced meanwhile in KB.
+  """
+
+  construction_time = min(timeit.repeat(
+    lambda: optimizely.Optimizely(datafile, skip_json_validation=skip_json_validation), number=1, repeat=3))
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    client = optimizely.Optimizely(datafile, event_dispatcher=NoOpEventDispatcher,
+                                   skip_json_validation=skip_json_validation)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+  return client, round(construction_time * 1000, 1), peak_memory // 1024
+
+
+def measure_latency(call, user_count=USER_COUNT):
+  """ Measure the mean latency of an API over user_count distinct users.
+
+  Returns:
+    Microseconds per call.
+  """
+
+  user_ids = ['user_%s' % index for index in range(user_count)]
+
+  def call_for_all_users():
+    for user_id in user_ids:
+      call(user_id)
+
+  duration = min(timeit.repeat(call_for_all_users, number=1, repeat=3))
+  return round(duration / user_count * 1000000, 1)
+
+
+def benchmark_construction():
+  """ Measure client construction with and without JSON schema validation as the datafile scales up.
+
+  Returns:
+    List of rows holding the number of experiments, datafile size, construction times and peak memory.
+  """
+
+  rows = []
+  for experiment_count in EXPERIMENT_COUNTS:
+    datafile = create_scaled_datafile(experiment_count)
+    _, validated_time, validated_memory = measure_construction(datafile, skip_json_validation=False)
+    _, unvalidated_time, unvalidated_memory = measure_construction(datafile, skip_json_validation=True)
+    rows.append([experiment_count, len(datafile) // 1024, validated_time, unvalidated_time,
+                 validated_memory, unvalidated_memory])
+
+  return rows
+
+
+def benchmark_api_latency(experiment_counts=EXPERIMENT_COUNTS, audience_depth=2, whitelist_size=5):
+  """ Measure the latency of the decision and tracking APIs as the datafile scales up.
+
+  Returns:
+    List of rows holding the number of experiments and the microseconds per call of every API.
+  """
+
+  rows = []
+  for experiment_count in experiment_counts:
+    client, _, _ = measure_construction(create_scaled_datafile(experiment_count, audience_depth, whitelist_size),
+                                        skip_json_validation=True)
+    experiment_key = 'experiment_%s' % (experiment_count // 2)
+    feature_key = 'feature_%s' % (experiment_count // 8)
+    rows.append([
+      experiment_count,
+      measure_latency(lambda user_id: client.get_variation(experiment_key, user_id, ATTRIBUTES)),
+      measure_latency(lambda user_id: client.activate(experiment_key, user_id, ATTRIBUTES)),
+      measure_latency(lambda user_id: client.track('event_0', user_id, ATTRIBUTES)),
+      measure_latency(lambda user_id: client.is_feature_enabled(feature_key, user_id, ATTRIBUTES)),
+      measure_latency(lambda user_id: client.get_enabled_features(user_id, ATTRIBUTES), user_count=5)
+    ])
+
+  return rows
+
+
+def benchmark_targeting(experiment_count=1000):
+  """ Measure the latency of activate as audience conditions nest deeper and whitelists grow.
+
+  Returns:
+    List of rows holding the audience depth, whitelist size and microseconds per call of activate.
+  """
+
+  rows = []
+  for audience_depth, whitelist_size in [(1, 0), (3, 0), (6, 0), (1, 100), (1, 1000)]:
+    client, _, _ = measure_construction(create_scaled_datafile(experiment_count, audience_depth, whitelist_size),
+                                        skip_json_validation=True)
+    experiment_key = 'experiment_%s' % (experiment_count // 2)
+    rows.append([audience_depth, whitelist_size,
+                 measure_latency(lambda user_id: client.activate(experiment_key, user_id, ATTRIBUTES))])
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_construction(),
+                 headers=['experiments', 'datafile KB', 'ms validated', 'ms unvalidated',
+                          'peak KB validated', 'peak KB unvalidated']))
+  print('')
+  print(tabulate(benchmark_api_latency(),
+                 headers=['experiments', 'us get_variation', 'us activate', 'us track', 'us is_feature_enabled',
+                          'us get_enabled_features']))
+  print('')
+  print(tabulate(benchmark_targeting(), headers=['audience depth', 'whitelist size', 'us activate']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
@@ -0,0 +1,124 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import timeit
+from tabulate import tabulate
+
+from optimizely import optimizely
+
+import bucketing_benchmarks
+
+
+def create_datafile(experiment_count):
+  """ Helper method to create a datafile with many experiments which are not in a group.
+
+  Args:
+    experiment_count: Number of experiments.
+
+  Returns:
+    Dict representing the datafile.
+  """
+
+  datafile = bucketing_benchmarks.create_datafile(variation_count=4, group_experiment_count=1)
+  experiment_json = json.dumps(datafile['experiments'][0])
+  datafile['experiments'] = []
+  for index in range(experiment_count):
+    experiment = json.loads(experiment_json.replace('10000', str(100000 + index)))
+    experiment['key'] = 'experiment_%s' % index
+    experiment['forcedVariations'] = {'whitelisted_user_%s' % index: experiment['variations'][0]['key']}
+    datafile['experiments'].append(experiment)
+
+  return datafile
+
+
+def get_memory_usage():
+  """ Get resident and private memory of the current process in KB, as reported by /proc on Linux.
+
+  Returns:
+    Tuple of resident set size and unique set size, which leaves out pages shared with other processes.
+  """
+
+  memory_usage = {}
+  with open('/proc/self/smaps_rollup') as smaps_file:
+    for line in smaps_file:
+      fields = line.split()
+      if len(fields) == 3 and fields[2] == 'kB':
+        memory_usage[fields[0].rstrip(':')] = int(fields[1])
+
+  return memory_usage['Rss'], memory_usage['Private_Clean'] + memory_usage['Private_Dirty']
+
+
+def run_worker(datafile, shared_config_path, user_count, results):
+  """ Create a client in a worker process, make decisions and report the memory the client added. """
+
+  rss_before, uss_before = get_memory_usage()
+  client = optimizely.Optimizely(datafile, shared_config_path=shared_config_path)
+  start_time = timeit.default_timer()
+  for index in range(user_count):
+    client.get_variation('experiment_%s' % (index % 100), 'user_%s' % index)
+  decision_time = timeit.default_timer() - start_time
+  rss_after, uss_after = get_memory_usage()
+  results.put((rss_after - rss_before, uss_after - uss_before, user_count / decision_time))
+
+
+def benchmark_memory_per_worker(experiment_count=10000, worker_count=4, user_count=20000):
+  """ Compare the memory each worker adds when building its own config against attaching to a shared config.
+  Workers are spawned rather than forked, so that they do not share pages of this process.
+
+  Returns:
+    List of rows holding the mode, resident and private memory per worker in MB and decisions per second.
+  """
+
+  datafile = json.dumps(create_datafile(experiment_count))
+  temp_dir = tempfile.mkdtemp()
+  shared_config_path = os.path.join(temp_dir, 'config.shared')
+  context = multiprocessing.get_context('spawn')
+  rows = []
+  try:
+    writer = context.Process(target=optimizely.Optimizely, args=(datafile,),
+                                     kwargs={'shared_config_path': shared_config_path})
+    writer.start()
+    writer.join()
+
+    for mode, path in [('own config', None), ('shared config', shared_config_path)]:
+      results = context.Queue()
+      workers = [context.Process(target=run_worker, args=(datafile, path, user_count, results))
+                 for _ in range(worker_count)]
+      for worker in workers:
+        worker.start()
+      worker_results = [results.get() for _ in workers]
+      for worker in workers:
+        worker.join()
+
+      rows.append([mode,
+                   round(sum(result[0] for result in worker_results) / 1024.0 / worker_count, 1),
+                   round(sum(result[1] for result in worker_results) / 1024.0 / worker_count, 1),
+                   int(sum(result[2] for result in worker_results) / worker_count)])
+  finally:
+    shutil.rmtree(temp_dir)
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_memory_per_worker(),
+                 headers=['mode', 'RSS per worker (MB)', 'private per worker (MB)', 'decisions/s']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
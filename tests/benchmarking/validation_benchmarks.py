@@ -0,0 +1,89 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import jsonschema
+import timeit
+from tabulate import tabulate
+
+from optimizely import optimizely
+from optimizely.helpers import constants
+from optimizely.helpers import validator
+
+import scaling_benchmarks
+
+
+def validate_with_new_validator(datafile):
+  """ Validate a decoded datafile the way it was validated before the schema was compiled once per process. """
+
+  try:
+    jsonschema.Draft4Validator(constants.JSON_SCHEMA).validate(datafile)
+  except:
+    return False
+
+  return True
+
+
+def benchmark_validation(experiment_counts=(1000, 5000, 10000)):
+  """ Compare validating decoded datafiles with a new jsonschema validator per call against the compiled schema.
+
+  Returns:
+    List of rows holding the number of experiments, validation times in milliseconds and the speedup.
+  """
+
+  rows = []
+  for experiment_count in experiment_counts:
+    datafile = json.loads(scaling_benchmarks.create_scaled_datafile(experiment_count))
+    assert validate_with_new_validator(datafile) and validator.is_datafile_valid(datafile)
+
+    jsonschema_time = min(timeit.repeat(lambda: validate_with_new_validator(datafile), number=1, repeat=3))
+    compiled_time = min(timeit.repeat(lambda: validator.is_datafile_valid(datafile), number=1, repeat=3))
+    rows.append([experiment_count, round(jsonschema_time * 1000, 1), round(compiled_time * 1000, 1),
+                 round(jsonschema_time / compiled_time, 1)])
+
+  return rows
+
+
+def benchmark_deferred_validation(experiment_counts=(1000, 10000)):
+  """ Compare the time until a client serves decisions when validation completes first, is deferred or is skipped.
+
+  Returns:
+    List of rows holding the number of experiments, startup times and the deferred validation time in milliseconds.
+  """
+
+  rows = []
+  for experiment_count in experiment_counts:
+    datafile = scaling_benchmarks.create_scaled_datafile(experiment_count)
+    row = [experiment_count]
+    for options in [{}, {'deferred_json_validation': True}, {'skip_json_validation': True}]:
+      row.append(round(min(timeit.repeat(lambda: optimizely.Optimizely(datafile, **options),
+                                         number=1, repeat=3)) * 1000, 1))
+
+    client = optimizely.Optimizely(datafile, deferred_json_validation=True)
+    client.datafile_validation.wait()
+    row.append(round(client.datafile_validation.duration * 1000, 1))
+    rows.append(row)
+
+  return rows
+
+
+def run_benchmarks():
+  print(tabulate(benchmark_validation(), headers=['experiments', 'ms jsonschema', 'ms compiled', 'speedup']))
+  print('')
+  print(tabulate(benchmark_deferred_validation(),
+                 headers=['experiments', 'ms startup validated', 'ms startup deferred', 'ms startup skipped',
+                          'ms deferred validation']))
+
+
+if __name__ == '__main__':
+  run_benchmarks()
@@ -11,6 +11,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import mock
 
 from optimizely.helpers import condition as condition_helper
@@ -122,3 +123,21 @@ class ConditionDecoderTests(base.BaseTest):
 
     self.assertEqual(['and', ['or', ['or', 0]]], condition_structure)
     self.assertEqual([['test_attribute', 'test_value']], condition_list)
+
+  def test_loads__matches_json_object_hook(self):
+    """ Test that loads numbers conditions in the order the object_hook of json.JSONDecoder would see them,
+    whichever JSON library decodes the datafile. """
+
+    conditions = json.dumps(['and', ['or', {'name': 'browser_type', 'value': 'firefox'},
+                                     ['not', {'name': 'location', 'value': 'San Francisco'}]],
+                             {'name': 'test_attribute', 'value': 'test_value'}])
+    decoder = condition_helper.ConditionDecoder(condition_helper._audience_condition_deserializer)
+    expected_condition_structure = json.JSONDecoder(object_hook=decoder.object_hook).decode(conditions)
+
+    with mock.patch('optimizely.helpers.datafile._decode', side_effect=json.loads) as mock_decode:
+      condition_structure, condition_list = condition_helper.loads(conditions)
+
+    mock_decode.assert_called_once_with(conditions)
+    self.assertEqual(['and', ['or', 0, ['not', 1]], 2], condition_structure)
+    self.assertEqual(expected_condition_structure, condition_structure)
+    self.assertEqual(decoder.condition_list, condition_list)
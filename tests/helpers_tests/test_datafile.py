@@ -0,0 +1,43 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+
+from optimizely.helpers import datafile as datafile_helper
+
+from tests import base
+
+
+class DatafileTest(base.BaseTest):
+
+  def test_loads(self):
+    """ Test that loads decodes strings and bytes and passes dicts through. """
+
+    self.assertEqual(self.config_dict, datafile_helper.loads(json.dumps(self.config_dict)))
+    self.assertEqual(self.config_dict, datafile_helper.loads(json.dumps(self.config_dict).encode('utf-8')))
+    self.assertIs(self.config_dict, datafile_helper.loads(self.config_dict))
+
+  def test_loads__json_backend(self):
+    """ Test that loads decodes bytes with the standard library when no faster backend is available. """
+
+    with mock.patch('optimizely.helpers.datafile.JSON_BACKEND', new='json'), \
+        mock.patch('optimizely.helpers.datafile._decode', side_effect=json.loads) as mock_decode:
+      self.assertEqual(self.config_dict, datafile_helper.loads(json.dumps(self.config_dict).encode('utf-8')))
+
+    mock_decode.assert_called_once_with(json.dumps(self.config_dict))
+
+  def test_loads__invalid_json(self):
+    """ Test that loads raises for a datafile which is not JSON. """
+
+    self.assertRaises(ValueError, datafile_helper.loads, 'invalid_datafile')
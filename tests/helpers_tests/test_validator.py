@@ -11,11 +11,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import json
+import jsonschema
+import mock
 
 from optimizely import error_handler
 from optimizely import event_dispatcher
 from optimizely import logger
+from optimizely.helpers import constants
 from optimizely.helpers import validator
 
 from tests import base
@@ -27,6 +31,7 @@ class ValidatorTest(base.BaseTest):
     """ Test that valid datafile returns True. """
 
     self.assertTrue(validator.is_datafile_valid(json.dumps(self.config_dict)))
+    self.assertTrue(validator.is_datafile_valid(self.config_dict))
 
   def test_is_datafile_valid__returns_false(self):
     """ Test that invalid datafile returns False. """
@@ -145,3 +150,49 @@ class DatafileValidationTests(base.BaseTest):
     self.assertFalse(validator.is_datafile_valid(json.dumps({
       'invalid_key': 'invalid_value'
     })))
+
+  def test_is_datafile_valid__matches_jsonschema(self):
+    """ Test that the compiled schema decides like jsonschema does on datafiles breaking every kind of constraint. """
+
+    invalid_datafiles = []
+    for update in [lambda datafile: datafile.pop('experiments'),
+                   lambda datafile: datafile.update(revision=42),
+                   lambda datafile: datafile.update(groups={}),
+                   lambda datafile: datafile['experiments'][0].pop('layerId'),
+                   lambda datafile: datafile['experiments'][0]['variations'][0].update(id=None),
+                   lambda datafile: datafile['experiments'][0]['trafficAllocation'][0].update(endOfRange=True),
+                   lambda datafile: datafile['experiments'][0]['trafficAllocation'][0].update(endOfRange='5000'),
+                   lambda datafile: datafile['experiments'][0].update(forcedVariations=[]),
+                   lambda datafile: datafile['groups'][0]['experiments'].append('experiment'),
+                   lambda datafile: datafile['audiences'][0].update(conditions=['and'])]:
+      datafile = copy.deepcopy(self.config_dict)
+      update(datafile)
+      invalid_datafiles.append(datafile)
+
+    json_validator = jsonschema.Draft4Validator(constants.JSON_SCHEMA)
+    for datafile in [self.config_dict, self.config_dict_with_features] + invalid_datafiles:
+      self.assertEqual(json_validator.is_valid(datafile), validator.is_datafile_valid(datafile))
+    self.assertFalse(any(validator.is_datafile_valid(datafile) for datafile in invalid_datafiles))
+
+  def test_is_datafile_valid__compiles_schema_once(self):
+    """ Test that the schema is compiled on first validation only. """
+
+    with mock.patch('optimizely.helpers.validator._datafile_validator', None), \
+      mock.patch('optimizely.helpers.validator._compile_schema',
+                 wraps=validator._compile_schema) as mock_compile_schema:
+      self.assertTrue(validator.is_datafile_valid(self.config_dict))
+      compile_count = mock_compile_schema.call_count
+      self.assertTrue(validator.is_datafile_valid(self.config_dict))
+
+    self.assertEqual(compile_count, mock_compile_schema.call_count)
+
+  def test_is_datafile_valid__unsupported_keyword(self):
+    """ Test that a schema using keywords the compiler does not support is validated by jsonschema. """
+
+    schema = {'type': 'object', 'properties': {'revision': {'type': 'string', 'pattern': '^[0-9]+$'}}}
+
+    self.assertFalse(validator._is_compilable(schema))
+    with mock.patch('optimizely.helpers.validator._datafile_validator', None), \
+      mock.patch('optimizely.helpers.constants.JSON_SCHEMA', schema):
+      self.assertTrue(validator.is_datafile_valid({'revision': '42'}))
+      self.assertFalse(validator.is_datafile_valid({'revision': 'latest'}))
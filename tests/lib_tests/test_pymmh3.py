@@ -0,0 +1,92 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmh3
+import random
+import unittest
+
+from optimizely.lib import pymmh3
+
+
+# Published MurmurHash3 x86_32 test vectors as (key, seed, expected signed hash)
+TEST_VECTORS = [
+  (b'', 0x0, 0),
+  (b'', 0x1, 0x514e28b7),
+  (b'', 0xffffffff, 0x81f16f39 - 0x100000000),
+  (b'\x00\x00\x00\x00', 0x0, 0x2362f9de),
+  (b'aaaa', 0x9747b28c, 0x5a97808a),
+  (b'aaa', 0x9747b28c, 0x283e0130),
+  (b'aa', 0x9747b28c, 0x5d211726),
+  (b'a', 0x9747b28c, 0x7fa09ea6),
+  (b'abcd', 0x9747b28c, 0xf0478627 - 0x100000000),
+  (b'abc', 0x9747b28c, 0xc84a62dd - 0x100000000),
+  (b'ab', 0x9747b28c, 0x74875592),
+  (b'Hello, world!', 0x9747b28c, 0x24884cba),
+  (b'The quick brown fox jumps over the lazy dog', 0x9747b28c, 0x2fa826cd),
+  (b'test_user111127', 0x1, 0x75325998),
+  (b'ppid11886780721', 0x1, 0x8684deb1 - 0x100000000),
+]
+
+
+class Pymmh3Test(unittest.TestCase):
+
+  def test_hash__test_vectors(self):
+    """ Test that hash returns the published value for every test vector. """
+
+    for key, seed, expected_hash in TEST_VECTORS:
+      self.assertEqual(expected_hash, pymmh3.hash(key, seed))
+      self.assertEqual(expected_hash, mmh3.hash(key, seed))
+
+  def test_hash__matches_mmh3_for_all_tail_sizes(self):
+    """ Test that hash matches mmh3 for random keys of every length from 0 to 64 bytes. """
+
+    random_generator = random.Random(42)
+    for length in range(65):
+      for _ in range(20):
+        key = bytes(bytearray(random_generator.getrandbits(8) for _ in range(length)))
+        seed = random_generator.getrandbits(32)
+        self.assertEqual(mmh3.hash(key, seed), pymmh3.hash(key, seed))
+
+  def test_hash__matches_mmh3_for_bucketing_ids(self):
+    """ Test that hash matches mmh3 for typical user ID and experiment ID concatenations. """
+
+    random_generator = random.Random(42)
+    for _ in range(1000):
+      bucketing_id = 'user_%s%s' % (random_generator.getrandbits(40), random_generator.randint(10 ** 9, 10 ** 11))
+      self.assertEqual(mmh3.hash(bucketing_id, 1), pymmh3.hash(bucketing_id, 1))
+
+  def test_hash__text_and_bytearray_keys(self):
+    """ Test that text keys are UTF-8 encoded and bytearray keys are accepted. """
+
+    self.assertEqual(mmh3.hash(u'\u00e9\u4e2d', 1), pymmh3.hash(u'\u00e9\u4e2d', 1))
+    self.assertEqual(mmh3.hash(b'abcde', 1), pymmh3.hash(bytearray(b'abcde'), 1))
+
+  def test_hash_from_prefix__matches_mmh3(self):
+    """ Test that resuming from the state of a prefix gives the hash of prefix + suffix, for every combination of
+    prefix and suffix lengths from 0 to 12 bytes. """
+
+    random_generator = random.Random(42)
+    for prefix_length in range(13):
+      for suffix_length in range(13):
+        prefix = bytes(bytearray(random_generator.getrandbits(8) for _ in range(prefix_length)))
+        suffix = bytes(bytearray(random_generator.getrandbits(8) for _ in range(suffix_length)))
+        seed = random_generator.getrandbits(32)
+        self.assertEqual(mmh3.hash(prefix + suffix, seed),
+                         pymmh3.hash_from_prefix(pymmh3.hash_prefix(prefix, seed), suffix))
+
+  def test_hash_from_prefix__state_is_reusable(self):
+    """ Test that the state of a prefix can be resumed for many suffixes. """
+
+    state = pymmh3.hash_prefix('test_user_1', 1)
+    for parent_id in ['111127', '19228', '32222', '']:
+      self.assertEqual(mmh3.hash('test_user_1' + parent_id, 1), pymmh3.hash_from_prefix(state, parent_id))
@@ -12,6 +12,7 @@
 # limitations under the License.
 
 import json
+import math
 import mmh3
 import mock
 import random
@@ -21,6 +22,7 @@ from optimizely import entities
 from optimizely import logger
 from optimizely import optimizely
 from optimizely.helpers import enums
+from optimizely.lib import npmmh3
 from optimizely.lib import pymmh3
 
 from . import base
@@ -108,6 +110,70 @@ class BucketerTest(base.BaseTest):
     self.assertEqual([mock.call('test_user19228'), mock.call('test_user32222')],
                      mock_generate_bucket_value.call_args_list)
 
+  def test_bucket_experiments(self):
+    """ Test that bucket_experiments returns the same variations as bucket for every experiment. """
+
+    experiments = [self.project_config.get_experiment_from_key(experiment_key)
+                   for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']]
+    for user_id in ['test_user_%s' % index for index in range(200)] + ['', u'\u00e9', 42]:
+      expected_variations = [self.bucketer.bucket(experiment, user_id) for experiment in experiments]
+      self.assertEqual(expected_variations, self.bucketer.bucket_experiments(experiments, user_id))
+
+      with mock.patch('optimizely.bucketer.mmh3', pymmh3):
+        self.assertEqual(expected_variations, self.bucketer.bucket_experiments(experiments, user_id))
+
+  def test_bucket_experiments__reuses_group_bucket_and_user_hash_state(self):
+    """ Test that bucket_experiments computes the group bucket once and hashes the user ID prefix once. """
+
+    experiments = [self.project_config.get_experiment_from_key(experiment_key)
+                   for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']]
+    with mock.patch('optimizely.bucketer.mmh3', pymmh3), \
+         mock.patch('optimizely.lib.pymmh3.hash_prefix', wraps=pymmh3.hash_prefix) as mock_hash_prefix, \
+         mock.patch('optimizely.lib.pymmh3.hash_from_prefix', wraps=pymmh3.hash_from_prefix) as mock_hash_from_prefix:
+      self.bucketer.bucket_experiments(experiments, 'test_user')
+
+    # User is in group_exp_2 of group 19228, whose bucket is computed only once
+    mock_hash_prefix.assert_called_once_with('test_user', 1)
+    self.assertEqual(['111127', '19228', '32223'],
+                     [call[0][1] for call in mock_hash_from_prefix.call_args_list])
+
+  def test_create_find_bucket__without_hash_prefix(self):
+    """ Test that with the mmh3 C extension, which can not resume a hash state, the method created by
+    create_find_bucket hashes the whole bucketing ID once for every group and experiment. """
+
+    experiments = [self.project_config.get_experiment_from_key(experiment_key)
+                   for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']]
+    self.assertFalse(hasattr(mmh3, 'hash_prefix'))
+    with mock.patch('optimizely.bucketer.mmh3', mmh3), \
+        mock.patch('optimizely.bucketer.Bucketer._generate_bucket_value',
+                   wraps=self.bucketer._generate_bucket_value) as mock_generate_bucket_value:
+      find_bucket = self.bucketer.create_find_bucket('test_user')
+      variations = [self.bucketer.bucket(experiment, 'test_user', find_bucket) for experiment in experiments]
+
+    self.assertEqual([self.bucketer.bucket(experiment, 'test_user') for experiment in experiments], variations)
+    self.assertEqual([mock.call('test_user111127'), mock.call('test_user19228'), mock.call('test_user32223')],
+                     mock_generate_bucket_value.call_args_list)
+
+  def test_find_bucket(self):
+    """ Test that find_bucket returns the entity of the first traffic allocation whose end of range exceeds
+    the bucket value. """
+
+    traffic_allocation = self.project_config.get_experiment_from_key('test_experiment').trafficAllocation
+    for bucket_value, expected_entity_id in [(0, '111128'), (3999, '111128'), (4000, ''), (4999, ''),
+                                             (5000, '111129'), (8999, '111129'), (9000, None), (9999, None)]:
+      with mock.patch('optimizely.bucketer.Bucketer._generate_bucket_value', return_value=bucket_value):
+        self.assertEqual(expected_entity_id, self.bucketer.find_bucket('test_user', '111127', traffic_allocation))
+
+  def test_find_bucket__unsorted_traffic_allocation(self):
+    """ Test that find_bucket returns the first matching traffic allocation even if they are not sorted. """
+
+    traffic_allocation = [{'entityId': '1', 'endOfRange': 5000},
+                          {'entityId': '2', 'endOfRange': 2000},
+                          {'entityId': '3', 'endOfRange': 10000}]
+    for bucket_value, expected_entity_id in [(1000, '1'), (4999, '1'), (5000, '3'), (9999, '3')]:
+      with mock.patch('optimizely.bucketer.Bucketer._generate_bucket_value', return_value=bucket_value):
+        self.assertEqual(expected_entity_id, self.bucketer.find_bucket('test_user', '42', traffic_allocation))
+
   def test_bucket_number(self):
     """ Test output of _generate_bucket_value for different inputs. """
 
@@ -122,6 +188,45 @@ class BucketerTest(base.BaseTest):
     self.assertEqual(6128, self.bucketer._generate_bucket_value(get_bucketing_id(
       'a very very very very very very very very very very very very very very very long ppd string')))
 
+  def test_bucket_number__matches_floating_point_computation(self):
+    """ Test that _generate_bucket_value matches floor(hash / 2^32 * 10000) over the full 32 bit range.
+    Both are non-decreasing step functions of the hash, so it is enough that they agree on both sides
+    of every step i.e. for the first hash of every bucket value and the hash just before it. """
+
+    def float_bucket_value(hash_code):
+      return int(math.floor(float(hash_code) / math.pow(2, 32) * bucketer.MAX_TRAFFIC_VALUE))
+
+    hash_codes = [0, bucketer.UNSIGNED_MAX_32_BIT_VALUE]
+    for bucket_value in range(1, bucketer.MAX_TRAFFIC_VALUE):
+      # Smallest hash code whose bucket value is bucket_value
+      first_hash_code = -(-(bucket_value << 32) // bucketer.MAX_TRAFFIC_VALUE)
+      hash_codes.extend([first_hash_code - 1, first_hash_code])
+
+    with mock.patch('optimizely.bucketer.Bucketer._generate_unsigned_hash_code_32_bit', side_effect=hash_codes):
+      bucket_values = [self.bucketer._generate_bucket_value('test_user') for _ in hash_codes]
+
+    self.assertEqual([float_bucket_value(hash_code) for hash_code in hash_codes], bucket_values)
+    self.assertEqual(list(range(bucketer.MAX_TRAFFIC_VALUE)), sorted(set(bucket_values)))
+
+  def test_find_bucket__non_string_user_id(self):
+    """ Test that find_bucket formats user IDs which are not strings into the bucketing ID. """
+
+    traffic_allocation = self.project_config.get_experiment_from_key('test_experiment').trafficAllocation
+    with mock.patch('optimizely.bucketer.Bucketer._generate_bucket_value',
+                    return_value=42) as mock_generate_bucket_value:
+      self.assertEqual('111128', self.bucketer.find_bucket(42, '111127', traffic_allocation))
+
+    mock_generate_bucket_value.assert_called_once_with('42111127')
+
+  def test_find_bucket__does_not_log_for_disabled_level(self):
+    """ Test that find_bucket does not build or log the bucket message if the logger does not log debug. """
+
+    traffic_allocation = self.project_config.get_experiment_from_key('test_experiment').trafficAllocation
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      self.bucketer.find_bucket('test_user', '111127', traffic_allocation)
+
+    self.assertEqual(0, mock_logging.call_count)
+
   def test_hash_values(self):
     """ Test that on randomized data, values computed from mmh3 and pymmh3 match. """
 
@@ -129,10 +234,50 @@ class BucketerTest(base.BaseTest):
       random_value = str(random.random())
       self.assertEqual(mmh3.hash(random_value), pymmh3.hash(random_value))
 
+  def test_hash_many_values(self):
+    """ Test that on randomized data, values computed from mmh3 and npmmh3 match. """
+
+    keys = [str(random.random())[:random.randint(0, 18)].encode('utf-8') for i in range(1000)]
+    keys.extend([b'', b'\x00', b'ab\x00', u'\u00e9\u4e2d'.encode('utf-8')])
+    self.assertEqual([mmh3.hash(key, 1) & bucketer.UNSIGNED_MAX_32_BIT_VALUE for key in keys],
+                     npmmh3.hash_many(keys, 1).tolist())
+
+  def test_bucket_many(self):
+    """ Test that bucket_many returns the same variations as bucket for every user. """
+
+    user_ids = ['test_user_%s' % random.randint(0, 10 ** random.randint(0, 12)) for i in range(2000)]
+    user_ids.extend(['', 'user_1', u'\u00e9', 42])
+    for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']:
+      experiment = self.project_config.get_experiment_from_key(experiment_key)
+      self.assertEqual([self.bucketer.bucket(experiment, user_id) for user_id in user_ids],
+                       self.bucketer.bucket_many(experiment, user_ids))
+
+  def test_bucket_many__invalid_experiment(self):
+    """ Test that bucket_many returns None for every user for unknown experiment. """
+
+    self.assertEqual([None, None],
+                     self.bucketer.bucket_many(self.project_config.get_experiment_from_key('invalid_experiment'),
+                                               ['test_user_1', 'test_user_2']))
+
+  def test_bucket_many__without_numpy(self):
+    """ Test that bucket_many falls back to bucketing one user at a time if NumPy is not available. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    with mock.patch('optimizely.bucketer.npmmh3', None), \
+         mock.patch('optimizely.bucketer.Bucketer.bucket', return_value=None) as mock_bucket:
+      self.assertEqual([None, None], self.bucketer.bucket_many(experiment, ['test_user_1', 'test_user_2']))
+
+    self.assertEqual([mock.call(experiment, 'test_user_1'), mock.call(experiment, 'test_user_2')],
+                     mock_bucket.call_args_list)
+
 
 class BucketerWithLoggingTest(base.BaseTest):
   def setUp(self):
     base.BaseTest.setUp(self)
+    # Log messages of all levels regardless of how the root logger is configured
+    is_enabled_for_patcher = mock.patch('optimizely.logger.SimpleLogger.is_enabled_for', return_value=True)
+    is_enabled_for_patcher.start()
+    self.addCleanup(is_enabled_for_patcher.stop)
     self.optimizely = optimizely.Optimizely(json.dumps(self.config_dict),
                                             logger=logger.SimpleLogger())
     self.bucketer = bucketer.Bucketer(self.optimizely.config)
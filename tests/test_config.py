@@ -19,6 +19,7 @@ from optimizely import error_handler
 from optimizely import exceptions
 from optimizely import logger
 from optimizely import optimizely
+from optimizely import project_config
 from optimizely.helpers import enums
 
 from . import base
@@ -38,7 +39,8 @@ class ConfigTest(base.BaseTest):
       '19228': entities.Group(
         self.config_dict['groups'][0]['id'],
         self.config_dict['groups'][0]['policy'],
-        self.config_dict['groups'][0]['experiments'],
+        [entities.Experiment(groupId='19228', groupPolicy='random', **experiment_dict)
+         for experiment_dict in self.config_dict['groups'][0]['experiments']],
         self.config_dict['groups'][0]['trafficAllocation']
       )
     }
@@ -341,7 +343,8 @@ class ConfigTest(base.BaseTest):
       '19228': entities.Group(
         config_dict['groups'][0]['id'],
         config_dict['groups'][0]['policy'],
-        config_dict['groups'][0]['experiments'],
+        [entities.Experiment(groupId='19228', groupPolicy='random', **experiment_dict)
+         for experiment_dict in config_dict['groups'][0]['experiments']],
         config_dict['groups'][0]['trafficAllocation']
       )
     }
@@ -726,7 +729,8 @@ class ConfigTest(base.BaseTest):
       '19228': entities.Group(
         config_dict['groups'][0]['id'],
         config_dict['groups'][0]['policy'],
-        config_dict['groups'][0]['experiments'],
+        [entities.Experiment(groupId='19228', groupPolicy='random', **experiment_dict)
+         for experiment_dict in config_dict['groups'][0]['experiments']],
         config_dict['groups'][0]['trafficAllocation']
       )
     }
@@ -910,7 +914,7 @@ class ConfigTest(base.BaseTest):
     }
 
     expected_layer_id_map = {
-      '211111': entities.Layer('211111', 'ordered', [{
+      '211111': entities.Layer('211111', 'ordered', [entities.Experiment(**{
           'key': 'test_rollout_exp_1',
           'status': 'Running',
           'forcedVariations': {},
@@ -929,7 +933,7 @@ class ConfigTest(base.BaseTest):
               'value': '15'
             }]
           }]
-        }]
+        })]
       )
     }
 
@@ -969,6 +973,148 @@ class ConfigTest(base.BaseTest):
     self.assertEqual(expected_layer_id_map, project_config.layer_id_map)
     self.assertEqual(expected_variation_variable_usage_map, project_config.variation_variable_usage_map)
 
+  def test_init__with_previous_config(self):
+    """ Test that entities and indexes which did not change are reused from the previous config. """
+
+    previous_config = optimizely.Optimizely(json.dumps(self.config_dict_with_features)).config
+    updated_config_dict = json.loads(json.dumps(self.config_dict_with_features))
+    updated_config_dict['revision'] = '2'
+    updated_config_dict['experiments'][0]['trafficAllocation'][0]['endOfRange'] = 6000
+    updated_config_dict['groups'][0]['policy'] = 'overlapping'
+    updated_config = project_config.ProjectConfig(json.dumps(updated_config_dict), logger.NoOpLogger(),
+                                                  error_handler.NoOpErrorHandler(), previous_config=previous_config)
+
+    # Config built with reuse is the same as a config built from scratch
+    expected_config = project_config.ProjectConfig(json.dumps(updated_config_dict), logger.NoOpLogger(),
+                                                   error_handler.NoOpErrorHandler())
+    for map_name in ['group_id_map', 'experiment_key_map', 'experiment_id_map', 'audience_id_map',
+                     'variation_key_map', 'variation_id_map', 'variation_variable_usage_map', 'feature_key_map',
+                     'forced_variation_map', 'whitelisted_user_map', 'traffic_allocation_index_map']:
+      self.assertEqual(getattr(expected_config, map_name), getattr(updated_config, map_name))
+
+    # Unchanged entities and their indexes are reused
+    self.assertIs(previous_config.get_experiment_from_key('test_rollout_exp_1'),
+                  updated_config.get_experiment_from_key('test_rollout_exp_1'))
+    self.assertIs(previous_config.get_audience('11154'), updated_config.get_audience('11154'))
+    self.assertIs(previous_config.get_feature_from_key('test_feature_1'),
+                  updated_config.get_feature_from_key('test_feature_1'))
+    self.assertIs(previous_config.variation_key_map['test_rollout_exp_1'],
+                  updated_config.variation_key_map['test_rollout_exp_1'])
+    self.assertIs(previous_config.traffic_allocation_index_map['211127'],
+                  updated_config.traffic_allocation_index_map['211127'])
+
+    # Changed entities, experiments in the changed group and features depending on them are rebuilt
+    self.assertIsNot(previous_config.get_experiment_from_key('test_experiment'),
+                     updated_config.get_experiment_from_key('test_experiment'))
+    self.assertIsNot(previous_config.traffic_allocation_index_map['111127'],
+                     updated_config.traffic_allocation_index_map['111127'])
+    self.assertEqual('overlapping', updated_config.get_experiment_from_key('group_exp_1').groupPolicy)
+    self.assertEqual('random', previous_config.get_experiment_from_key('group_exp_1').groupPolicy)
+    self.assertIsNot(previous_config.get_group('19228'), updated_config.get_group('19228'))
+
+    # Datafile holds the dicts unchanged entities were built from, instead of copies decoded again
+    self.assertEqual(updated_config_dict['experiments'], updated_config.experiments)
+    self.assertIsNot(previous_config.experiments[0], updated_config.experiments[0])
+    self.assertIs(previous_config.audiences[0], updated_config.audiences[0])
+    self.assertIs(previous_config.features[0], updated_config.features[0])
+    self.assertIs(previous_config.layers[0]['experiments'][0], updated_config.layers[0]['experiments'][0])
+    self.assertFalse(hasattr(updated_config, '_replaced_sources'))
+
+  def test_init__with_previous_config__does_not_modify_datafile(self):
+    """ Test that reusing the dicts of the previous config does not modify a datafile passed as dict. """
+
+    def get_datafile_objects(config_dict):
+      return [config_dict['experiments'], config_dict['experiments'][0], config_dict['audiences'][0],
+              config_dict['features'][0], config_dict['groups'][0], config_dict['groups'][0]['experiments'][0],
+              config_dict['layers'][0], config_dict['layers'][0]['experiments'][0]]
+
+    previous_config = optimizely.Optimizely(json.dumps(self.config_dict_with_features)).config
+    updated_config_dict = json.loads(json.dumps(self.config_dict_with_features))
+    updated_config_dict['revision'] = '2'
+    expected_datafile = json.loads(json.dumps(updated_config_dict))
+    datafile_objects = get_datafile_objects(updated_config_dict)
+
+    updated_config = project_config.ProjectConfig(updated_config_dict, logger.NoOpLogger(),
+                                                  error_handler.NoOpErrorHandler(), previous_config=previous_config)
+
+    self.assertEqual(expected_datafile, updated_config_dict)
+    for datafile_object, current_object in zip(datafile_objects, get_datafile_objects(updated_config_dict)):
+      self.assertIs(datafile_object, current_object)
+
+    # Config holds the dicts of the previous config instead
+    self.assertIs(previous_config.experiments[0], updated_config.experiments[0])
+    self.assertIs(previous_config.layers[0]['experiments'][0], updated_config.layers[0]['experiments'][0])
+
+  def test_init__builds_experiments_once(self):
+    """ Test that an experiment reached through more than one part of the datafile is built once. """
+
+    config_dict = json.loads(json.dumps(self.config_dict_with_features))
+    config_dict['layers'][0]['experiments'].insert(0, json.loads(json.dumps(config_dict['experiments'][0])))
+
+    with mock.patch('optimizely.entities.Experiment', wraps=entities.Experiment, __name__='Experiment') \
+        as mock_experiment:
+      config = project_config.ProjectConfig(config_dict, logger.NoOpLogger(), error_handler.NoOpErrorHandler())
+
+    experiment_keys = [call[1]['key'] for call in mock_experiment.call_args_list]
+    self.assertEqual(1, experiment_keys.count('test_experiment'))
+    self.assertIs(config.get_experiment_from_key('test_experiment'), config.get_experiment_from_id('111127'))
+    self.assertIs(config.get_experiment_from_key('test_experiment'), config.get_layer_from_id('211111').experiments[0])
+
+  def test_init__groups_and_layers_hold_experiment_objects(self):
+    """ Test that groups and layers hold the experiment objects of the experiment maps,
+    also when they are reused from the previous config. """
+
+    previous_config = optimizely.Optimizely(json.dumps(self.config_dict_with_features)).config
+    updated_config_dict = json.loads(json.dumps(self.config_dict_with_features))
+    updated_config_dict['revision'] = '2'
+    updated_config = project_config.ProjectConfig(updated_config_dict, logger.NoOpLogger(),
+                                                  error_handler.NoOpErrorHandler(), previous_config=previous_config)
+
+    for config in [previous_config, updated_config]:
+      group = config.get_group('19228')
+      self.assertEqual(['32222', '32223'], [experiment.id for experiment in group.experiments])
+      for experiment in group.experiments:
+        self.assertIs(config.get_experiment_from_id(experiment.id), experiment)
+        self.assertIs(config.get_experiment_from_key(experiment.key), experiment)
+
+      layer = config.get_layer_from_id('211111')
+      self.assertEqual(['211127'], [experiment.id for experiment in layer.experiments])
+      for experiment in layer.experiments:
+        self.assertIs(config.get_experiment_from_id(experiment.id), experiment)
+
+    self.assertIs(previous_config.get_group('19228'), updated_config.get_group('19228'))
+
+  def test_init__compact_entities(self):
+    """ Test that entities hold their fields in slots and share interned IDs and keys. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    self.assertFalse(hasattr(experiment, '__dict__'))
+    self.assertFalse(hasattr(self.project_config.get_variation_from_key('test_experiment', 'control'), '__dict__'))
+
+    experiment_key = ''.join(['test_', 'experiment'])
+    self.assertIs(experiment.key, entities.intern_id(experiment_key))
+    self.assertIs(self.project_config.get_variation_from_key('test_experiment', 'control').id,
+                  self.project_config.traffic_allocation_index_map['111127'][2][0])
+
+    # Entities are equal if they are of the same class and their fields are equal
+    self.assertEqual(experiment, entities.Experiment(**self.config_dict['experiments'][0]))
+    self.assertNotEqual(experiment, entities.Experiment(**dict(self.config_dict['experiments'][0], status='Paused')))
+    self.assertNotEqual(entities.Attribute('111094', 'test_attribute'), entities.Event('111094', 'test_attribute', []))
+
+  def test_init__compact_entities__unicode_ids(self):
+    """ Test that IDs and keys decoded as unicode strings, as on Python 2, are interned as well. """
+
+    class Unicode(str):
+      pass
+
+    with mock.patch('optimizely.entities._unicode', new=Unicode), \
+        mock.patch('optimizely.entities._interned_unicode_ids', new={}):
+      first_attribute = entities.Attribute(Unicode('111094'), Unicode('test_attribute'))
+      second_attribute = entities.Attribute(Unicode('111094'), Unicode('test_attribute'))
+
+    self.assertIs(first_attribute.id, second_attribute.id)
+    self.assertIs(first_attribute.key, second_attribute.key)
+
   def test_get_version(self):
     """ Test that JSON version is retrieved correctly when using get_version. """
 
@@ -1113,7 +1259,8 @@ class ConfigTest(base.BaseTest):
 
     self.assertEqual(entities.Group(self.config_dict['groups'][0]['id'],
                                     self.config_dict['groups'][0]['policy'],
-                                    self.config_dict['groups'][0]['experiments'],
+                                    [entities.Experiment(groupId='19228', groupPolicy='random', **experiment_dict)
+                                     for experiment_dict in self.config_dict['groups'][0]['experiments']],
                                     self.config_dict['groups'][0]['trafficAllocation']),
                      self.project_config.get_group('19228'))
 
@@ -1122,6 +1269,48 @@ class ConfigTest(base.BaseTest):
 
     self.assertIsNone(self.project_config.get_group('42'))
 
+  def test_get_traffic_allocation_index(self):
+    """ Test that traffic allocation index compiled at load time is retrieved for experiments and groups. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    self.assertEqual((experiment.trafficAllocation, [4000, 5000, 9000], ['111128', '', '111129']),
+                     self.project_config.get_traffic_allocation_index('111127', experiment.trafficAllocation))
+    self.assertIs(self.project_config.traffic_allocation_index_map['111127'],
+                  self.project_config.get_traffic_allocation_index('111127', experiment.trafficAllocation))
+
+    group = self.project_config.get_group('19228')
+    self.assertEqual((group.trafficAllocation, [3000, 7500], ['32222', '32223']),
+                     self.project_config.get_traffic_allocation_index('19228', group.trafficAllocation))
+    self.assertIs(self.project_config.traffic_allocation_index_map['19228'],
+                  self.project_config.get_traffic_allocation_index('19228', group.trafficAllocation))
+
+  def test_get_traffic_allocation_index__other_traffic_allocation(self):
+    """ Test that traffic allocation index is compiled on the fly for a traffic allocation not in the datafile.
+    End of ranges are turned into their running maximum so that they are sorted. """
+
+    traffic_allocation = [{'entityId': '1', 'endOfRange': 5000},
+                          {'entityId': '2', 'endOfRange': 2000},
+                          {'entityId': '3', 'endOfRange': 10000}]
+    self.assertEqual((traffic_allocation, [5000, 5000, 10000], ['1', '2', '3']),
+                     self.project_config.get_traffic_allocation_index('111127', traffic_allocation))
+    self.assertEqual((traffic_allocation, [5000, 5000, 10000], ['1', '2', '3']),
+                     self.project_config.get_traffic_allocation_index('42', traffic_allocation))
+
+  def test_get_whitelisted_variations(self):
+    """ Test that whitelisted users are resolved to their variations across experiments. """
+
+    self.assertEqual({
+      'user_1': self.project_config.get_variation_from_key('test_experiment', 'control'),
+      'user_2': self.project_config.get_variation_from_key('test_experiment', 'control')
+    }, self.project_config.forced_variation_map['test_experiment'])
+    self.assertEqual(sorted([
+      ('group_exp_1', 'group_exp_1_control'),
+      ('group_exp_2', 'group_exp_2_control'),
+      ('test_experiment', 'control')
+    ]), sorted([(experiment.key, variation.key)
+                for experiment, variation in self.project_config.get_whitelisted_variations('user_1')]))
+    self.assertEqual([], self.project_config.get_whitelisted_variations('test_user'))
+
   def test_get_feature_from_key__valid_feature_key(self):
     """ Test that a valid feature is returned given a valid feature key. """
     optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
@@ -1141,7 +1330,7 @@ class ConfigTest(base.BaseTest):
     optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
     project_config = optimizely_instance.config
 
-    expected_layer = entities.Layer('211111', 'ordered', [{
+    expected_layer = entities.Layer('211111', 'ordered', [entities.Experiment(**{
       'key': 'test_rollout_exp_1',
       'status': 'Running',
       'forcedVariations': {},
@@ -1162,7 +1351,7 @@ class ConfigTest(base.BaseTest):
         'key': 'variation',
         'id': '211129'
       }]
-    }])
+    })])
     self.assertEqual(expected_layer, project_config.get_layer_from_id('211111'))
 
   def test_get_variable_value_for_variation__returns_valid_value(self):
@@ -1193,6 +1382,34 @@ class ConfigTest(base.BaseTest):
     is_working_variable = project_config.get_variable_for_feature('test_feature_1', 'is_working')
     self.assertIsNone(project_config.get_variable_value_for_variation(is_working_variable, variation))
 
+  def test_get_variable_value_for_variation__default_value(self):
+    """ Test that the typed default value is returned for a variable the variation does not set. """
+    optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
+    project_config = optimizely_instance.config
+
+    variation = project_config.get_variation_from_id('test_experiment', '111129')
+    is_working_variable = project_config.get_variable_for_feature('test_feature_1', 'is_working')
+    environment_variable = project_config.get_variable_for_feature('test_feature_1', 'environment')
+    self.assertEqual(True, project_config.get_variable_value_for_variation(is_working_variable, variation))
+    self.assertEqual('devel', project_config.get_variable_value_for_variation(environment_variable, variation))
+    self.assertEqual({'127': True, '128': 'devel'}, project_config.variation_variable_value_map['111129'])
+
+  def test_get_variable_value_for_variation__invalid_value(self):
+    """ Test that a value which is not of the type of the variable is logged at load time and read as None. """
+    config_dict = json.loads(json.dumps(self.config_dict_with_features))
+    config_dict['features'][0]['variables'].append({
+      'id': '132', 'key': 'count', 'defaultValue': 'invalid', 'type': 'integer'
+    })
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      project_config = optimizely.Optimizely(json.dumps(config_dict), logger=logger.SimpleLogger()).config
+
+    mock_logging.assert_any_call(enums.LogLevels.ERROR,
+                                 'Value "invalid" of variable with ID "132" is not a valid integer.')
+    variation = project_config.get_variation_from_id('test_experiment', '111128')
+    count_variable = project_config.get_variable_for_feature('test_feature_1', 'count')
+    self.assertIsNone(project_config.get_variable_value_for_variation(count_variable, variation))
+
   def test_get_variable_for_feature__returns_valid_variable(self):
     """ Test that the feature variable is returned. """
     optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
@@ -0,0 +1,127 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+import os
+import shutil
+import tempfile
+
+from optimizely import config_snapshot
+from optimizely import error_handler
+from optimizely import logger
+from optimizely import optimizely
+from optimizely.helpers import enums
+from . import base
+
+
+class ConfigSnapshotTest(base.BaseTest):
+
+  def setUp(self):
+    base.BaseTest.setUp(self)
+    self.datafile = json.dumps(self.config_dict_with_features)
+    self.datafile_hash = config_snapshot.get_datafile_hash(self.datafile)
+    self.config = optimizely.Optimizely(self.datafile).config
+    self.temp_dir = tempfile.mkdtemp()
+    self.snapshot_path = os.path.join(self.temp_dir, 'config.snapshot')
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_get_datafile_hash(self):
+    """ Test that the datafile hash is the same for a string and its bytes and differs for other datafiles. """
+
+    self.assertEqual(self.datafile_hash, config_snapshot.get_datafile_hash(self.datafile.encode('utf-8')))
+    self.assertEqual(config_snapshot.get_datafile_hash(self.config_dict_with_features),
+                     config_snapshot.get_datafile_hash(dict(self.config_dict_with_features)))
+    self.assertNotEqual(self.datafile_hash, config_snapshot.get_datafile_hash(json.dumps(self.config_dict)))
+
+  def test_save_and_load(self):
+    """ Test that a loaded snapshot holds the same config with the logger and error handler of the process. """
+
+    config_snapshot.save(self.snapshot_path, self.config, self.datafile_hash, True)
+    loaded_config = config_snapshot.load(self.snapshot_path, self.datafile_hash,
+                                         logger.SimpleLogger(), error_handler.RaiseExceptionErrorHandler)
+
+    self.assertEqual(self.config.revision, loaded_config.revision)
+    for map_name in ['group_id_map', 'experiment_key_map', 'experiment_id_map', 'audience_id_map',
+                     'variation_key_map', 'variation_id_map', 'variation_variable_usage_map', 'feature_key_map',
+                     'forced_variation_map', 'whitelisted_user_map', 'traffic_allocation_index_map']:
+      self.assertEqual(getattr(self.config, map_name), getattr(loaded_config, map_name))
+    self.assertEqual(self.config.get_audience('11154').conditionList,
+                     loaded_config.get_audience('11154').conditionList)
+    self.assertIsInstance(loaded_config.logger, logger.SimpleLogger)
+    self.assertIs(error_handler.RaiseExceptionErrorHandler, loaded_config.error_handler)
+    self.assertEqual(['config.snapshot'], os.listdir(self.temp_dir))
+
+  def test_load__stale_or_incompatible(self):
+    """ Test that load returns None for a snapshot of another datafile, SDK version or format. """
+
+    self.assertIsNone(config_snapshot.load(self.snapshot_path, self.datafile_hash, None, None))
+
+    config_snapshot.save(self.snapshot_path, self.config, self.datafile_hash, False)
+    self.assertIsNone(config_snapshot.load(self.snapshot_path, 'other_hash', None, None))
+    self.assertIsNone(config_snapshot.load(self.snapshot_path, self.datafile_hash, None, None, require_validated=True))
+    with mock.patch('optimizely.version.__version__', new='0.0.1'):
+      self.assertIsNone(config_snapshot.load(self.snapshot_path, self.datafile_hash, None, None))
+    with mock.patch('optimizely.config_snapshot.FORMAT_VERSION', new=config_snapshot.FORMAT_VERSION + 1):
+      self.assertIsNone(config_snapshot.load(self.snapshot_path, self.datafile_hash, None, None))
+
+    with open(self.snapshot_path, 'wb') as snapshot_file:
+      snapshot_file.write(config_snapshot.MAGIC + b'truncated')
+    self.assertIsNone(config_snapshot.load(self.snapshot_path, self.datafile_hash, None, None))
+
+  def test_optimizely__saves_and_loads_snapshot(self):
+    """ Test that the client saves a snapshot when building the config and loads it for the same datafile. """
+
+    optimizely.Optimizely(self.datafile, config_snapshot_path=self.snapshot_path)
+    self.assertTrue(os.path.exists(self.snapshot_path))
+
+    with mock.patch('optimizely.project_config.ProjectConfig.__init__') as mock_config_init, \
+        mock.patch('optimizely.helpers.validator.is_datafile_valid') as mock_datafile_validation:
+      opt_obj = optimizely.Optimizely(self.datafile, config_snapshot_path=self.snapshot_path)
+
+    self.assertFalse(mock_config_init.called)
+    self.assertFalse(mock_datafile_validation.called)
+    self.assertTrue(opt_obj.is_valid)
+    self.assertIs(opt_obj.logger, opt_obj.config.logger)
+    self.assertEqual(optimizely.Optimizely(self.datafile).get_variation('test_experiment', 'test_user'),
+                     opt_obj.get_variation('test_experiment', 'test_user'))
+
+    # Snapshot of another datafile is replaced with a snapshot of the datafile in use
+    opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), config_snapshot_path=self.snapshot_path)
+    self.assertEqual(self.config_dict['revision'], opt_obj.config.revision)
+    self.assertIsNotNone(config_snapshot.load(self.snapshot_path, config_snapshot.get_datafile_hash(
+      json.dumps(self.config_dict)), None, None))
+
+  def test_optimizely__unable_to_save_snapshot(self):
+    """ Test that the client logs an error and still works if the snapshot can not be saved. """
+
+    snapshot_path = os.path.join(self.temp_dir, 'missing', 'config.snapshot')
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      opt_obj = optimizely.Optimizely(self.datafile, config_snapshot_path=snapshot_path)
+
+    self.assertTrue(opt_obj.is_valid)
+    self.assertEqual(1, mock_logging.call_count)
+    self.assertTrue(mock_logging.call_args[0][1].startswith('Unable to save config snapshot to %s.' % snapshot_path))
+
+  def test_optimizely__malformed_datafile(self):
+    """ Test that a datafile which can not be hashed makes the client invalid and logs an error as without snapshot. """
+
+    for datafile in [None, 42]:
+      with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+        opt_obj = optimizely.Optimizely(datafile, config_snapshot_path=self.snapshot_path)
+
+      self.assertFalse(opt_obj.is_valid)
+      mock_logging.assert_called_once_with(enums.LogLevels.ERROR, 'Provided "datafile" is in an invalid format.')
+      self.assertFalse(os.path.exists(self.snapshot_path))
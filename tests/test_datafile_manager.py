@@ -0,0 +1,175 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+import threading
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from optimizely import datafile_manager
+from optimizely import logger
+from optimizely import optimizely
+from optimizely.helpers import enums
+from . import base
+
+
+class DatafileServer(HTTPServer):
+  """ Local stand-in for the datafile CDN which honors conditional requests. """
+
+  def __init__(self):
+    HTTPServer.__init__(self, ('127.0.0.1', 0), DatafileRequestHandler)
+    self.datafile = None
+    self.etag = None
+    self.status_code = 200
+    self.request_headers = []
+
+  @property
+  def url(self):
+    return 'http://127.0.0.1:%s/datafile.json' % self.server_address[1]
+
+  def set_datafile(self, datafile, etag):
+    self.datafile = datafile
+    self.etag = etag
+
+
+class DatafileRequestHandler(BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    self.server.request_headers.append(dict(self.headers.items()))
+    if self.server.status_code != 200:
+      self.send_response(self.server.status_code)
+      self.end_headers()
+      return
+
+    if self.headers.get('If-None-Match') == self.server.etag:
+      self.send_response(304)
+      self.end_headers()
+      return
+
+    body = self.server.datafile.encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('ETag', self.server.etag)
+    self.send_header('Last-Modified', 'Mon, 02 Oct 2017 10:00:00 GMT')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class PollingDatafileManagerTest(base.BaseTest):
+
+  def setUp(self):
+    base.BaseTest.setUp(self)
+    self.server = DatafileServer()
+    self.server_thread = threading.Thread(target=self.server.serve_forever)
+    self.server_thread.daemon = True
+    self.server_thread.start()
+    self.server.set_datafile(json.dumps(self.config_dict), '"1"')
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+  def test_fetch(self):
+    """ Test that fetch updates the client on a new datafile and sends conditional requests afterwards. """
+
+    manager = datafile_manager.PollingDatafileManager(self.server.url, self.optimizely.update_datafile)
+    updated_config_dict = dict(self.config_dict, revision='43')
+    self.server.set_datafile(json.dumps(updated_config_dict), '"2"')
+
+    self.assertTrue(manager.fetch())
+    self.assertEqual('43', self.optimizely.config.get_revision())
+    self.assertEqual('"2"', manager.etag)
+    self.assertEqual('Mon, 02 Oct 2017 10:00:00 GMT', manager.last_modified)
+    self.assertTrue(manager.last_fetch_duration > 0)
+    self.assertTrue(manager.last_parse_duration > 0)
+    self.assertTrue(manager.last_update_duration > 0)
+
+    # Unchanged datafile is not handed to the client again
+    with mock.patch.object(manager, 'update_datafile') as mock_update_datafile:
+      self.assertFalse(manager.fetch())
+
+    self.assertFalse(mock_update_datafile.called)
+    self.assertEqual('"2"', self.server.request_headers[-1]['If-None-Match'])
+    self.assertEqual('Mon, 02 Oct 2017 10:00:00 GMT', self.server.request_headers[-1]['If-Modified-Since'])
+    self.assertEqual(2, manager.fetch_count)
+    self.assertEqual(1, manager.update_count)
+
+  def test_fetch__invalid_json(self):
+    """ Test that fetch logs an error and does not hand a datafile which can not be parsed to the client. """
+
+    manager = datafile_manager.PollingDatafileManager(self.server.url, self.optimizely.update_datafile,
+                                                      logger=logger.SimpleLogger())
+    self.server.set_datafile('invalid_datafile', '"2"')
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging, \
+        mock.patch.object(manager, 'update_datafile') as mock_update_datafile:
+      self.assertFalse(manager.fetch())
+
+    self.assertFalse(mock_update_datafile.called)
+    self.assertEqual(enums.LogLevels.ERROR, mock_logging.call_args[0][0])
+    self.assertTrue(mock_logging.call_args[0][1].startswith('Unable to parse datafile from %s.' % self.server.url))
+    self.assertIsNone(manager.etag)
+
+  def test_fetch__rejected_datafile(self):
+    """ Test that a datafile the client rejects is fetched again unconditionally. """
+
+    manager = datafile_manager.PollingDatafileManager(self.server.url, self.optimizely.update_datafile)
+    self.server.set_datafile(json.dumps({'version': '2'}), '"2"')
+
+    self.assertFalse(manager.fetch())
+    self.assertFalse(manager.fetch())
+    self.assertEqual('42', self.optimizely.config.get_revision())
+    self.assertIsNone(manager.etag)
+    self.assertNotIn('If-None-Match', self.server.request_headers[-1])
+
+  def test_fetch__server_error(self):
+    """ Test that fetch logs an error and keeps the current datafile if the request fails. """
+
+    manager = datafile_manager.PollingDatafileManager(self.server.url, self.optimizely.update_datafile,
+                                                      logger=logger.SimpleLogger())
+    self.server.status_code = 500
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      self.assertFalse(manager.fetch())
+
+    self.assertEqual(enums.LogLevels.ERROR, mock_logging.call_args[0][0])
+    self.assertTrue(mock_logging.call_args[0][1].startswith('Unable to fetch datafile from %s.' % self.server.url))
+    self.assertEqual(0, manager.fetch_count)
+
+  def test_start(self):
+    """ Test that the background thread fetches the datafile until stopped. """
+
+    client = optimizely.Optimizely(json.dumps(self.config_dict))
+    updated = threading.Event()
+
+    def update_datafile(datafile):
+      is_updated = client.update_datafile(datafile)
+      updated.set()
+      return is_updated
+
+    self.server.set_datafile(json.dumps(dict(self.config_dict, revision='43')), '"2"')
+    manager = datafile_manager.PollingDatafileManager(self.server.url, update_datafile, polling_interval=60)
+    manager.start()
+    self.assertTrue(updated.wait(5))
+    manager.stop()
+
+    self.assertEqual('43', client.config.get_revision())
+    self.assertEqual(1, manager.fetch_count)
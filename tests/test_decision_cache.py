@@ -0,0 +1,92 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import unittest
+
+from optimizely import decision_cache
+
+
+class DecisionCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.cache = decision_cache.DecisionCache(max_size=2, ttl=10)
+    self.config = mock.Mock(revision='42')
+
+  def test_get_key(self):
+    """ Test that the key does not depend on the order of attributes and is None for unhashable or unsortable
+    attributes. """
+
+    self.assertEqual(('111127', 'test_user', ()), self.cache.get_key('111127', 'test_user', None))
+    self.assertEqual(self.cache.get_key('111127', 'test_user', {'a': 1, 'b': 'x'}),
+                     self.cache.get_key('111127', 'test_user', {'b': 'x', 'a': 1}))
+    self.assertNotEqual(self.cache.get_key('111127', 'test_user', {'a': 1}),
+                        self.cache.get_key('111127', 'test_user', {'a': 2}))
+    self.assertIsNone(self.cache.get_key('111127', 'test_user', {'a': [1]}))
+    self.assertIsNone(self.cache.get_key('111127', 'test_user', {'a': 1, 2: 'b'}))
+
+  def test_get_and_set(self):
+    """ Test that cached decisions, including None, are returned and counted as hits. """
+
+    self.assertIs(decision_cache.DecisionCache.MISS, self.cache.get(self.config, 'key_1'))
+    self.cache.set(self.config, 'key_1', 'variation')
+    self.cache.set(self.config, 'key_2', None)
+
+    self.assertEqual('variation', self.cache.get(self.config, 'key_1'))
+    self.assertIsNone(self.cache.get(self.config, 'key_2'))
+    self.assertEqual(2, self.cache.hits)
+    self.assertEqual(1, self.cache.misses)
+
+  def test_set__evicts_least_recently_used(self):
+    """ Test that the least recently used decision is evicted once the cache is full. """
+
+    self.cache.set(self.config, 'key_1', 'variation_1')
+    self.cache.set(self.config, 'key_2', 'variation_2')
+    self.cache.get(self.config, 'key_1')
+    self.cache.set(self.config, 'key_3', 'variation_3')
+
+    self.assertEqual(2, len(self.cache))
+    self.assertEqual('variation_1', self.cache.get(self.config, 'key_1'))
+    self.assertIs(decision_cache.DecisionCache.MISS, self.cache.get(self.config, 'key_2'))
+    self.assertEqual('variation_3', self.cache.get(self.config, 'key_3'))
+
+  def test_get__expired_decision(self):
+    """ Test that decisions older than the TTL are not returned. """
+
+    with mock.patch('timeit.default_timer', return_value=100):
+      self.cache.set(self.config, 'key_1', 'variation')
+    with mock.patch('timeit.default_timer', return_value=109):
+      self.assertEqual('variation', self.cache.get(self.config, 'key_1'))
+    with mock.patch('timeit.default_timer', return_value=110):
+      self.assertIs(decision_cache.DecisionCache.MISS, self.cache.get(self.config, 'key_1'))
+
+  def test_get__other_config(self):
+    """ Test that the cache is emptied when it is used with another config, even one with the same revision. """
+
+    self.cache.set(self.config, 'key_1', 'variation')
+    updated_config = mock.Mock(revision='42')
+
+    self.assertIs(decision_cache.DecisionCache.MISS, self.cache.get(updated_config, 'key_1'))
+    self.assertEqual(0, len(self.cache))
+    self.assertIs(updated_config, self.cache.config)
+
+  def test_clear(self):
+    """ Test that clear removes all decisions and resets the counters. """
+
+    self.cache.set(self.config, 'key_1', 'variation')
+    self.cache.get(self.config, 'key_1')
+    self.cache.clear()
+
+    self.assertEqual(0, len(self.cache))
+    self.assertEqual(0, self.cache.hits)
+    self.assertEqual(0, self.cache.misses)
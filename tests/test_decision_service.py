@@ -14,9 +14,11 @@
 import json
 import mock
 
+from optimizely import decision_cache
 from optimizely import entities
 from optimizely import optimizely
 from optimizely import user_profile
+from optimizely.decision_trace import DecisionStages
 from optimizely.helpers import enums
 from . import base
 
@@ -28,6 +30,10 @@ class DecisionServiceTest(base.BaseTest):
     self.decision_service = self.optimizely.decision_service
     # Set UserProfileService for the purposes of testing
     self.decision_service.user_profile_service = user_profile.UserProfileService()
+    # Enable all log levels of the NoOpLogger so that messages reach its patched log method
+    is_enabled_for_patcher = mock.patch('optimizely.logger.NoOpLogger.is_enabled_for', return_value=True)
+    is_enabled_for_patcher.start()
+    self.addCleanup(is_enabled_for_patcher.stop)
 
   def test_get_forced_variation__user_in_forced_variation(self):
     """ Test that expected variation is returned if user is forced in a variation. """
@@ -42,12 +48,26 @@ class DecisionServiceTest(base.BaseTest):
   def test_get_forced_variation__user_in_forced_variation__invalid_variation_id(self):
     """ Test that get_forced_variation returns None when variation user is forced in is invalid. """
 
-    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    self.config_dict['experiments'][0]['forcedVariations']['user_1'] = 'invalid_variation'
+    opt_obj = optimizely.Optimizely(json.dumps(self.config_dict))
+    experiment = opt_obj.config.get_experiment_from_key('test_experiment')
     with mock.patch('optimizely.project_config.ProjectConfig.get_variation_from_key',
-                    return_value=None) as mock_get_variation_id:
-      self.assertIsNone(self.decision_service.get_forced_variation(experiment, 'user_1'))
+                    return_value=None) as mock_get_variation_from_key:
+      self.assertIsNone(opt_obj.decision_service.get_forced_variation(experiment, 'user_1'))
+
+    mock_get_variation_from_key.assert_called_once_with('test_experiment', 'invalid_variation')
+
+  def test_get_forced_variation__user_not_whitelisted(self):
+    """ Test that None is returned without looking at the experiment if user is not whitelisted anywhere. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    with mock.patch('optimizely.project_config.ProjectConfig.get_variation_from_key') as mock_get_variation_from_key:
+      self.assertIsNone(self.decision_service.get_forced_variation(experiment, 'test_user'))
+      self.assertIsNone(self.decision_service.get_forced_variation(
+        self.project_config.get_experiment_from_key('group_exp_1'), 'user_3'
+      ))
 
-    mock_get_variation_id.assert_called_once_with('test_experiment', 'control')
+    self.assertEqual(0, mock_get_variation_from_key.call_count)
 
   def test_get_stored_variation__stored_decision_available(self):
     """ Test that stored decision is retrieved as expected. """
@@ -329,6 +349,135 @@ class DecisionServiceTest(base.BaseTest):
     self.assertEqual(0, mock_lookup.call_count)
     self.assertEqual(0, mock_save.call_count)
 
+  def test_get_variation__with_decision_cache(self):
+    """ Test that decisions are cached per user and attributes when the user profile is not used. """
+
+    self.decision_service.user_profile_service = None
+    self.decision_service.decision_cache = decision_cache.DecisionCache()
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    with mock.patch('optimizely.bucketer.Bucketer.bucket',
+                    return_value=entities.Variation('111129', 'variation')) as mock_bucket:
+      for _ in range(3):
+        self.assertEqual(entities.Variation('111129', 'variation'),
+                         self.decision_service.get_variation(experiment, 'test_user', {'test_attribute': 'test_value'}))
+      self.assertIsNone(self.decision_service.get_variation(experiment, 'test_user', None))
+      self.assertIsNone(self.decision_service.get_variation(experiment, 'test_user', None))
+
+    mock_bucket.assert_called_once_with(experiment, 'test_user')
+    self.assertEqual(3, self.decision_service.decision_cache.hits)
+    self.assertEqual(2, self.decision_service.decision_cache.misses)
+
+  def test_get_variation__decision_cache_not_used_with_user_profile_service(self):
+    """ Test that decisions are not cached when they may depend on the user profile. """
+
+    self.decision_service.decision_cache = decision_cache.DecisionCache()
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    with mock.patch('optimizely.user_profile.UserProfileService.lookup', return_value=None), \
+      mock.patch('optimizely.user_profile.UserProfileService.save'), \
+      mock.patch('optimizely.bucketer.Bucketer.bucket',
+                 return_value=entities.Variation('111129', 'variation')) as mock_bucket:
+      self.decision_service.get_variation(experiment, 'test_user', {'test_attribute': 'test_value'})
+      self.decision_service.get_variation(experiment, 'test_user', {'test_attribute': 'test_value'})
+
+    self.assertEqual(2, mock_bucket.call_count)
+    self.assertEqual(0, len(self.decision_service.decision_cache))
+
+  def test_get_variation__with_decision_context(self):
+    """ Test that get_variation looks up the user profile through the decision context
+    and only saves new decisions when the context is saved. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    group_experiment = self.project_config.get_experiment_from_key('group_exp_2')
+    with mock.patch('optimizely.user_profile.UserProfileService.lookup',
+                    return_value={'user_id': 'test_user',
+                                  'experiment_bucket_map': {'111127': {'variation_id': '111128'}}}) as mock_lookup, \
+      mock.patch('optimizely.user_profile.UserProfileService.save') as mock_save:
+      decision_context = self.decision_service.create_decision_context('test_user')
+      self.assertEqual(entities.Variation('111128', 'control'),
+                       self.decision_service.get_variation(experiment, 'test_user', None,
+                                                           decision_context=decision_context))
+      self.assertEqual(entities.Variation('28905', 'group_exp_2_control'),
+                       self.decision_service.get_variation(group_experiment, 'test_user', None,
+                                                           decision_context=decision_context))
+      self.assertEqual(0, mock_save.call_count)
+      decision_context.save()
+      decision_context.save()
+
+    mock_lookup.assert_called_once_with('test_user')
+    mock_save.assert_called_once_with({'user_id': 'test_user',
+                                       'experiment_bucket_map': {'111127': {'variation_id': '111128'},
+                                                                 '32223': {'variation_id': '28905'}}})
+
+  def test_explain_variation(self):
+    """ Test that explain_variation decides like get_variation and records the deciding stage and its timings. """
+
+    self.decision_service.user_profile_service = None
+    for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']:
+      experiment = self.project_config.get_experiment_from_key(experiment_key)
+      for index in range(50):
+        user_id = 'user_%s' % index
+        record = self.decision_service.explain_variation(experiment, user_id, {'test_attribute': 'test_value'})
+        self.assertEqual(self.decision_service.get_variation(experiment, user_id, {'test_attribute': 'test_value'}),
+                         record.variation)
+        self.assertIn(record.source, record.durations)
+        self.assertEqual(list(record.durations)[-1], record.source)
+
+    record = self.decision_service.explain_variation(self.project_config.get_experiment_from_key('test_experiment'),
+                                                     'user_1', None)
+    self.assertEqual(entities.Variation('111128', 'control'), record.variation)
+    self.assertEqual(DecisionStages.FORCED_VARIATION, record.source)
+    self.assertEqual([DecisionStages.RUNNING_CHECK, DecisionStages.FORCED_VARIATION], list(record.durations))
+
+    record = self.decision_service.explain_variation(self.project_config.get_experiment_from_key('group_exp_1'),
+                                                     'test_user', None)
+    self.assertIsNone(record.variation)
+    self.assertEqual(DecisionStages.GROUP_BUCKETING, record.source)
+    self.assertEqual([DecisionStages.RUNNING_CHECK, DecisionStages.FORCED_VARIATION, DecisionStages.AUDIENCE,
+                      DecisionStages.GROUP_BUCKETING], list(record.durations))
+
+  def test_explain_variation__no_bucketing_stage(self):
+    """ Test that explain_variation records no source if bucketing ends before any traffic allocation is searched. """
+
+    self.decision_service.user_profile_service = None
+    experiment = self.project_config.get_experiment_from_key('group_exp_1')
+    with mock.patch('optimizely.project_config.ProjectConfig.get_group', return_value=None):
+      record = self.decision_service.explain_variation(experiment, 'test_user', None)
+
+    self.assertIsNone(record.variation)
+    self.assertIsNone(record.source)
+    self.assertEqual([DecisionStages.RUNNING_CHECK, DecisionStages.FORCED_VARIATION, DecisionStages.AUDIENCE],
+                     list(record.durations))
+
+  def test_explain_variation__stored_decision(self):
+    """ Test that explain_variation records stored decisions as coming from the user profile. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    with mock.patch('optimizely.user_profile.UserProfileService.lookup',
+                    return_value={'user_id': 'test_user',
+                                  'experiment_bucket_map': {'111127': {'variation_id': '111128'}}}):
+      record = self.decision_service.explain_variation(experiment, 'test_user', None)
+
+    self.assertEqual(entities.Variation('111128', 'control'), record.variation)
+    self.assertEqual(DecisionStages.USER_PROFILE, record.source)
+    self.assertTrue(all(duration >= 0 for duration in record.durations.values()))
+
+  def test_explain_variation__decision_context(self):
+    """ Test that explain_variation buckets through the find_bucket method of the decision context, if given. """
+
+    self.decision_service.user_profile_service = None
+    experiment = self.project_config.get_experiment_from_key('group_exp_1')
+    decision_context = self.decision_service.create_decision_context('test_user')
+    find_bucket = decision_context.get_find_bucket(self.decision_service.bucketer)
+    with mock.patch.object(decision_context, 'find_bucket', wraps=find_bucket) as mock_find_bucket, \
+        mock.patch('optimizely.bucketer.Bucketer.find_bucket') as mock_bucketer_find_bucket:
+      record = self.decision_service.explain_variation(experiment, 'test_user', None,
+                                                       decision_context=decision_context)
+
+    self.assertEqual(self.decision_service.get_variation(experiment, 'test_user', None), record.variation)
+    mock_find_bucket.assert_called_once_with('test_user', experiment.groupId, mock.ANY)
+    self.assertEqual(0, mock_bucketer_find_bucket.call_count)
+    self.assertEqual(DecisionStages.GROUP_BUCKETING, record.source)
+
   def test_get_variation_for_feature__returns_variation_for_feature_in_experiment(self):
     """ Test that get_variation_for_feature returns the variation of the experiment the feature is associated with. """
     optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
@@ -343,7 +492,7 @@ class DecisionServiceTest(base.BaseTest):
       self.assertEqual(expected_variation, decision_service.get_variation_for_feature(feature, 'user1'))
 
     mock_decision.assert_called_once_with(
-      project_config.get_experiment_from_key('test_experiment'), 'user1', None
+      project_config.get_experiment_from_key('test_experiment'), 'user1', None, decision_context=None
     )
 
   def test_get_variation_for_feature__returns_variation_for_feature_in_rollout(self):
@@ -361,7 +510,7 @@ class DecisionServiceTest(base.BaseTest):
       self.assertEqual(expected_variation, decision_service.get_variation_for_feature(feature, 'user1'))
 
     mock_decision.assert_called_once_with(
-      project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True
+      project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True, decision_context=None
     )
 
   def test_get_variation_for_feature__returns_variation_if_user_not_in_experiment_but_in_rollout(self):
@@ -380,8 +529,10 @@ class DecisionServiceTest(base.BaseTest):
       self.assertEqual(expected_variation, decision_service.get_variation_for_feature(feature, 'user1'))
 
     self.assertEqual(2, mock_decision.call_count)
-    mock_decision.assert_any_call(project_config.get_experiment_from_key('test_experiment'), 'user1', None)
-    mock_decision.assert_any_call(project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True)
+    mock_decision.assert_any_call(project_config.get_experiment_from_key('test_experiment'), 'user1', None,
+                                  decision_context=None)
+    mock_decision.assert_any_call(project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True,
+                                  decision_context=None)
 
   def test_get_variation_for_feature__returns_variation_for_feature_in_group(self):
     """ Test that get_variation_for_feature returns the variation of
@@ -399,9 +550,11 @@ class DecisionServiceTest(base.BaseTest):
         return_value=expected_variation) as mock_decision:
       self.assertEqual(expected_variation, decision_service.get_variation_for_feature(feature, 'user1'))
 
-    mock_get_experiment_in_group.assert_called_once_with(project_config.get_group('19228'), 'user1')
+    mock_get_experiment_in_group.assert_called_once_with(project_config.get_group('19228'), 'user1',
+                                                         decision_context=None)
 
-    mock_decision.assert_called_once_with(project_config.get_experiment_from_key('group_exp_1'), 'user1', None)
+    mock_decision.assert_called_once_with(project_config.get_experiment_from_key('group_exp_1'), 'user1', None,
+                                          decision_context=None)
 
   def test_get_variation_for_feature__returns_none_for_user_not_in_group(self):
     """ Test that get_variation_for_feature returns None for
@@ -418,7 +571,7 @@ class DecisionServiceTest(base.BaseTest):
       self.assertIsNone(decision_service.get_variation_for_feature(feature, 'user1'))
 
     mock_get_experiment_in_group.assert_called_once_with(
-      project_config.get_group('19228'), 'user1'
+      project_config.get_group('19228'), 'user1', decision_context=None
     )
 
     self.assertFalse(mock_decision.called)
@@ -436,7 +589,7 @@ class DecisionServiceTest(base.BaseTest):
       self.assertIsNone(decision_service.get_variation_for_feature(feature, 'user1'))
 
     mock_decision.assert_called_once_with(
-      project_config.get_experiment_from_key('test_experiment'), 'user1', None
+      project_config.get_experiment_from_key('test_experiment'), 'user1', None, decision_context=None
     )
 
   def test_get_variation_for_feature__returns_none_for_user_not_in_rollout(self):
@@ -452,7 +605,7 @@ class DecisionServiceTest(base.BaseTest):
       self.assertIsNone(decision_service.get_variation_for_feature(feature, 'user1'))
 
     mock_decision.assert_called_once_with(
-      project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True
+      project_config.get_experiment_from_key('test_rollout_exp_1'), 'user1', None, True, decision_context=None
     )
 
   def test_get_variation_for_feature__returns_none_for_user_in_group_but_experiment_not_associated_with_feature(self):
@@ -468,7 +621,7 @@ class DecisionServiceTest(base.BaseTest):
       return_value=project_config.get_experiment_from_key('group_exp_2')) as mock_decision:
       self.assertIsNone(decision_service.get_variation_for_feature(feature, 'user_1'))
 
-    mock_decision.assert_called_once_with(project_config.get_group('19228'), 'user_1')
+    mock_decision.assert_called_once_with(project_config.get_group('19228'), 'user_1', decision_context=None)
 
   def test_get_experiment_in_group(self):
     """ Test that get_experiment_in_group returns the bucketed experiment for the user. """
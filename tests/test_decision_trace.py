@@ -0,0 +1,51 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from optimizely import decision_trace
+from optimizely.decision_trace import DecisionStages
+
+
+class DecisionTraceTest(unittest.TestCase):
+
+  def test_decision_record(self):
+    """ Test that durations of a stage which ran more than once are accumulated. """
+
+    record = decision_trace.DecisionRecord('test_experiment', 'test_user')
+    record.add_duration(DecisionStages.RUNNING_CHECK, 100)
+    record.add_duration(DecisionStages.GROUP_BUCKETING, 300)
+    record.add_duration(DecisionStages.GROUP_BUCKETING, 200)
+
+    self.assertIs(record, record.decide(None, DecisionStages.GROUP_BUCKETING))
+    self.assertEqual([(DecisionStages.RUNNING_CHECK, 100), (DecisionStages.GROUP_BUCKETING, 500)],
+                     list(record.durations.items()))
+    self.assertEqual(600, record.total_duration)
+    self.assertEqual(DecisionStages.GROUP_BUCKETING, record.source)
+
+  def test_decision_timings(self):
+    """ Test that stage durations are counted in power of two buckets and percentiles are bucket upper bounds. """
+
+    timings = decision_trace.DecisionTimings()
+    for duration in [0, 1, 100, 120, 127, 128, 5000]:
+      record = decision_trace.DecisionRecord('test_experiment', 'test_user')
+      record.add_duration(DecisionStages.AUDIENCE, duration)
+      timings.add(record)
+
+    self.assertEqual(7, timings.record_count)
+    self.assertEqual([DecisionStages.AUDIENCE], timings.get_stages())
+    self.assertEqual([(1, 1), (2, 1), (128, 3), (256, 1), (8192, 1)], timings.get_histogram(DecisionStages.AUDIENCE))
+    self.assertEqual(7, timings.get_count(DecisionStages.AUDIENCE))
+    self.assertEqual(128, timings.get_percentile(DecisionStages.AUDIENCE, 50))
+    self.assertEqual(8192, timings.get_percentile(DecisionStages.AUDIENCE, 99))
+    self.assertIsNone(timings.get_percentile(DecisionStages.BUCKETING, 50))
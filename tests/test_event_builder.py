@@ -12,6 +12,7 @@
 # limitations under the License.
 
 import mock
+import threading
 import unittest
 
 from optimizely import event_builder
@@ -321,6 +322,28 @@ class EventBuilderTest(base.BaseTest):
                                 event_builder.EventBuilder.HTTP_VERB,
                                 event_builder.EventBuilder.HTTP_HEADERS)
 
+  def test_create_impression_event__concurrently(self):
+    """ Test that events created concurrently by the same builder do not share params. """
+
+    experiment = self.project_config.get_experiment_from_key('test_experiment')
+    events = {}
+
+    def create_events(thread_index):
+      user_ids = ['user_%s_%s' % (thread_index, index) for index in range(200)]
+      events[thread_index] = [(user_id, self.event_builder.create_impression_event(experiment, '111129', user_id, None))
+                              for user_id in user_ids]
+
+    threads = [threading.Thread(target=create_events, args=(thread_index,)) for thread_index in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    for thread_events in events.values():
+      for user_id, event_obj in thread_events:
+        self.assertEqual(user_id, event_obj.params['visitorId'])
+        self.assertEqual('111129', event_obj.params['decision']['variationId'])
+
 
 class EventBuilderV3Test(base.BaseTestV3):
 
@@ -0,0 +1,155 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+import pickle
+import threading
+
+from optimizely import entities
+from optimizely import error_handler
+from optimizely import lazy_config
+from optimizely import logger
+from optimizely import optimizely
+from optimizely import project_config
+from optimizely import shared_config
+from optimizely.helpers import enums
+from . import base
+
+
+class LazyProjectConfigTest(base.BaseTest):
+
+  def setUp(self):
+    base.BaseTest.setUp(self)
+    self.config = project_config.ProjectConfig(self.config_dict_with_features, logger.NoOpLogger(),
+                                               error_handler.NoOpErrorHandler)
+    self.lazy_config = lazy_config.LazyProjectConfig(self.config_dict_with_features, logger.NoOpLogger(),
+                                                     error_handler.NoOpErrorHandler)
+
+  def test_init(self):
+    """ Test that the maps of a lazy config hold the same entries as those of an eager config. """
+
+    self.assertTrue(self.lazy_config.was_parsing_successful())
+    self.assertEqual(self.config.get_revision(), self.lazy_config.get_revision())
+    for map_name in shared_config.MAP_NAMES:
+      config_map = getattr(self.config, map_name)
+      lazy_map = getattr(self.lazy_config, map_name)
+      self.assertEqual(sorted(config_map), sorted(lazy_map))
+      for key in config_map:
+        self.assertEqual(config_map[key], lazy_map[key])
+
+  def test_init__builds_no_entities(self):
+    """ Test that no entity is built until it is looked up, and then only once. """
+
+    with mock.patch('optimizely.entities.Experiment', wraps=entities.Experiment) as mock_experiment:
+      config = lazy_config.LazyProjectConfig(self.config_dict_with_features, logger.NoOpLogger(),
+                                             error_handler.NoOpErrorHandler)
+      self.assertEqual(0, mock_experiment.call_count)
+
+      experiment = config.get_experiment_from_key('test_experiment')
+      self.assertIs(experiment, config.get_experiment_from_id('111127'))
+      self.assertIs(experiment, config.get_experiment_from_key('test_experiment'))
+      self.assertEqual(1, mock_experiment.call_count)
+
+    self.assertIsNone(config.get_experiment_from_key('invalid_key'))
+    self.assertNotIn('invalid_key', config.experiment_key_map)
+
+  def test_lookups(self):
+    """ Test that lookups return objects related like those of an eager config. """
+
+    experiment = self.lazy_config.get_experiment_from_key('group_exp_1')
+    self.assertEqual('19228', experiment.groupId)
+    self.assertEqual('random', experiment.groupPolicy)
+    self.assertIs(experiment, self.lazy_config.get_group('19228').experiments[0])
+    self.assertIs(self.lazy_config.get_experiment_from_key('test_rollout_exp_1'),
+                  self.lazy_config.get_layer_from_id('211111').experiments[0])
+    self.assertIs(self.lazy_config.get_variation_from_key('group_exp_1', 'group_exp_1_control'),
+                  self.lazy_config.get_variation_from_id('group_exp_1', '28901'))
+
+    index = self.lazy_config.get_traffic_allocation_index(experiment.id, experiment.trafficAllocation)
+    self.assertIs(index, self.lazy_config.traffic_allocation_index_map[experiment.id])
+
+    whitelisted_variations = self.lazy_config.get_whitelisted_variations('user_1')
+    self.assertEqual(self.config.get_whitelisted_variations('user_1'), whitelisted_variations)
+    for experiment, variation in whitelisted_variations:
+      self.assertIs(self.lazy_config.get_experiment_from_key(experiment.key), experiment)
+      self.assertIs(self.lazy_config.forced_variation_map[experiment.key]['user_1'], variation)
+    self.assertEqual([], self.lazy_config.get_whitelisted_variations('test_user'))
+
+    feature = self.lazy_config.get_feature_from_key('test_feature_in_group')
+    self.assertEqual('19228', feature.groupId)
+    variable = self.lazy_config.get_variable_for_feature('test_feature_in_experiment', 'is_working')
+    variation = self.lazy_config.get_variation_from_id('test_experiment', '111129')
+    self.assertEqual(self.config.get_variable_value_for_variation(variable, variation),
+                     self.lazy_config.get_variable_value_for_variation(variable, variation))
+
+  def test_lookups__threads(self):
+    """ Test that threads looking up an entity at the same time all get the same object. """
+
+    results = []
+    barrier = threading.Event()
+
+    def look_up():
+      barrier.wait()
+      results.append(self.lazy_config.get_feature_from_key('test_feature_in_group'))
+
+    threads = [threading.Thread(target=look_up) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    barrier.set()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(8, len(results))
+    for feature in results:
+      self.assertIs(results[0], feature)
+
+  def test_pickle(self):
+    """ Test that a pickled lazy config unpickles with all of its maps built. """
+
+    unpickled_config = pickle.loads(pickle.dumps(self.lazy_config, pickle.HIGHEST_PROTOCOL))
+
+    self.assertIsInstance(unpickled_config.experiment_key_map, dict)
+    self.assertEqual(self.config.experiment_key_map, unpickled_config.experiment_key_map)
+    self.assertEqual(self.config.feature_key_map, unpickled_config.feature_key_map)
+
+  def test_optimizely__lazy_config(self):
+    """ Test that a client with a lazy config decides like one with an eager config, including after updates. """
+
+    eager_client = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
+    client = optimizely.Optimizely(json.dumps(self.config_dict_with_features), lazy_config=True)
+
+    self.assertIsInstance(client.config, lazy_config.LazyProjectConfig)
+    for user_id in ['test_user', 'user_1', 'user_2']:
+      self.assertEqual(eager_client.get_variation('test_experiment', user_id),
+                       client.get_variation('test_experiment', user_id))
+    self.assertEqual(sorted(eager_client.get_enabled_features('user_1')), sorted(client.get_enabled_features('user_1')))
+
+    self.assertTrue(client.update_datafile(dict(self.config_dict_with_features, revision='43')))
+    self.assertIsInstance(client.config, lazy_config.LazyProjectConfig)
+    self.assertEqual('43', client.config.get_revision())
+
+  def test_optimizely__lazy_config_with_config_file(self):
+    """ Test that a lazy config can not be combined with a config snapshot or shared config. """
+
+    for path_option in ['config_snapshot_path', 'shared_config_path']:
+      with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging, \
+          mock.patch('optimizely.config_snapshot.save') as mock_save, \
+          mock.patch('optimizely.shared_config.write') as mock_write:
+        client = optimizely.Optimizely(json.dumps(self.config_dict_with_features), lazy_config=True,
+                                       **{path_option: 'config.file'})
+
+      self.assertFalse(client.is_valid)
+      mock_logging.assert_called_once_with(enums.LogLevels.ERROR, enums.Errors.LAZY_CONFIG_WITH_CONFIG_FILE)
+      self.assertEqual(0, mock_save.call_count)
+      self.assertEqual(0, mock_write.call_count)
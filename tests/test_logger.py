@@ -0,0 +1,81 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import inspect
+import mock
+import unittest
+
+from optimizely import logger
+from optimizely.helpers import enums
+
+
+class LoggerTest(unittest.TestCase):
+
+  def test_log(self):
+    """ Test that log formats the message with the given arguments for an enabled logger. """
+
+    with mock.patch('optimizely.logger.SimpleLogger.is_enabled_for', return_value=True), \
+        mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      logger.log(logger.SimpleLogger(), enums.LogLevels.INFO, 'User "%s" is in variation "%s".', 'test_user', 'control')
+      logger.log(logger.SimpleLogger(), enums.LogLevels.DEBUG, '100% of users.')
+
+    self.assertEqual([mock.call(enums.LogLevels.INFO, 'User "test_user" is in variation "control".'),
+                      mock.call(enums.LogLevels.DEBUG, '100% of users.')], mock_logging.call_args_list)
+
+  def test_log__disabled_level(self):
+    """ Test that log neither formats nor logs messages for a disabled level. """
+
+    class Unformattable(object):
+      def __str__(self):
+        raise AssertionError('Message should not be formatted.')
+
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      logger.log(logger.NoOpLogger, enums.LogLevels.INFO, 'User "%s" is in no variation.', Unformattable())
+
+    self.assertEqual(0, mock_logging.call_count)
+
+  def test_log__logger_without_is_enabled_for(self):
+    """ Test that loggers which only provide a log method receive all messages. """
+
+    custom_logger = mock.Mock(spec=['log'])
+    logger.log(custom_logger, enums.LogLevels.DEBUG, 'Assigned bucket %s to user "%s".', 42, 'test_user')
+
+    custom_logger.log.assert_called_once_with(enums.LogLevels.DEBUG, 'Assigned bucket 42 to user "test_user".')
+
+  def test_simple_logger__reports_caller_of_log_helper(self):
+    """ Test that SimpleLogger prefixes messages with the location of the SDK code logging them,
+    not with that of the log helper. """
+
+    simple_logger = logger.SimpleLogger()
+    with mock.patch.object(simple_logger, 'logger') as mock_logging:
+      mock_logging.isEnabledFor.return_value = True
+      caller_lineno = inspect.currentframe().f_lineno + 1
+      logger.log(simple_logger, enums.LogLevels.INFO, 'User "%s" is in variation "%s".', 'test_user', 'control')
+      simple_logger.log(enums.LogLevels.DEBUG, 'Logged directly.')
+
+    self.assertEqual([mock.call(enums.LogLevels.INFO,
+                                '%s:%s:User "test_user" is in variation "control".' % (__file__, caller_lineno)),
+                      mock.call(enums.LogLevels.DEBUG, '%s:%s:Logged directly.' % (__file__, caller_lineno + 1))],
+                     mock_logging.log.call_args_list)
+
+  def test_simple_logger__is_enabled_for(self):
+    """ Test that SimpleLogger is enabled for the levels its underlying logger is enabled for. """
+
+    simple_logger = logger.SimpleLogger()
+    with mock.patch.object(simple_logger, 'logger') as mock_logging:
+      mock_logging.isEnabledFor.side_effect = lambda level: level >= enums.LogLevels.INFO
+      self.assertTrue(simple_logger.is_enabled_for(enums.LogLevels.INFO))
+      self.assertFalse(simple_logger.is_enabled_for(enums.LogLevels.DEBUG))
+      logger.log(simple_logger, enums.LogLevels.DEBUG, 'Assigned bucket %s to user "%s".', 42, 'test_user')
+
+    self.assertEqual(0, mock_logging.log.call_count)
@@ -0,0 +1,124 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+import pickle
+import unittest
+
+from optimizely import error_handler
+from optimizely import exceptions
+from optimizely import logger
+from optimizely import lookup_miss_cache
+from optimizely import optimizely
+from optimizely.helpers import enums
+from . import base
+
+MESSAGE = 'Experiment key "%s" is not in datafile.'
+
+
+class LookupMissCacheTest(unittest.TestCase):
+
+  def test_record(self):
+    """ Test that a key is reported on its first miss and then once per interval with the misses suppressed. """
+
+    cache = lookup_miss_cache.LookupMissCache(report_interval=10)
+
+    with mock.patch('timeit.default_timer', return_value=100):
+      self.assertEqual(0, cache.record(MESSAGE, 'invalid_key'))
+      self.assertIsNone(cache.record(MESSAGE, 'invalid_key'))
+      self.assertEqual(0, cache.record(MESSAGE, 'other_key'))
+    with mock.patch('timeit.default_timer', return_value=109):
+      self.assertIsNone(cache.record(MESSAGE, 'invalid_key'))
+    with mock.patch('timeit.default_timer', return_value=110):
+      self.assertEqual(2, cache.record(MESSAGE, 'invalid_key'))
+      self.assertIsNone(cache.record(MESSAGE, 'invalid_key'))
+
+    self.assertEqual(6, cache.miss_count)
+    self.assertEqual(3, cache.reported_count)
+    self.assertEqual(3, cache.suppressed_count)
+
+  def test_record__max_keys(self):
+    """ Test that the least recently missed keys are forgotten and reported again on their next miss. """
+
+    cache = lookup_miss_cache.LookupMissCache(max_keys=2)
+
+    self.assertEqual(0, cache.record(MESSAGE, 'key_1'))
+    self.assertEqual(0, cache.record(MESSAGE, 'key_2'))
+    self.assertIsNone(cache.record(MESSAGE, 'key_1'))
+    self.assertEqual(0, cache.record(MESSAGE, 'key_3'))
+    self.assertIsNone(cache.record(MESSAGE, 'key_1'))
+    self.assertEqual(0, cache.record(MESSAGE, 'key_2'))
+
+  def test_record__max_reports(self):
+    """ Test that misses of distinct keys beyond the maximum reports per interval are suppressed. """
+
+    cache = lookup_miss_cache.LookupMissCache(report_interval=10, max_reports=2)
+
+    with mock.patch('timeit.default_timer', return_value=100):
+      self.assertEqual(0, cache.record(MESSAGE, 'key_1'))
+      self.assertEqual(0, cache.record(MESSAGE, 'key_2'))
+      self.assertIsNone(cache.record(MESSAGE, 'key_3'))
+    with mock.patch('timeit.default_timer', return_value=110):
+      self.assertEqual(1, cache.record(MESSAGE, 'key_3'))
+
+    self.assertEqual(1, cache.suppressed_count)
+
+  def test_pickle(self):
+    """ Test that a pickled cache keeps its settings but not the misses of the process which recorded them. """
+
+    cache = lookup_miss_cache.LookupMissCache(report_interval=10, max_keys=2, max_reports=3)
+    cache.record(MESSAGE, 'invalid_key')
+
+    unpickled_cache = pickle.loads(pickle.dumps(cache))
+
+    self.assertEqual((10, 2, 3), (unpickled_cache.report_interval, unpickled_cache.max_keys,
+                                  unpickled_cache.max_reports))
+    self.assertEqual(0, unpickled_cache.miss_count)
+    self.assertEqual(0, unpickled_cache.record(MESSAGE, 'invalid_key'))
+
+
+class ConfigLookupMissTest(base.BaseTest):
+
+  def test_get_experiment_from_key__repeated_invalid_key(self):
+    """ Test that repeated misses of a key are logged once and counted. """
+
+    project_config = optimizely.Optimizely(json.dumps(self.config_dict), logger=logger.SimpleLogger()).config
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      for _ in range(3):
+        self.assertIsNone(project_config.get_experiment_from_key('invalid_key'))
+      self.assertIsNone(project_config.get_event('invalid_key'))
+
+    self.assertEqual([mock.call(enums.LogLevels.ERROR, 'Experiment key "invalid_key" is not in datafile.'),
+                      mock.call(enums.LogLevels.ERROR, 'Event "invalid_key" is not in datafile.')],
+                     mock_logging.call_args_list)
+    self.assertEqual(4, project_config.lookup_misses.miss_count)
+    self.assertEqual(2, project_config.lookup_misses.suppressed_count)
+
+  def test_get_experiment_from_key__noop_error_handler(self):
+    """ Test that no exception is built for an error handler which suppresses all exceptions. """
+
+    with mock.patch('optimizely.exceptions.InvalidExperimentException') as mock_exception:
+      self.assertIsNone(self.project_config.get_experiment_from_key('invalid_key'))
+
+    self.assertFalse(mock_exception.called)
+
+  def test_get_experiment_from_key__raise_exception_error_handler(self):
+    """ Test that the error handler gets every miss, also those which are not logged. """
+
+    project_config = optimizely.Optimizely(json.dumps(self.config_dict),
+                                           error_handler=error_handler.RaiseExceptionErrorHandler).config
+
+    for _ in range(2):
+      self.assertRaises(exceptions.InvalidExperimentException, project_config.get_experiment_from_key, 'invalid_key')
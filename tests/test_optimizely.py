@@ -13,14 +13,18 @@
 
 import json
 import mock
+import threading
 
+from optimizely import decision_cache
 from optimizely import error_handler
 from optimizely import exceptions
 from optimizely import logger
 from optimizely import optimizely
 from optimizely import project_config
+from optimizely import user_profile
 from optimizely import version
 from optimizely.helpers import enums
+from optimizely.lib import pymmh3
 from . import base
 
 
@@ -92,6 +96,25 @@ class OptimizelyTest(base.BaseTest):
     )
     self.assertFalse(opt_obj.is_valid)
 
+  def test_init__decodes_datafile_once(self):
+    """ Test that the datafile is decoded once for both validation and building the config. """
+
+    with mock.patch('optimizely.helpers.datafile._decode', side_effect=json.loads) as mock_decode:
+      opt_obj = optimizely.Optimizely(json.dumps(self.config_dict))
+
+    # Audience conditions are decoded with the same JSON library
+    self.assertEqual([json.dumps(self.config_dict), self.config_dict['audiences'][0]['conditions']],
+                     [call[0][0] for call in mock_decode.call_args_list])
+    self.assertTrue(opt_obj.is_valid)
+
+  def test_init__decoded_datafile(self):
+    """ Test that the datafile can be given as bytes or as a dict it was already decoded into. """
+
+    for datafile in [json.dumps(self.config_dict).encode('utf-8'), self.config_dict]:
+      opt_obj = optimizely.Optimizely(datafile)
+      self.assertTrue(opt_obj.is_valid)
+      self.assertEqual(self.project_config.experiment_key_map, opt_obj.config.experiment_key_map)
+
   def test_skip_json_validation_true(self):
     """ Test that on setting skip_json_validation to true, JSON schema validation is not performed. """
 
@@ -555,6 +578,186 @@ class OptimizelyTest(base.BaseTest):
 
     mock_logging.assert_called_once_with(enums.LogLevels.ERROR, 'Datafile has invalid format. Failing "get_variation".')
 
+  def test_explain_variation(self):
+    """ Test that explain_variation returns the decision record of the decision service. """
+
+    with mock.patch('optimizely.decision_service.DecisionService.explain_variation') as mock_explain_variation:
+      self.assertEqual(mock_explain_variation.return_value,
+                       self.optimizely.explain_variation('test_experiment', 'test_user',
+                                                         attributes={'test_attribute': 'test_value'}))
+
+    mock_explain_variation.assert_called_once_with(self.project_config.get_experiment_from_key('test_experiment'),
+                                                   'test_user', {'test_attribute': 'test_value'})
+    self.assertIsNone(self.optimizely.explain_variation('invalid_experiment', 'test_user'))
+
+  def test_explain_variation__invalid_object(self):
+    """ Test that explain_variation logs error if Optimizely object is not created correctly. """
+
+    opt_obj = optimizely.Optimizely('invalid_file')
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      self.assertIsNone(opt_obj.explain_variation('test_experiment', 'test_user'))
+
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR,
+                                         'Datafile has invalid format. Failing "explain_variation".')
+
+  def test_update_datafile(self):
+    """ Test that update_datafile swaps in the new config with a matching decision service and event builder. """
+
+    previous_config = self.optimizely.config
+    updated_config_dict = json.loads(json.dumps(self.config_dict))
+    updated_config_dict['revision'] = '43'
+    updated_config_dict['experiments'][0]['status'] = 'Paused'
+
+    self.assertTrue(self.optimizely.update_datafile(json.dumps(updated_config_dict)))
+    self.assertEqual('43', self.optimizely.config.get_revision())
+    self.assertIs(self.optimizely.config, self.optimizely.decision_service.config)
+    self.assertIs(self.optimizely.config, self.optimizely.event_builder.config)
+    self.assertIs(previous_config.get_experiment_from_key('group_exp_1'),
+                  self.optimizely.config.get_experiment_from_key('group_exp_1'))
+    self.assertIsNone(self.optimizely.get_variation('test_experiment', 'test_user'))
+
+  def test_update_datafile__decision_cache_same_revision(self):
+    """ Test that decisions cached with the previous config are not served after an update with the same revision. """
+
+    opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), decision_cache=decision_cache.DecisionCache())
+    self.assertEqual('control', opt_obj.get_variation('test_experiment', 'user_1'))
+
+    updated_config_dict = json.loads(json.dumps(self.config_dict))
+    updated_config_dict['experiments'][0]['status'] = 'Paused'
+    self.assertTrue(opt_obj.update_datafile(json.dumps(updated_config_dict)))
+
+    self.assertEqual('42', opt_obj.config.get_revision())
+    self.assertIsNone(opt_obj.get_variation('test_experiment', 'user_1'))
+
+  def test_update_datafile__in_flight_call_keeps_config(self):
+    """ Test that a call which started before update_datafile completes with the config it started with. """
+
+    updated_config_dict = json.loads(json.dumps(self.config_dict))
+    updated_config_dict['revision'] = '43'
+    updated_config_dict['experiments'][0]['status'] = 'Paused'
+
+    def update_during_decision(*args, **kwargs):
+      self.optimizely.update_datafile(json.dumps(updated_config_dict))
+      return self.project_config.get_variation_from_id('test_experiment', '111129')
+
+    with mock.patch('optimizely.decision_service.DecisionService.get_variation',
+                    side_effect=update_during_decision), \
+        mock.patch('optimizely.event_dispatcher.EventDispatcher.dispatch_event') as mock_dispatch_event:
+      self.assertEqual('variation', self.optimizely.activate('test_experiment', 'test_user'))
+
+    self.assertEqual('42', mock_dispatch_event.call_args[0][0].params['revision'])
+    self.assertEqual('43', self.optimizely.config.get_revision())
+
+  def test_update_datafile__invalid_datafile(self):
+    """ Test that update_datafile keeps the current config if the new datafile is invalid. """
+
+    previous_config = self.optimizely.config
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      self.assertFalse(self.optimizely.update_datafile('invalid_datafile'))
+
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR, 'Provided "datafile" is in an invalid format.')
+    self.assertIs(previous_config, self.optimizely.config)
+
+  def test_update_datafile__invalid_object(self):
+    """ Test that update_datafile logs error if Optimizely object is not created correctly. """
+
+    opt_obj = optimizely.Optimizely('invalid_file')
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      self.assertFalse(opt_obj.update_datafile(json.dumps(self.config_dict)))
+
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR,
+                                         'Datafile has invalid format. Failing "update_datafile".')
+
+  def test_init__deferred_json_validation(self):
+    """ Test that the config is served while the datafile is validated on a background thread. """
+
+    validation_started = threading.Event()
+    release_validation = threading.Event()
+
+    def block_validation(datafile):
+      validation_started.set()
+      release_validation.wait()
+      return True
+
+    with mock.patch('optimizely.helpers.validator.is_datafile_valid', side_effect=block_validation), \
+        mock.patch('optimizely.logger.NoOpLogger.is_enabled_for', return_value=True), \
+        mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), deferred_json_validation=True)
+      self.assertTrue(validation_started.wait(5))
+      self.assertTrue(opt_obj.is_valid)
+      self.assertEqual(enums.ValidationOutcomes.PENDING, opt_obj.datafile_validation.outcome)
+      self.assertEqual('control', opt_obj.get_variation('test_experiment', 'user_1'))
+      release_validation.set()
+      self.assertTrue(opt_obj.datafile_validation.wait(5))
+
+    self.assertTrue(opt_obj.is_valid)
+    self.assertEqual(enums.ValidationOutcomes.VALID, opt_obj.datafile_validation.outcome)
+    self.assertIsNotNone(opt_obj.datafile_validation.duration)
+    mock_logging.assert_any_call(enums.LogLevels.INFO, 'Validated datafile revision "42" in %.3f seconds.'
+                                 % opt_obj.datafile_validation.duration)
+
+  def test_init__deferred_json_validation__invalid_datafile(self):
+    """ Test that the client becomes invalid if deferred validation finds the datafile invalid, whatever the policy,
+    as there is no valid datafile to keep. """
+
+    invalid_config_dict = json.loads(json.dumps(self.config_dict))
+    invalid_config_dict['experiments'][0]['key'] = 42
+
+    for policy in [enums.ValidationFailurePolicies.INVALIDATE, enums.ValidationFailurePolicies.KEEP_LAST_VALID]:
+      opt_obj = optimizely.Optimizely(json.dumps(invalid_config_dict), deferred_json_validation=True,
+                                      validation_failure_policy=policy)
+      self.assertTrue(opt_obj.datafile_validation.wait(5))
+
+      self.assertEqual(enums.ValidationOutcomes.INVALID, opt_obj.datafile_validation.outcome)
+      self.assertFalse(opt_obj.is_valid)
+      self.assertIsNone(opt_obj.get_variation('group_exp_1', 'user_1'))
+
+  def test_init__invalid_validation_failure_policy(self):
+    """ Test that the client is invalid if the validation failure policy is unknown. """
+
+    with mock.patch('optimizely.logger.SimpleLogger.log') as mock_logging:
+      opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), validation_failure_policy='ignore')
+
+    self.assertFalse(opt_obj.is_valid)
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR,
+                                         'Provided "validation_failure_policy" is in an invalid format.')
+
+  def test_update_datafile__deferred_json_validation__invalidate(self):
+    """ Test that the client becomes invalid if deferred validation finds the datafile it was updated to invalid. """
+
+    opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), deferred_json_validation=True)
+    self.assertTrue(opt_obj.datafile_validation.wait(5))
+    invalid_config_dict = json.loads(json.dumps(self.config_dict))
+    invalid_config_dict['revision'] = 43
+
+    self.assertTrue(opt_obj.update_datafile(json.dumps(invalid_config_dict)))
+    self.assertTrue(opt_obj.datafile_validation.wait(5))
+
+    self.assertEqual(43, opt_obj.datafile_validation.revision)
+    self.assertFalse(opt_obj.is_valid)
+
+  def test_update_datafile__deferred_json_validation__keep_last_valid(self):
+    """ Test that the client reverts to the last valid datafile if deferred validation finds the datafile
+    it was updated to invalid. """
+
+    opt_obj = optimizely.Optimizely(json.dumps(self.config_dict), deferred_json_validation=True,
+                                    validation_failure_policy=enums.ValidationFailurePolicies.KEEP_LAST_VALID)
+    self.assertTrue(opt_obj.datafile_validation.wait(5))
+    valid_config = opt_obj.config
+    invalid_config_dict = json.loads(json.dumps(self.config_dict))
+    invalid_config_dict['revision'] = 43
+
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      self.assertTrue(opt_obj.update_datafile(json.dumps(invalid_config_dict)))
+      self.assertTrue(opt_obj.datafile_validation.wait(5))
+
+    self.assertTrue(opt_obj.is_valid)
+    self.assertIs(valid_config, opt_obj.config)
+    self.assertIs(valid_config, opt_obj.decision_service.config)
+    mock_logging.assert_any_call(enums.LogLevels.WARNING, 'Reverted to datafile revision "42".')
+
   def test_is_feature_enabled__returns_false_for_invalid_feature(self):
     """ Test that the feature is not enabled for the user if the provided feature key is invalid. """
     optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
@@ -579,7 +782,7 @@ class OptimizelyTest(base.BaseTest):
       ) as mock_decision:
       self.assertTrue(optimizely_instance.is_feature_enabled('test_feature_1', 'user1'))
 
-    mock_decision.assert_called_once_with(feature, 'user1', None)
+    mock_decision.assert_called_once_with(feature, 'user1', None, None)
 
   def test_get_enabled_features(self):
     """ Test that get_enabled_features only returns features that are enabled for the specified user. """
@@ -587,23 +790,62 @@ class OptimizelyTest(base.BaseTest):
     project_config = optimizely_instance.config
 
     def side_effect(*args, **kwargs):
-      feature_key = args[0]
+      feature_key = args[1].key
       if feature_key == 'test_feature_1' or feature_key == 'test_feature_2':
         return True
 
       return False
 
     with mock.patch(
-      'optimizely.optimizely.Optimizely.is_feature_enabled',
+      'optimizely.optimizely.Optimizely._is_feature_enabled',
       side_effect=side_effect) as mock_is_feature_enabled:
       received_features = optimizely_instance.get_enabled_features('user_1')
 
     expected_enabled_features = ['test_feature_1', 'test_feature_2']
     self.assertEqual(sorted(expected_enabled_features), sorted(received_features))
-    mock_is_feature_enabled.assert_any_call('test_feature_1', 'user_1', None)
-    mock_is_feature_enabled.assert_any_call('test_feature_2', 'user_1', None)
-    mock_is_feature_enabled.assert_any_call('test_feature_in_group', 'user_1', None)
-    mock_is_feature_enabled.assert_any_call('test_feature_in_experiment_and_rollout', 'user_1', None)
+    decision_context = mock_is_feature_enabled.call_args[0][4]
+    self.assertEqual('user_1', decision_context.user_id)
+    for feature_key in ['test_feature_1', 'test_feature_2', 'test_feature_in_group',
+                        'test_feature_in_experiment_and_rollout']:
+      mock_is_feature_enabled.assert_any_call(optimizely_instance.decision_service,
+                                              project_config.get_feature_from_key(feature_key),
+                                              'user_1', None, decision_context)
+
+  def test_get_enabled_features__looks_up_and_saves_user_profile_once(self):
+    """ Test that get_enabled_features looks up the user profile once and saves all new decisions together. """
+
+    user_profile_service = user_profile.UserProfileService()
+    optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features),
+                                                user_profile_service=user_profile_service)
+
+    with mock.patch('optimizely.user_profile.UserProfileService.lookup',
+                    return_value={'user_id': 'user_8', 'experiment_bucket_map': {}}) as mock_lookup, \
+        mock.patch('optimizely.user_profile.UserProfileService.save') as mock_save:
+      received_features = optimizely_instance.get_enabled_features('user_8')
+
+    mock_lookup.assert_called_once_with('user_8')
+    mock_save.assert_called_once_with({'user_id': 'user_8',
+                                       'experiment_bucket_map': {'111127': {'variation_id': '111129'},
+                                                                 '32222': {'variation_id': '28901'}}})
+    self.assertEqual(['test_feature_1', 'test_feature_in_experiment_and_rollout', 'test_feature_in_group'],
+                     sorted(received_features))
+
+  def test_get_enabled_features__buckets_user_through_decision_context(self):
+    """ Test that get_enabled_features hashes the user ID once for all experiments and groups it buckets the user into,
+    and enables the same features as is_feature_enabled does. """
+
+    optimizely_instance = optimizely.Optimizely(json.dumps(self.config_dict_with_features))
+    expected_features = [feature_key for feature_key in optimizely_instance.config.feature_key_map
+                         if optimizely_instance.is_feature_enabled(feature_key, 'user_8')]
+
+    with mock.patch('optimizely.bucketer.mmh3', pymmh3), \
+        mock.patch('optimizely.lib.pymmh3.hash_prefix', wraps=pymmh3.hash_prefix) as mock_hash_prefix, \
+        mock.patch('optimizely.bucketer.Bucketer.find_bucket') as mock_find_bucket:
+      received_features = optimizely_instance.get_enabled_features('user_8')
+
+    self.assertEqual(sorted(expected_features), sorted(received_features))
+    mock_hash_prefix.assert_called_once_with('user_8', 1)
+    self.assertEqual(0, mock_find_bucket.call_count)
 
 
 class OptimizelyWithExceptionTest(base.BaseTest):
@@ -636,6 +878,10 @@ class OptimizelyWithLoggingTest(base.BaseTest):
 
   def setUp(self):
     base.BaseTest.setUp(self)
+    # Log messages of all levels regardless of how the root logger is configured
+    is_enabled_for_patcher = mock.patch('optimizely.logger.SimpleLogger.is_enabled_for', return_value=True)
+    is_enabled_for_patcher.start()
+    self.addCleanup(is_enabled_for_patcher.stop)
     self.optimizely = optimizely.Optimizely(json.dumps(self.config_dict), logger=logger.SimpleLogger())
     self.project_config = self.optimizely.config
 
@@ -0,0 +1,240 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mock
+import os
+import pickle
+import shutil
+import tempfile
+
+from optimizely import config_snapshot
+from optimizely import entities
+from optimizely import error_handler
+from optimizely import logger
+from optimizely import optimizely
+from optimizely import shared_config
+from optimizely.helpers import enums
+from . import base
+
+
+class SharedConfigTest(base.BaseTest):
+
+  def setUp(self):
+    base.BaseTest.setUp(self)
+    self.datafile = json.dumps(self.config_dict_with_features)
+    self.datafile_hash = config_snapshot.get_datafile_hash(self.datafile)
+    self.config = optimizely.Optimizely(self.datafile).config
+    self.temp_dir = tempfile.mkdtemp()
+    self.shared_config_path = os.path.join(self.temp_dir, 'config.shared')
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def attach(self):
+    return shared_config.attach(self.shared_config_path, self.datafile_hash,
+                                logger.NoOpLogger(), error_handler.NoOpErrorHandler)
+
+  def test_write_and_attach(self):
+    """ Test that the maps of an attached shared config hold the same entries as the config it was written from. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = self.attach()
+
+    self.assertIsInstance(attached_config, shared_config.SharedProjectConfig)
+    self.assertEqual(self.config.revision, attached_config.get_revision())
+    self.assertEqual(self.config.get_account_id(), attached_config.get_account_id())
+    for map_name in shared_config.MAP_NAMES:
+      config_map = getattr(self.config, map_name)
+      attached_map = getattr(attached_config, map_name)
+      self.assertEqual(len(config_map), len(attached_map))
+      self.assertEqual(sorted(config_map), sorted(attached_map))
+      for key, value in config_map.items():
+        self.assertEqual(value, attached_map[key])
+
+    self.assertEqual(['config.shared'], os.listdir(self.temp_dir))
+
+  def test_lookups(self):
+    """ Test that lookup methods are served from the shared config file. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = self.attach()
+
+    self.assertEqual(self.config.get_experiment_from_key('group_exp_1'),
+                     attached_config.get_experiment_from_key('group_exp_1'))
+    self.assertEqual(self.config.get_variation_from_id('test_experiment', '111129'),
+                     attached_config.get_variation_from_id('test_experiment', '111129'))
+    self.assertEqual(self.config.get_whitelisted_variations('user_1'),
+                     attached_config.get_whitelisted_variations('user_1'))
+    self.assertEqual(self.config.get_variable_for_feature('test_feature_1', 'is_working'),
+                     attached_config.get_variable_for_feature('test_feature_1', 'is_working'))
+    self.assertIn('user_1', attached_config.whitelisted_user_map)
+    self.assertNotIn('test_user', attached_config.whitelisted_user_map)
+    self.assertNotIn(None, attached_config.experiment_key_map)
+
+    experiment = attached_config.get_experiment_from_key('test_experiment')
+    index = attached_config.get_traffic_allocation_index(experiment.id, experiment.trafficAllocation)
+    self.assertEqual(self.config.traffic_allocation_index_map[experiment.id], index)
+
+    with mock.patch('optimizely.logger.NoOpLogger.is_enabled_for', return_value=True), \
+        mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      self.assertIsNone(attached_config.get_experiment_from_key('invalid_key'))
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR, 'Experiment key "invalid_key" is not in datafile.')
+
+    self.assertRaises(TypeError, pickle.dumps, attached_config)
+
+  def test_write__whitelisted_users_reference_experiments(self):
+    """ Test that records of whitelisted users only hold experiment keys, which lookups resolve to entities. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = self.attach()
+
+    self.assertEqual(['group_exp_1', 'group_exp_2'],
+                     sorted(shared_config.SharedMap.__getitem__(attached_config.whitelisted_user_map, 'user_1')))
+    self.assertEqual(self.config.get_whitelisted_variations('user_1'),
+                     attached_config.get_whitelisted_variations('user_1'))
+
+  def test_write__groups_and_layers_reference_experiments(self):
+    """ Test that records of groups and layers only hold experiment keys,
+    which lookups resolve to the experiment objects of the config. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = self.attach()
+
+    group_map = attached_config.group_id_map
+    value_offset, value_length = group_map._find_record('19228')
+    self.assertEqual(['group_exp_1', 'group_exp_2'],
+                     pickle.loads(group_map._memory_map[value_offset:value_offset + value_length]).experiments)
+    self.assertIsInstance(self.config.get_group('19228').experiments[0], entities.Experiment)
+
+    group = attached_config.get_group('19228')
+    self.assertEqual(self.config.get_group('19228'), group)
+    for experiment in group.experiments:
+      self.assertIs(attached_config.get_experiment_from_key(experiment.key), experiment)
+    layer = attached_config.get_layer_from_id('211111')
+    self.assertEqual(self.config.get_layer_from_id('211111'), layer)
+    self.assertIs(attached_config.get_experiment_from_key('test_rollout_exp_1'), layer.experiments[0])
+
+  def test_lookups__missing_keys(self):
+    """ Test that keys missed by lookups are remembered, except in maps which most lookups are expected to miss. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = self.attach()
+
+    self.assertIsNone(attached_config.get_experiment_from_key('invalid_key'))
+    self.assertNotIn('test_user', attached_config.whitelisted_user_map)
+    self.assertNotIn('invalid_key', attached_config.forced_variation_map)
+
+    self.assertEqual(['invalid_key'], list(attached_config.experiment_key_map._missing_keys))
+    self.assertEqual([], list(attached_config.whitelisted_user_map._missing_keys))
+    self.assertEqual([], list(attached_config.forced_variation_map._missing_keys))
+
+  def test_lookups__cache(self):
+    """ Test that recently used values are kept unpickled up to the cache size. """
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, True)
+    attached_config = shared_config.attach(self.shared_config_path, self.datafile_hash, logger.NoOpLogger(),
+                                           error_handler.NoOpErrorHandler, cache_size=1)
+
+    experiment = attached_config.get_experiment_from_key('test_experiment')
+    self.assertIs(experiment, attached_config.get_experiment_from_key('test_experiment'))
+    attached_config.get_experiment_from_key('group_exp_1')
+    self.assertIsNot(experiment, attached_config.get_experiment_from_key('test_experiment'))
+    self.assertEqual(experiment, attached_config.get_experiment_from_key('test_experiment'))
+
+    # Index compared equal to the traffic allocation of the cached experiment shares it from then on
+    index = attached_config.get_traffic_allocation_index(experiment.id, experiment.trafficAllocation)
+    self.assertIs(experiment.trafficAllocation, index[0])
+    self.assertIs(index, attached_config.get_traffic_allocation_index(experiment.id, experiment.trafficAllocation))
+
+  def test_attach__stale_or_incompatible(self):
+    """ Test that attach returns None for a file of another datafile, SDK version or format. """
+
+    self.assertIsNone(self.attach())
+
+    shared_config.write(self.shared_config_path, self.config, self.datafile_hash, False)
+    self.assertIsNone(shared_config.attach(self.shared_config_path, 'other_hash', None, None))
+    self.assertIsNone(shared_config.attach(self.shared_config_path, self.datafile_hash, None, None,
+                                           require_validated=True))
+    with mock.patch('optimizely.version.__version__', new='0.0.1'):
+      self.assertIsNone(self.attach())
+    with mock.patch('optimizely.shared_config.FORMAT_VERSION', new=shared_config.FORMAT_VERSION + 1):
+      self.assertIsNone(self.attach())
+
+    with open(self.shared_config_path, 'wb') as shared_file:
+      shared_file.write(b'invalid')
+    self.assertIsNone(self.attach())
+
+  def test_optimizely__writes_and_attaches_shared_config(self):
+    """ Test that the client writes the shared config when building the config and attaches to it afterwards. """
+
+    writing_client = optimizely.Optimizely(self.datafile, shared_config_path=self.shared_config_path)
+    self.assertNotIsInstance(writing_client.config, shared_config.SharedProjectConfig)
+    self.assertTrue(os.path.exists(self.shared_config_path))
+
+    with mock.patch('optimizely.project_config.ProjectConfig.__init__') as mock_config_init:
+      attached_client = optimizely.Optimizely(self.datafile, shared_config_path=self.shared_config_path)
+
+    self.assertFalse(mock_config_init.called)
+    self.assertIsInstance(attached_client.config, shared_config.SharedProjectConfig)
+    for user_id in ['user_1', 'test_user'] + ['user_%s' % index for index in range(50)]:
+      for experiment_key in ['test_experiment', 'group_exp_1', 'group_exp_2']:
+        self.assertEqual(writing_client.get_variation(experiment_key, user_id),
+                         attached_client.get_variation(experiment_key, user_id))
+      self.assertEqual(sorted(writing_client.get_enabled_features(user_id, {'test_attribute': 'test_value'})),
+                       sorted(attached_client.get_enabled_features(user_id, {'test_attribute': 'test_value'})))
+
+    # Updating the datafile builds a config of its own
+    self.assertTrue(attached_client.update_datafile(json.dumps(dict(self.config_dict_with_features, revision='2'))))
+    self.assertNotIsInstance(attached_client.config, shared_config.SharedProjectConfig)
+    self.assertEqual(writing_client.get_variation('test_experiment', 'test_user'),
+                     attached_client.get_variation('test_experiment', 'test_user'))
+
+  def test_optimizely__deferred_json_validation(self):
+    """ Test that clients deferring validation attach to a shared config written before its validation completed,
+    validating the datafile meanwhile. """
+
+    clients = [optimizely.Optimizely(self.datafile, shared_config_path=self.shared_config_path,
+                                     deferred_json_validation=True) for _ in range(3)]
+
+    self.assertNotIsInstance(clients[0].config, shared_config.SharedProjectConfig)
+    for client in clients[1:]:
+      self.assertIsInstance(client.config, shared_config.SharedProjectConfig)
+    for client in clients:
+      self.assertTrue(client.datafile_validation.wait(5))
+      self.assertEqual(enums.ValidationOutcomes.VALID, client.datafile_validation.outcome)
+      self.assertTrue(client.is_valid)
+
+    # Clients validating before serving do not use a config whose datafile was not validated
+    self.assertNotIsInstance(optimizely.Optimizely(self.datafile, shared_config_path=self.shared_config_path).config,
+                             shared_config.SharedProjectConfig)
+
+    # Nothing is left to validate once the file is written for a validated datafile
+    client = optimizely.Optimizely(self.datafile, shared_config_path=self.shared_config_path,
+                                   deferred_json_validation=True)
+    self.assertIsInstance(client.config, shared_config.SharedProjectConfig)
+    self.assertIsNone(client.datafile_validation)
+
+  def test_optimizely__deferred_json_validation__invalid_datafile(self):
+    """ Test that a client attached to a shared config becomes invalid if deferred validation fails. """
+
+    datafile = json.dumps(dict(self.config_dict_with_features, revision=42))
+    optimizely.Optimizely(datafile, shared_config_path=self.shared_config_path, skip_json_validation=True)
+
+    client = optimizely.Optimizely(datafile, shared_config_path=self.shared_config_path,
+                                   deferred_json_validation=True)
+
+    self.assertIsInstance(client.config, shared_config.SharedProjectConfig)
+    self.assertTrue(client.datafile_validation.wait(5))
+    self.assertEqual(enums.ValidationOutcomes.INVALID, client.datafile_validation.outcome)
+    self.assertFalse(client.is_valid)
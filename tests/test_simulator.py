@@ -0,0 +1,106 @@
+# Copyright 2017, Optimizely
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+from optimizely import decision_service
+from optimizely import exceptions
+from optimizely import optimizely
+from optimizely import simulator
+from . import base
+
+
+class SimulatorTest(base.BaseTest):
+
+  def setUp(self):
+    base.BaseTest.setUp(self)
+    self.temp_dir = tempfile.mkdtemp()
+    self.datafile_path = os.path.join(self.temp_dir, 'datafile.json')
+    with open(self.datafile_path, 'w') as datafile_file:
+      datafile_file.write(json.dumps(self.config_dict_with_features))
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_simulate(self):
+    """ Test that simulate counts every user once per experiment and matches bucketing one user at a time. """
+
+    result = simulator.simulate(self.datafile_path, 200, processes=1, shard_size=64)
+    config = optimizely.Optimizely(json.dumps(self.config_dict_with_features)).config
+    decisions = decision_service.DecisionService(config, None)
+
+    self.assertEqual(200, result.user_count)
+    self.assertEqual({'19228': 0}, result.groups)
+    for experiment_key, experiment_result in result.experiments.items():
+      experiment = config.get_experiment_from_key(experiment_key)
+      expected_counts = dict((variation.get('key'), 0) for variation in experiment.variations)
+      expected_counts[None] = 0
+      for index in range(200):
+        variation = decisions.bucketer.bucket(experiment, 'user_%d' % index)
+        expected_counts[variation.key if variation else None] += 1
+      self.assertEqual(expected_counts, experiment_result['counts'])
+
+    self.assertEqual({'control': 0.5, 'variation': 0.4}, result.experiments['test_experiment']['expected'])
+    self.assertEqual({'group_exp_1_control': 0.09, 'group_exp_1_variation': 0.18},
+                     result.experiments['group_exp_1']['expected'])
+    self.assertTrue(result.throughput > 0)
+    self.assertIn('Simulated 200 users', result.format_report())
+
+  def test_simulate__rollout_coverage(self):
+    """ Test that rollout coverage respects audiences when deciding with the decision service. """
+
+    result = simulator.simulate(self.datafile_path, 100, processes=1, mode=simulator.SimulationModes.DECISION_SERVICE)
+    self.assertEqual(['test_feature_2', 'test_feature_in_experiment_and_rollout'], sorted(result.rollouts))
+    self.assertEqual({'covered': 0, 'coverage': 0.0}, result.rollouts['test_feature_2'])
+
+    result = simulator.simulate(self.datafile_path, 100, processes=1, mode=simulator.SimulationModes.DECISION_SERVICE,
+                                attributes={'test_attribute': 'test_value'})
+    self.assertTrue(0 < result.rollouts['test_feature_2']['covered'] <= 100)
+    self.assertEqual(result.rollouts['test_feature_2'], result.rollouts['test_feature_in_experiment_and_rollout'])
+
+  def test_simulate__rollout_coverage__bucketer(self):
+    """ Test that rollout coverage ignores audiences when bucketing, and matches bucketing one user at a time
+    into the experiments of the rollout. """
+
+    result = simulator.simulate(self.datafile_path, 200, processes=1, shard_size=64)
+    config = optimizely.Optimizely(json.dumps(self.config_dict_with_features)).config
+    bucketer_obj = decision_service.DecisionService(config, None).bucketer
+
+    layer = config.get_layer_from_id(config.get_feature_from_key('test_feature_2').layerId)
+    expected_covered = sum(1 for index in range(200)
+                           if any(bucketer_obj.bucket(experiment, 'user_%d' % index)
+                                  for experiment in layer.experiments))
+    self.assertTrue(0 < expected_covered)
+    self.assertEqual({'covered': expected_covered, 'coverage': expected_covered / 200.0},
+                     result.rollouts['test_feature_2'])
+
+  def test_simulate__multiple_processes(self):
+    """ Test that sharding users across a process pool yields the same counts as simulating in process. """
+
+    in_process_result = simulator.simulate(self.datafile_path, 300, processes=1, shard_size=50)
+    pool_result = simulator.simulate(self.datafile_path, 300, processes=2, shard_size=50)
+
+    self.assertEqual(in_process_result.experiments, pool_result.experiments)
+    self.assertEqual(in_process_result.groups, pool_result.groups)
+    self.assertEqual(in_process_result.rollouts, pool_result.rollouts)
+
+  def test_simulate__invalid_datafile(self):
+    """ Test that simulate raises for an invalid datafile. """
+
+    with open(self.datafile_path, 'w') as datafile_file:
+      datafile_file.write('invalid_datafile')
+
+    self.assertRaises(exceptions.InvalidInputException, simulator.simulate, self.datafile_path, 10, processes=1)
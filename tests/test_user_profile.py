@@ -11,9 +11,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import mock
+import threading
 import unittest
 
 from optimizely import user_profile
+from optimizely.helpers import enums
 
 
 class UserProfileTest(unittest.TestCase):
@@ -50,3 +53,167 @@ class UserProfileTest(unittest.TestCase):
 
     self.profile.save_variation_for_experiment('199912', '1224525')
     self.assertEqual({'199912': {'variation_id': '1224525'}}, self.profile.experiment_bucket_map)
+
+
+class WriteBehindUserProfileServiceTest(unittest.TestCase):
+
+  def setUp(self):
+    self.user_profile_service = mock.Mock(spec=['lookup', 'save'])
+    self.write_behind_service = user_profile.WriteBehindUserProfileService(self.user_profile_service,
+                                                                           max_batch_size=10, flush_interval=60)
+
+  def tearDown(self):
+    self.write_behind_service.close()
+
+  def test_save__coalesces_saves_per_user(self):
+    """ Test that saves for the same user are merged into one buffered profile which lookups see. """
+
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}})
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111128': {'variation_id': '2'}}})
+    self.write_behind_service.save({'user_id': 'user_2', 'experiment_bucket_map': {'111127': {'variation_id': '3'}}})
+
+    self.assertEqual(2, self.write_behind_service.backlog)
+    self.assertEqual({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'},
+                                                                     '111128': {'variation_id': '2'}}},
+                     self.write_behind_service.lookup('user_1'))
+    self.assertEqual(0, self.user_profile_service.lookup.call_count)
+    self.assertEqual(0, self.user_profile_service.save.call_count)
+
+    self.write_behind_service.flush()
+
+    self.assertEqual(0, self.write_behind_service.backlog)
+    self.assertEqual(1, self.write_behind_service.flush_count)
+    self.assertIsNotNone(self.write_behind_service.last_flush_latency)
+    self.assertEqual([
+      mock.call({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'},
+                                                                '111128': {'variation_id': '2'}}}),
+      mock.call({'user_id': 'user_2', 'experiment_bucket_map': {'111127': {'variation_id': '3'}}})
+    ], self.user_profile_service.save.call_args_list)
+
+  def test_lookup__returns_copy_of_buffered_profile(self):
+    """ Test that decisions on a looked up profile do not change the buffered profile until it is saved. """
+
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}})
+
+    profile = user_profile.UserProfile(**self.write_behind_service.lookup('user_1'))
+    profile.save_variation_for_experiment('111128', '2')
+    self.write_behind_service.lookup('user_1')['experiment_bucket_map'].clear()
+
+    self.assertEqual({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}},
+                     self.write_behind_service.lookup('user_1'))
+
+  def test_lookup__during_flush(self):
+    """ Test that profiles of a flush in progress are looked up from the buffer until they are saved. """
+
+    save_started = threading.Event()
+    release_save = threading.Event()
+
+    def block_save(user_profile):
+      save_started.set()
+      release_save.wait()
+
+    self.user_profile_service.save.side_effect = block_save
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}})
+    flush_thread = threading.Thread(target=self.write_behind_service.flush)
+    flush_thread.start()
+    try:
+      self.assertTrue(save_started.wait(5))
+      self.assertEqual({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}},
+                       self.write_behind_service.lookup('user_1'))
+    finally:
+      release_save.set()
+      flush_thread.join()
+
+    self.assertEqual(0, self.user_profile_service.lookup.call_count)
+    self.user_profile_service.lookup.return_value = {'user_id': 'user_1', 'experiment_bucket_map': {}}
+    self.assertEqual({'user_id': 'user_1', 'experiment_bucket_map': {}}, self.write_behind_service.lookup('user_1'))
+
+  def test_flush__uses_save_many(self):
+    """ Test that a full buffer is flushed in the background with save_many of the wrapped service. """
+
+    user_profile_service = mock.Mock(spec=['lookup', 'save', 'save_many'])
+    flushed = threading.Event()
+    user_profile_service.save_many.side_effect = lambda user_profiles: flushed.set()
+    write_behind_service = user_profile.WriteBehindUserProfileService(user_profile_service,
+                                                                      max_batch_size=2, flush_interval=60)
+    try:
+      write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {}})
+      write_behind_service.save({'user_id': 'user_2', 'experiment_bucket_map': {}})
+      self.assertTrue(flushed.wait(5))
+    finally:
+      write_behind_service.close()
+
+    user_profile_service.save_many.assert_called_once_with([{'user_id': 'user_1', 'experiment_bucket_map': {}},
+                                                            {'user_id': 'user_2', 'experiment_bucket_map': {}}])
+    self.assertEqual(0, user_profile_service.save.call_count)
+
+  def test_flush__save_fails(self):
+    """ Test that user profiles which fail to save are logged, kept in the buffer and saved on the next flush,
+    merged with decisions saved meanwhile. """
+
+    self.user_profile_service.save.side_effect = [Exception('major problem'), None, None, None]
+    with mock.patch('optimizely.logger.NoOpLogger.log') as mock_logging:
+      self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}})
+      self.write_behind_service.save({'user_id': 'user_2', 'experiment_bucket_map': {}})
+      self.assertFalse(self.write_behind_service.flush())
+
+    mock_logging.assert_called_once_with(enums.LogLevels.ERROR,
+                                         'Unable to save 1 user profiles. Retrying on next flush. Error: major problem')
+    self.assertEqual(1, self.write_behind_service.backlog)
+    self.assertEqual(1, self.write_behind_service.flush_count)
+
+    self.write_behind_service.save({'user_id': 'user_3', 'experiment_bucket_map': {}})
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {'111128': {'variation_id': '2'}}})
+    self.assertEqual({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'},
+                                                                     '111128': {'variation_id': '2'}}},
+                     self.write_behind_service.lookup('user_1'))
+    self.assertTrue(self.write_behind_service.flush())
+
+    self.assertEqual(0, self.write_behind_service.backlog)
+    self.assertEqual([
+      mock.call({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'}}}),
+      mock.call({'user_id': 'user_2', 'experiment_bucket_map': {}}),
+      mock.call({'user_id': 'user_1', 'experiment_bucket_map': {'111127': {'variation_id': '1'},
+                                                                '111128': {'variation_id': '2'}}}),
+      mock.call({'user_id': 'user_3', 'experiment_bucket_map': {}})
+    ], self.user_profile_service.save.call_args_list)
+
+  def test_flush__save_many_fails(self):
+    """ Test that all user profiles of a failing save_many are kept in the buffer. """
+
+    user_profile_service = mock.Mock(spec=['lookup', 'save', 'save_many'])
+    user_profile_service.save_many.side_effect = Exception('major problem')
+    write_behind_service = user_profile.WriteBehindUserProfileService(user_profile_service,
+                                                                      max_batch_size=10, flush_interval=60)
+    write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {}})
+    write_behind_service.save({'user_id': 'user_2', 'experiment_bucket_map': {}})
+    self.assertFalse(write_behind_service.flush())
+    self.assertEqual(2, write_behind_service.backlog)
+
+    user_profile_service.save_many.side_effect = None
+    write_behind_service.close()
+
+    self.assertEqual(0, write_behind_service.backlog)
+    self.assertEqual(2, user_profile_service.save_many.call_count)
+
+  def test_close__flushes_remaining_user_profiles(self):
+    """ Test that close flushes user profiles which are still buffered. """
+
+    self.write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {}})
+    self.write_behind_service.close()
+
+    self.user_profile_service.save.assert_called_once_with({'user_id': 'user_1', 'experiment_bucket_map': {}})
+
+  def test_close_at_exit(self):
+    """ Test that write-behind services which were not closed are closed when the interpreter exits. """
+
+    write_behind_service = user_profile.WriteBehindUserProfileService(self.user_profile_service,
+                                                                      max_batch_size=10, flush_interval=60)
+    self.assertIn(write_behind_service, user_profile._open_write_behind_services)
+    write_behind_service.save({'user_id': 'user_1', 'experiment_bucket_map': {}})
+
+    user_profile._close_open_write_behind_services()
+
+    self.user_profile_service.save.assert_called_once_with({'user_id': 'user_1', 'experiment_bucket_map': {}})
+    self.assertFalse(write_behind_service._thread.is_alive())
+    self.assertNotIn(write_behind_service, user_profile._open_write_behind_services)